@@ -2,11 +2,36 @@
 Service-to-service authentication via API Key.
 No user login; the caller (e.g. api_ofertame) sends the shared secret in every request.
 """
+from typing import Optional
+
 from fastapi import Header, HTTPException, status
 
 from app.config import settings
 
 
+def provided_api_key(
+    x_api_key: Optional[str], authorization: Optional[str]
+) -> Optional[str]:
+    """The key sent in X-API-Key, else in Authorization: Bearer <api_key>; or None."""
+    if x_api_key is not None and x_api_key.strip():
+        return x_api_key.strip()
+    if authorization and authorization.strip().lower().startswith("bearer "):
+        return authorization.strip()[7:].strip() or None
+    return None
+
+
+def auth_status(x_api_key: Optional[str], authorization: Optional[str]) -> str:
+    """
+    Credentials sent: "anonymous" (no key), "valid" or "invalid". For logs and
+    metrics, not access control.
+    """
+    provided = provided_api_key(x_api_key, authorization)
+    if provided is None:
+        return "anonymous"
+    secret = (settings.api_msj_secret or "").strip()
+    return "valid" if secret and provided == secret else "invalid"
+
+
 def verify_api_key(
     x_api_key: str | None = Header(None, alias="X-API-Key", description="API Key for service-to-service auth"),
     authorization: str | None = Header(None, description="Bearer token: Authorization: Bearer <api_key>"),
@@ -22,12 +47,7 @@ def verify_api_key(
             detail="API Key authentication is not configured (API_MSJ_SECRET is empty)",
         )
 
-    provided: str | None = None
-    if x_api_key is not None and x_api_key.strip():
-        provided = x_api_key.strip()
-    elif authorization and authorization.strip().lower().startswith("bearer "):
-        provided = authorization.strip()[7:].strip()
-
+    provided = provided_api_key(x_api_key, authorization)
     if not provided or provided != secret:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
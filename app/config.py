@@ -1,8 +1,30 @@
 import os
-from typing import Optional
+from typing import List, Literal, Optional
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
 
+class SMTPProviderConfig(BaseModel):
+    """One SMTP relay. Configured as a JSON list in SMTP_PROVIDERS."""
+    name: str
+    host: str
+    port: int = 587
+    user: str
+    password: str
+    # auto: 465 implicit TLS, 587 STARTTLS, other ports STARTTLS if advertised
+    tls: Literal["auto", "starttls", "tls", "none"] = "auto"
+    weight: float = 1.0
+    validate_certs: bool = True
+
+
+class DomainLimitConfig(BaseModel):
+    """Delivery caps for a group of domains (JSON list, SMTP_DOMAIN_LIMITS)."""
+    domains: List[str]  # Share one set of caps, e.g. ["outlook.com", "hotmail.com"]
+    concurrency: int = 10  # Sends in flight (0 = no limit)
+    rate: float = 0.0  # Sends per second (0 = no limit)
+    burst: int = 1  # Sends that may start back to back under the rate
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
@@ -11,9 +33,51 @@ class Settings(BaseSettings):
     app_version: str = "1.0.0"
     debug: bool = True
 
+    # Logging: records are queued and written by a background thread; when the queue is
+    # full new records are dropped and counted (log_records_dropped_total)
+    log_level: str = "INFO"
+    log_format: str = "json"  # json (one object per line) or text
+    log_queue_size: int = 10_000  # Records buffered for the writer thread
+
     # Service-to-service authentication (no user login)
     api_msj_secret: str = ""  # Required in production; compare against X-API-Key or Authorization: Bearer
 
+    # Production server (python -m app.server)
+    host: str = "0.0.0.0"
+    port: int = 8080
+    web_concurrency: int = 0  # Worker processes; 0 = one per available CPU
+    # Seconds to wait for in-flight sends on SIGTERM
+    shutdown_drain_timeout: float = 25.0
+
+    # Event-loop lag monitor (stacks of blocking code are logged when DEBUG is on)
+    loop_monitor_interval: float = 0.5  # Seconds between lag samples
+    loop_block_threshold: float = 0.1  # Lag (seconds) counted as a stall
+
+    # Outbound networking (DNS cache, keep-alive, startup pre-warming)
+    dns_cache_min_ttl: float = 5.0  # Floor for cached DNS answers, seconds
+    dns_cache_max_ttl: float = 300.0  # Ceiling for cached DNS answers, seconds
+    outbound_prewarm: bool = True  # Open provider connections during startup
+    outbound_prewarm_timeout: float = 10.0  # Longest startup wait for pre-warming
+    whatsapp_max_connections: int = 20  # Starting Graph API calls in flight (see below)
+
+    # Adaptive concurrency per SMTP relay and for the Graph API: starts at
+    # SMTP_POOL_SIZE / WHATSAPP_MAX_CONNECTIONS, grows while latency stays flat,
+    # shrinks on latency rises or errors. Each relay's session pool and the Graph API
+    # client may open up to ADAPTIVE_CONCURRENCY_MAX connections per worker: lower it,
+    # or disable adaptation, for relays that cap sessions per client
+    adaptive_concurrency: bool = True  # false = fixed limits (the starting values)
+    adaptive_concurrency_max: int = 100  # Ceiling of each limit (and its pool)
+    adaptive_latency_tolerance: float = 2.0  # Latency > baseline x this: congestion
+
+    # On-demand sampling profiler (GET /api/v1/admin/profile)
+    profiler_interval: float = 0.005  # Seconds between stack samples
+    profiler_max_seconds: float = 60.0  # Longest profile a caller may request
+
+    # Response compression (brotli if installed, else gzip) negotiated via
+    # Accept-Encoding
+    response_compression: bool = True
+    response_compression_min_bytes: int = 1024  # Smaller bodies are sent as is
+
     # OpenAPI docs: set to false in production to disable /docs, /redoc, /openapi.json
     enable_openapi_docs: bool = True
 
@@ -24,11 +88,93 @@ class Settings(BaseSettings):
     smtp_pass: str
     email_from: str
     smtp_validate_certs: bool = True
+    smtp_pool_size: int = 5  # Starting SMTP sessions per relay and worker (see below)
+    smtp_pool_idle_timeout: float = 60.0  # Close pooled sessions idle longer than this
+    smtp_prewarm_connections: int = 1  # Sessions per provider opened at startup
+
+    # Multiple SMTP relays (JSON list of SMTPProviderConfig). When empty, a single
+    # provider is built from SMTP_HOST/SMTP_PORT/SMTP_USER/SMTP_PASS.
+    smtp_providers: List[SMTPProviderConfig] = []
+    smtp_circuit_failure_threshold: int = 3  # Consecutive failures that open a circuit
+    smtp_circuit_reset_timeout: float = 30.0  # Seconds before retrying an open circuit
+
+    # Per-recipient-domain throttling: caps for listed domains (SMTP_DOMAIN_LIMITS,
+    # JSON list of DomainLimitConfig) or the defaults below; a 4xx deferral pauses
+    # only that domain
+    smtp_domain_limits: List[DomainLimitConfig] = []
+    smtp_domain_concurrency: int = 10  # Sends in flight per other domain (0 = no limit)
+    smtp_domain_rate: float = 0.0  # Sends per second per other domain (0 = no limit)
+    smtp_domain_backoff: float = 30.0  # Pause after a deferral, doubled on each repeat
+    smtp_domain_backoff_max: float = 900.0  # Longest pause of a deferring domain
+    smtp_domain_max_wait: float = 10.0  # Sends finding their domain paused longer fail
+
+    # Attachments: content-addressed blob store shared by all workers
+    blob_store_path: str = ""  # Defaults to <system tmp>/api-msj-blobs
+    attachment_max_bytes: int = 10 * 1024 * 1024  # Max size of one uploaded blob
+    attachment_cache_bytes: int = 64 * 1024 * 1024  # Encoded MIME parts kept in memory
+
+    # DKIM signing: enabled when domain, selector and key file are all set
+    dkim_domain: str = ""  # d= tag, e.g. ofertame.com
+    dkim_selector: str = ""  # s= tag; public key at <selector>._domainkey.<domain>
+    dkim_private_key_path: str = ""  # Unencrypted RSA key (PEM, PKCS#1 or PKCS#8)
+
+    # MIME assembly and signing in worker processes (0 = on the event loop)
+    mime_process_workers: int = 0
+    mime_offload_min_bytes: int = 16 * 1024  # Smaller messages are always built inline
+    smtp_8bitmime: bool = True  # Raw UTF-8 bodies for relays advertising 8BITMIME
+
+    # Scheduled sends (send_at)
+    scheduler_db_path: str = ""  # SQLite file; default <tmp>/api-msj-scheduled.sqlite3
+    scheduler_release_rate: float = 10.0  # Due jobs/second per worker (0 = no limit)
+    scheduler_release_burst: int = 1  # Jobs that may be released back to back
+    scheduler_jitter_seconds: float = 60.0  # Jobs fire up to this long after send_at
+
+    # Dead letters: failed sends kept for replay
+    # (POST /api/v1/admin/dead-letters/replay)
+    dead_letter_enabled: bool = True
+    # SQLite file; default <tmp>/api-msj-dead-letters.sqlite3
+    dead_letter_db_path: str = ""
+    dead_letter_replay_batch_size: int = 50  # Replayed sends in flight at once
+    dead_letter_replay_rate: float = 20.0  # Replayed sends per second, per worker
+
+    # Duplicate-send suppression: same content to the same recipient within the window
+    dedup_window: float = 0.0  # Seconds a delivered send is remembered (0 = off)
+    dedup_capacity: int = 1_000_000  # Sends per window the filter is sized for
+    dedup_error_rate: float = 0.001  # Chance a new send is wrongly seen as a duplicate
+
+    # WebSocket submission channel (/api/v1/stream)
+    stream_credits: int = 100  # Sends one connection may have in flight
+    stream_max_refusals: int = 100  # Refused frames in a row before closing (0 = never)
+
+    # Bulk ingest: distinct addresses whose validation result is memoized
+    bulk_address_cache_size: int = 50000
+
+    # Pre-send recipient filter: suppression list + cached MX lookups
+    recipient_filter_enabled: bool = False
+    recipient_dns_timeout: float = 3.0
+    recipient_mx_cache_size: int = 10000  # Domains kept in the MX cache
+    recipient_mx_cache_ttl: float = 3600.0  # Seconds a domain with MX stays cached
+    recipient_mx_negative_ttl: float = 300.0  # Seconds a domain without MX stays cached
+    suppression_list_path: str = ""  # One address per line; hard bounces are appended
+
+    # Readiness probes (/ready): provider checks run in background every TTL seconds
+    readiness_ttl: float = 15.0
+    readiness_timeout: float = 5.0
 
     # WhatsApp Configuration (opcionales: si no se configuran, el envío fallará con mensaje claro)
     whatsapp_token: Optional[str] = ""
     whatsapp_url: Optional[str] = ""
     activar_whatsapp: bool = True
+    # Merge notifications to the same phone sent within this many seconds (0 = off)
+    whatsapp_coalesce_window: float = 0.0
+    whatsapp_coalesce_max_messages: int = 5  # Offers merged into one template message
+    whatsapp_coalesce_max_chars: int = 1000  # Max length of the merged template text
+    whatsapp_coalesce_max_pending: int = 1000  # Buffered messages before early flushes
+    # Header image uploaded once to the Graph API and sent by media id instead of
+    # its link
+    whatsapp_media_cache: bool = True
+    whatsapp_media_ttl: float = 25 * 24 * 3600.0  # Re-upload after (ids last 30d)
+    whatsapp_header_image_path: str = ""  # Local file to upload; else the link
 
     # Optional Celery Configuration
     celery_broker_url: Optional[str] = None
@@ -0,0 +1,8 @@
+# Runtime diagnostics package
+from .loop_monitor import LoopMonitor, loop_monitor
+from .profiler import Profile, ProfilerBusy, SamplingProfiler, profiler
+
+__all__ = [
+    "LoopMonitor", "loop_monitor",
+    "Profile", "ProfilerBusy", "SamplingProfiler", "profiler",
+]
@@ -0,0 +1,120 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+A coroutine sleeps `interval` seconds in a loop and measures how late it wakes
+up: that delay is the time other work held the loop. The lag is exported as
+metrics. With stack capture on (DEBUG), the coroutine wakes at least every
+`threshold / 2` seconds and each wake-up is a heartbeat; a watchdog thread
+logs the loop thread's current stack - the code that is blocking it - when
+the heartbeat is older than `threshold`, while the stall is still happening.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Iterable, Optional
+
+from app.config import settings
+from app.metrics import Sample, metrics
+
+logger = logging.getLogger(__name__)
+
+stalls_total = metrics.counter(
+    "event_loop_stalls_total",
+    "Times the event loop was held longer than the block threshold",
+)
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        interval: float = 0.5,
+        threshold: float = 0.1,
+        capture_stacks: bool = False,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.capture_stacks = capture_stacks
+        # Heartbeat period: a stall of `threshold` must outlast at least one missed beat
+        self.tick = min(interval, threshold / 2) if capture_stacks else interval
+        self.lag = 0.0  # Last measured lag, seconds
+        self.max_lag = 0.0  # Worst lag since the last scrape
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._measure_forever())
+        if self.capture_stacks:
+            self._stop.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _measure_forever(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.lag = max(0.0, now - started - self.tick)
+            self.max_lag = max(self.max_lag, self.lag)
+            if self.lag > self.threshold:
+                stalls_total.inc()
+                if not self.capture_stacks:
+                    logger.warning(f"Event loop blocked for {self.lag * 1000:.0f} ms")
+
+    def _watch(self) -> None:
+        """Watchdog thread: dump the loop thread's stack once per stall."""
+        reported = 0.0  # Heartbeat of the stall already reported
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled <= self.threshold or heartbeat == reported:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                f"Event loop blocked for over {(stalled - self.tick) * 1000:.0f} ms "
+                f"at:\n{stack}"
+            )
+
+    def collect(self) -> Iterable[Sample]:
+        """Metrics collector: last and worst (since previous scrape) loop lag."""
+        yield "event_loop_lag_seconds", {}, self.lag
+        yield "event_loop_lag_max_seconds", {}, self.max_lag
+        self.max_lag = self.lag
+
+
+# Global monitor for the process's event loop, started from the application lifespan
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval,
+    threshold=settings.loop_block_threshold,
+    capture_stacks=settings.debug,
+)
+metrics.register_collector(loop_monitor.collect)
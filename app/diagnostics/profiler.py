@@ -0,0 +1,232 @@
+"""
+On-demand sampling profiler for the running process.
+
+A background thread wakes every `interval` seconds and records:
+
+- the wall-clock stack of every thread (the event loop thread included, so
+  time spent idle in the selector shows up as such), and
+- the await chain of every asyncio task on the profiled loop, so coroutines
+  suspended on SMTP or HTTP I/O are attributed to the handler awaiting them.
+  Task stacks are captured by a callback on the loop thread itself (the
+  sampler only schedules it), so coroutine frames are never walked while the
+  loop runs them; ticks that arrive while the loop is blocked are not
+  captured twice, the thread stack already shows what blocks it.
+
+Samples are aggregated as stacks and exported as collapsed stacks (one line
+per stack, `frame;frame;frame count`, readable by flamegraph.pl and speedscope)
+or as a speedscope JSON document. Nothing is instrumented while no profile runs.
+"""
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+Stack = Tuple[str, ...]  # Root label first, innermost frame last
+
+MAX_TASK_DEPTH = 100  # Guards against pathological await chains
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already running in this process."""
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}.{code.co_name}:{code.co_firstlineno}"
+
+
+def _thread_stack(frame: Optional[FrameType]) -> List[str]:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _task_stack(task: asyncio.Task) -> List[str]:
+    """Await chain of a task, from its outermost coroutine to what it is waiting on."""
+    labels = []
+    awaitable: Any = task.get_coro()
+    for _ in range(MAX_TASK_DEPTH):
+        frame = getattr(awaitable, "cr_frame", None)
+        if frame is None:
+            frame = getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            if awaitable is not None and labels:
+                labels.append(f"<{type(awaitable).__name__}>")
+            break
+        labels.append(_frame_label(frame))
+        if hasattr(awaitable, "cr_await"):
+            awaitable = awaitable.cr_await
+        else:
+            awaitable = getattr(awaitable, "gi_yieldfrom", None)
+    return labels
+
+
+@dataclass
+class Profile:
+    interval: float
+    duration: float = 0.0
+    samples: int = 0  # Sampling rounds taken
+    stacks: Counter = field(default_factory=Counter)  # Stack -> number of samples
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format."""
+        lines = [
+            f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def speedscope(self, name: str = "api-msj") -> Dict[str, Any]:
+        """speedscope file format: a sampled profile per thread, plus one for tasks."""
+        frames: List[Dict[str, str]] = []
+        index: Dict[str, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for stack, count in self.stacks.items():
+            root, rest = stack[0], stack[1:]
+            ids = []
+            for label in rest:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+                ids.append(index[label])
+            profile = profiles.setdefault(root, {
+                "type": "sampled", "name": root, "unit": "seconds",
+                "startValue": 0, "endValue": self.duration,
+                "samples": [], "weights": [],
+            })
+            profile["samples"].append(ids)
+            profile["weights"].append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "api-msj",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+
+class SamplingProfiler:
+    """Samples thread and task stacks for a bounded time; one profile at a time."""
+
+    def __init__(self, interval: float = 0.005, max_seconds: float = 60.0):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(
+        self, seconds: float, interval: Optional[float] = None
+    ) -> Profile:
+        """
+        Profile the calling event loop (and every thread) for `seconds`.
+
+        Raises:
+            ProfilerBusy: if another profile is in progress
+            ValueError: if seconds is not within (0, max_seconds]
+        """
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be within (0, {self.max_seconds}]")
+        if self._running:
+            raise ProfilerBusy("A profile is already running")
+        self._running = True
+        try:
+            loop = asyncio.get_running_loop()
+            return await asyncio.to_thread(
+                self._sample_for,
+                loop,
+                threading.get_ident(),
+                seconds,
+                interval or self.interval,
+            )
+        finally:
+            self._running = False
+
+    def _sample_for(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        loop_thread_id: int,
+        seconds: float,
+        interval: float,
+    ) -> Profile:
+        """Runs in a worker thread until the deadline."""
+        me = threading.get_ident()
+        profile = Profile(interval=interval)
+        # The loop thread is still inside to_thread starting this thread until it runs a
+        # callback; walking its frames mid Thread.start can crash CPython 3.11
+        capture = self._schedule_capture(loop)
+        concurrent.futures.wait([capture], timeout=seconds)
+        started = time.monotonic()
+        deadline = started + seconds
+        next_tick = started
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id == loop_thread_id:
+                    root = "event-loop"
+                else:
+                    root = names.get(thread_id, str(thread_id))
+                profile.stacks[(f"thread:{root}", *_thread_stack(frame))] += 1
+            # At most one task capture queued on the loop: a blocked loop does not
+            # pile them up
+            if capture.done():
+                profile.stacks.update(capture.result())
+                capture = self._schedule_capture(loop)
+            profile.samples += 1
+
+            next_tick += interval
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            # Skip ticks missed while the GIL was held elsewhere instead of bursting
+            if next_tick < now:
+                next_tick = now
+            time.sleep(min(next_tick, deadline) - now)
+        if capture.done() or not capture.cancel():
+            profile.stacks.update(capture.result())
+        profile.duration = time.monotonic() - started
+        return profile
+
+    def _schedule_capture(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> concurrent.futures.Future:
+        capture: concurrent.futures.Future = concurrent.futures.Future()
+        loop.call_soon_threadsafe(self._capture_tasks, loop, capture)
+        return capture
+
+    @staticmethod
+    def _capture_tasks(
+        loop: asyncio.AbstractEventLoop, capture: concurrent.futures.Future
+    ) -> None:
+        """Runs on the loop thread: await chains of the loop's pending tasks."""
+        if not capture.set_running_or_notify_cancel():
+            return
+        stacks: Counter = Counter()
+        try:
+            for task in asyncio.all_tasks(loop):
+                stack = _task_stack(task)
+                if stack:
+                    stacks[("asyncio-tasks", *stack)] += 1
+        finally:
+            capture.set_result(stacks)
+
+
+# Global profiler, driven from the admin router
+profiler = SamplingProfiler(
+    interval=settings.profiler_interval, max_seconds=settings.profiler_max_seconds
+)
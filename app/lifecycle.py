@@ -0,0 +1,80 @@
+"""
+Process lifecycle: in-flight delivery tracking and graceful drain.
+
+Every delivery (SMTP session, WhatsApp API call) registers itself while it runs.
+When the process is asked to stop, new sends are rejected with 503 and shutdown
+waits, up to a deadline, for the registered deliveries to finish.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryTracker:
+    """Counts in-flight deliveries and tracks whether the process is draining."""
+
+    def __init__(self) -> None:
+        self._inflight = 0
+        self._drain_started: Optional[float] = None
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @property
+    def draining(self) -> bool:
+        return self._drain_started is not None
+
+    def begin_drain(self) -> None:
+        """Stop accepting new sends. Idempotent; the first call starts the deadline."""
+        if self._drain_started is None:
+            self._drain_started = time.monotonic()
+            logger.info(f"Draining: {self._inflight} delivery(ies) in flight")
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Register one delivery for the duration of the block."""
+        self._inflight += 1
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Wait until no delivery is in flight.
+
+        The deadline is measured from begin_drain() (or from now if not draining),
+        so time already spent by the server draining HTTP connections counts.
+
+        Returns:
+            True if everything drained, False if the deadline passed first
+        """
+        started = self._drain_started
+        if started is None:
+            started = time.monotonic()
+        deadline = started + timeout
+        while self._inflight:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+
+# Global tracker shared by services and routers of this process
+delivery_tracker = DeliveryTracker()
+
+
+def reject_when_draining() -> None:
+    """Dependency: refuse new sends with 503 once the process is shutting down."""
+    if delivery_tracker.draining:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is shutting down; retry the request",
+        )
@@ -0,0 +1,177 @@
+"""
+Non-blocking logging pipeline.
+
+Loggers never touch the output stream: records are put on a bounded in-memory
+queue and a background thread (QueueListener) formats and writes them. When
+the writer falls behind and the queue is full, new records are dropped and
+counted (`log_records_dropped_total`) rather than stalling the event loop.
+
+Records are JSON objects, one per line (LOG_FORMAT=text for the classic
+format). Besides the standard fields they carry the fields bound with
+`log_context` (request_id, email_id...) and any `extra={...}` passed to the
+logging call.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+
+from app.metrics import metrics
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Loggers that uvicorn configures with its own (synchronous) handlers
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Attributes of every LogRecord; anything else on a record came from `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime"
+}
+
+_plain = logging.Formatter()
+
+# Fields added to every record logged in the current context
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+records_dropped = metrics.counter(
+    "log_records_dropped_total",
+    "Log records discarded because the log queue was full, by level",
+)
+
+
+def current_log_context() -> Dict[str, Any]:
+    return _log_context.get()
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Attach `fields` to every record logged inside the block (and tasks it starts)."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue: stamps the log context on the record in
+    the calling thread and drops the record (counted) when the queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now: they may not survive until the
+        # writer runs
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain.formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc(level=record.levelname)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and context fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        exc_text = record.exc_text
+        if record.exc_info:
+            exc_text = self.formatException(record.exc_info)
+        if exc_text:
+            entry["exc_info"] = exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LogPipeline:
+    """The queue, its handler and the background writer thread."""
+
+    def __init__(self, handler: logging.Handler, queue_size: int = 10_000):
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.handler = ContextQueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, handler, respect_handler_level=True)
+
+    def start(self) -> None:
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Write out the records still queued and stop the writer thread."""
+        if getattr(self.listener, "_thread", None) is not None:
+            self.listener.stop()
+
+    def collect(self):
+        yield "log_queue_depth", {}, float(self.queue.qsize())
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def configure_logging(
+    level: str = "INFO", fmt: str = "json", queue_size: int = 10_000
+) -> LogPipeline:
+    """
+    Route the root logger and uvicorn's loggers through a fresh pipeline
+    writing to stderr. Replaces (and stops) a previously configured one.
+    """
+    global _pipeline
+    stream = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        stream.setFormatter(JSONFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+    pipeline = LogPipeline(stream, queue_size)
+
+    root = logging.getLogger()
+    if _pipeline is not None:
+        root.removeHandler(_pipeline.handler)
+        _pipeline.stop()
+    else:
+        metrics.register_collector(
+            lambda: _pipeline.collect() if _pipeline is not None else ()
+        )
+        atexit.register(stop_logging)
+    root.addHandler(pipeline.handler)
+    root.setLevel(level.upper())
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    pipeline.start()
+    _pipeline = pipeline
+    return pipeline
+
+
+def stop_logging() -> None:
+    """Flush and stop the background writer (shutdown; also registered with atexit)."""
+    if _pipeline is not None:
+        _pipeline.stop()
@@ -1,19 +1,28 @@
 import logging
-import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.openapi.utils import get_openapi
 
+from app.auth import verify_api_key
 from app.config import settings
-from app.routers import email, whatsapp
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from app.diagnostics import loop_monitor
+from app.lifecycle import delivery_tracker
+from app.logging_config import configure_logging
+from app.metrics import metrics
+from app.middleware import CompressionMiddleware, RequestContextMiddleware
+from app.responses import FastJSONResponse
+from app.routers import admin, email, notify, stream, whatsapp
+from app.services.email_service import email_service
+from app.services.outbound import prewarm
+from app.services.readiness import readiness
+from app.services.scheduler import scheduler
+from app.services.whatsapp_service import whatsapp_service
+
+# Configure logging (queued, written by a background thread)
+configure_logging(settings.log_level, settings.log_format, settings.log_queue_size)
 logger = logging.getLogger(__name__)
 
 # Docs only when enabled (disable in production via ENABLE_OPENAPI_DOCS=false)
@@ -21,6 +30,35 @@ docs_url = "/docs" if settings.enable_openapi_docs else None
 redoc_url = "/redoc" if settings.enable_openapi_docs else None
 openapi_url = "/openapi.json" if settings.enable_openapi_docs else None
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks. On shutdown, drain in-flight deliveries first."""
+    loop_monitor.start()
+    if settings.outbound_prewarm:
+        await prewarm(
+            email_service.prewarm(),
+            whatsapp_service.prewarm(timeout=settings.readiness_timeout),
+            timeout=settings.outbound_prewarm_timeout,
+        )
+    readiness.start()
+    await scheduler.start()
+    yield
+    delivery_tracker.begin_drain()
+    await scheduler.stop()
+    if whatsapp_service.coalescer is not None:
+        await whatsapp_service.coalescer.flush_all()
+    await readiness.stop()
+    if not await delivery_tracker.wait_idle(settings.shutdown_drain_timeout):
+        logger.warning(
+            f"Shutdown deadline reached with {delivery_tracker.inflight} "
+            "delivery(ies) in flight"
+        )
+    await email_service.close()
+    await whatsapp_service.close()
+    await loop_monitor.stop()
+
+
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
@@ -31,8 +69,15 @@ app = FastAPI(
     openapi_tags=[
         {"name": "email", "description": "Envío de correos electrónicos"},
         {"name": "whatsapp", "description": "Envío de mensajes WhatsApp"},
+        {
+            "name": "notify",
+            "description": "Notificaciones multicanal (correo y WhatsApp en paralelo)",
+        },
+        {"name": "admin", "description": "Diagnóstico del proceso en ejecución"},
     ],
     contact={"name": "API Ofertame", "url": "", "email": ""},
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -44,15 +89,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.response_compression:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=settings.response_compression_min_bytes
+    )
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time header to responses."""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+# Outermost: request id, timing headers and request metrics
+app.add_middleware(RequestContextMiddleware)
 
 
 @app.exception_handler(Exception)
@@ -87,9 +130,27 @@ def health_check():
     }
 
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Global readiness probe (no auth required): cached SMTP and WhatsApp provider checks.
+    Returns 503 while any enabled provider is unreachable or the process is draining.
+    """
+    return readiness.response()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint(_: None = Depends(verify_api_key)):
+    """Process metrics in the Prometheus text format (API Key required)."""
+    return metrics.render()
+
+
 # Include routers under /api/v1
 app.include_router(email.router, prefix="/api/v1")
 app.include_router(whatsapp.router, prefix="/api/v1")
+app.include_router(notify.router, prefix="/api/v1")
+app.include_router(stream.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
 
 
 def custom_openapi():
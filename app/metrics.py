@@ -0,0 +1,101 @@
+"""
+In-process metrics registry rendered in the Prometheus text format (GET /metrics).
+
+Counters and gauges are updated by the code that owns them; collectors are
+callables sampled at scrape time for values that already live elsewhere (pool
+sizes, circuit states...). Each worker process exposes its own values.
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]  # (metric name, labels, value)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{k}="{_escape(str(v))}"' for k, v in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[LabelKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = self._metrics.setdefault(name, Counter(name, help))
+        assert isinstance(metric, Counter)
+        return metric
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        metric = self._metrics.setdefault(name, Gauge(name, help))
+        assert isinstance(metric, Gauge)
+        return metric
+
+    def register_collector(self, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Register a callable sampled at scrape time yielding (name, labels, value)."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in metric.samples():
+                lines.append(f"{metric.name}{_format_labels(key)} {value}")
+        collected: Dict[str, List[str]] = {}
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                collected.setdefault(name, []).append(
+                    f"{name}{_format_labels(sorted(labels.items()))} {value}"
+                )
+        for name, samples in collected.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+# Global registry for this process
+metrics = MetricsRegistry()
@@ -0,0 +1,5 @@
+# ASGI middleware package
+from .compression import CompressionMiddleware
+from .request_context import RequestContextMiddleware
+
+__all__ = ["CompressionMiddleware", "RequestContextMiddleware"]
@@ -0,0 +1,114 @@
+"""
+Per-request context as pure ASGI middleware: request id, caller auth status,
+timing headers and request metrics.
+
+Replaces an `@app.middleware("http")` function, which runs through Starlette's
+BaseHTTPMiddleware (an extra task and a body stream per request). Here the
+request runs in the server's task and the only work per request is reading a
+few headers and wrapping `send`.
+"""
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional
+
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import auth_status
+from app.logging_config import log_context
+from app.metrics import metrics
+
+requests_total = metrics.counter(
+    "http_requests_total",
+    "HTTP requests served, by method, route template, status and caller auth",
+)
+request_seconds_total = metrics.counter(
+    "http_request_duration_seconds_total",
+    "Time spent serving HTTP requests, by method and route template",
+)
+
+
+def route_templates(routes: Iterable[Any], prefix: str = "") -> Dict[Any, str]:
+    """
+    Path template of every endpoint, mounted sub-applications included; when
+    several routes share an endpoint, the first one wins.
+    """
+    templates: Dict[Any, str] = {}
+    for route in routes:
+        if isinstance(route, Mount):
+            mounted = route_templates(route.routes, prefix + route.path)
+            for endpoint, path in mounted.items():
+                templates.setdefault(endpoint, path)
+        elif getattr(route, "endpoint", None) is not None:
+            templates.setdefault(route.endpoint, prefix + route.path)
+    return templates
+
+
+class RequestContextMiddleware:
+    """
+    Sets X-Request-ID (the caller's, or a new one) and X-Process-Time (seconds to
+    the response start) on every HTTP response, binds the request id to the log
+    context, stores the caller's auth status in `request.state.auth` and counts
+    requests and their duration.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._templates: Dict[Any, str] = {}
+
+    def route_template(self, scope: Scope) -> str:
+        """Template of the answering route (e.g. /items/{item_id}), or "unmatched"."""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None and "app" in scope:
+            # Built on first use and again when routes were added since
+            self._templates = route_templates(scope["app"].routes)
+            template = self._templates.get(endpoint)
+        return template or "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id: Optional[str] = None
+        x_api_key: Optional[str] = None
+        authorization: Optional[str] = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+            elif name == b"x-api-key":
+                x_api_key = value.decode("latin-1")
+            elif name == b"authorization":
+                authorization = value.decode("latin-1")
+        request_id = request_id or uuid.uuid4().hex
+        auth = auth_status(x_api_key, authorization)
+        scope.setdefault("state", {})["auth"] = auth
+        status = 500  # Reported when the app fails before starting a response
+
+        async def send_with_context(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                elapsed = str(time.perf_counter() - start)
+                headers.append((b"x-process-time", elapsed.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            with log_context(request_id=request_id):
+                await self.app(scope, receive, send_with_context)
+        finally:
+            route = self.route_template(scope)
+            method = scope["method"]
+            requests_total.inc(
+                method=method, route=route, status=str(status), auth=auth
+            )
+            request_seconds_total.inc(
+                time.perf_counter() - start, method=method, route=route
+            )
@@ -0,0 +1,127 @@
+"""
+MessagePack request and response bodies, negotiated per request.
+
+Routes built with `NegotiatedRoute` accept `Content-Type: application/msgpack`
+bodies and answer in MessagePack when the caller's Accept header prefers it.
+A MessagePack body is decoded once into Python objects that FastAPI validates
+into the route's schema exactly like a parsed JSON body; responses are packed
+from the same data `FastJSONResponse` would serialize, without a JSON pass.
+Requires the optional `msgpack` package; without it MessagePack bodies are
+rejected with 415 and every response stays JSON.
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Dict
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from pydantic_core import to_jsonable_python
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # Optional: pip install msgpack
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+JSON_RANGES = ("application/json", "application/*", "*/*")
+
+# Set for the duration of a request whose response should be MessagePack
+respond_msgpack: ContextVar[bool] = ContextVar("respond_msgpack", default=False)
+
+
+def is_msgpack(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def parse_accept(value: str) -> Dict[str, float]:
+    """
+    Accept header as {media range: q}.
+
+    Media type parameters (charset...) may come before q, so every parameter is
+    scanned for it; a range listed more than once keeps its highest q.
+    """
+    ranges: Dict[str, float] = {}
+    for item in value.split(","):
+        media_range, *params = item.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, param_value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(param_value.strip())
+                except ValueError:
+                    q = 0.0
+                break
+        ranges[media_range] = max(q, ranges.get(media_range, 0.0))
+    return ranges
+
+
+def prefers_msgpack(accept: str) -> bool:
+    """True when the Accept header ranks MessagePack at least as high as JSON."""
+    ranges = parse_accept(accept)
+    msgpack_q = max((ranges.get(t, 0.0) for t in MSGPACK_TYPES), default=0.0)
+    json_q = max((ranges.get(r, 0.0) for r in JSON_RANGES), default=0.0)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def pack(content: Any) -> bytes:
+    """MessagePack encoding of what `FastJSONResponse` would render as JSON."""
+    if msgpack is None:
+        raise RuntimeError("MessagePack responses require the msgpack package")
+    return msgpack.packb(to_jsonable_python(content), use_bin_type=True)
+
+
+async def _msgpack_request(request: Request) -> Request:
+    """
+    The same request as FastAPI's JSON body path sees it: a JSON content type
+    and the MessagePack body already decoded as its parsed JSON.
+    """
+    if msgpack is None:
+        raise HTTPException(
+            status_code=415,
+            detail="MessagePack bodies are not supported (msgpack not installed)",
+        )
+    body = await request.body()
+    try:
+        decoded = None
+        if body:
+            decoded = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    except (ValueError, msgpack.UnpackException) as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid MessagePack body: {str(e)}"
+        )
+    scope = dict(request.scope)
+    scope["headers"] = [
+        (b"content-type", b"application/json")
+        if name == b"content-type"
+        else (name, value)
+        for name, value in request.scope["headers"]
+    ]
+    negotiated = Request(scope, request.receive)
+    negotiated._body = body
+    negotiated._json = decoded
+    return negotiated
+
+
+class NegotiatedRoute(APIRoute):
+    """APIRoute that also speaks MessagePack (request bodies, negotiated responses)."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type", "")):
+                request = await _msgpack_request(request)
+            wants_msgpack = prefers_msgpack(request.headers.get("accept", ""))
+            token = respond_msgpack.set(msgpack is not None and wants_msgpack)
+            try:
+                return await handler(request)
+            finally:
+                respond_msgpack.reset(token)
+
+        return negotiated_handler
@@ -0,0 +1,28 @@
+"""
+JSON responses serialized by pydantic-core.
+
+`ModelResponse` renders models (or lists/dicts of them) straight to JSON bytes
+with pydantic's Rust serializer. Endpoints that return it skip FastAPI's
+jsonable_encoder pass and the re-validation against `response_model`, which
+stays on the route for the OpenAPI schema only. `FastJSONResponse` is the
+default response class for everything else. Both render MessagePack instead
+when the route negotiated it (see app.negotiation).
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+from app.negotiation import MSGPACK_MEDIA_TYPE, pack, respond_msgpack
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if respond_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return pack(content)
+        return to_json(content)
+
+
+class ModelResponse(FastJSONResponse):
+    """Response for content built from our own (already valid) models."""
@@ -0,0 +1,147 @@
+from datetime import datetime
+from enum import Enum
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.auth import verify_api_key
+from app.config import settings
+from app.diagnostics import ProfilerBusy, profiler
+from app.lifecycle import reject_when_draining
+from app.responses import FastJSONResponse, ModelResponse
+from app.schemas.dead_letter_schema import (
+    DeadLetterEntry, DeadLetterReplayRequest, DeadLetterReplayStatus, DeadLetterStatus,
+    FailureClass,
+)
+from app.schemas.error_schemas import ErrorDetail
+from app.services.dead_letters import dead_letters
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/admin", tags=["admin"], dependencies=[Depends(verify_api_key)]
+)
+
+COMMON_RESPONSES = {
+    401: {"model": ErrorDetail, "description": "Invalid or missing API Key"},
+    500: {"model": ErrorDetail, "description": "Internal server error"},
+}
+
+
+class ProfileFormat(str, Enum):
+    COLLAPSED = "collapsed"
+    SPEEDSCOPE = "speedscope"
+
+
+@router.get(
+    "/profile",
+    responses={
+        200: {
+            "content": {"text/plain": {}, "application/json": {}},
+            "description": "Profile",
+        },
+        409: {"model": ErrorDetail, "description": "A profile is already running"},
+        **COMMON_RESPONSES,
+    },
+)
+async def profile(
+    seconds: float = Query(
+        10.0, gt=0, le=settings.profiler_max_seconds, description="Profile duration"
+    ),
+    interval_ms: float = Query(
+        settings.profiler_interval * 1000,
+        ge=1,
+        le=1000,
+        description="Milliseconds between samples",
+    ),
+    format: ProfileFormat = Query(
+        ProfileFormat.COLLAPSED, description="collapsed or speedscope"
+    ),
+):
+    """
+    Sample this worker process for `seconds` and return where its time went.
+
+    Every thread's wall-clock stack and every asyncio task's await chain are
+    sampled; the collapsed output loads in speedscope or flamegraph.pl. With
+    several workers, each request profiles only the worker that serves it.
+    """
+    try:
+        result = await profiler.profile(seconds, interval=interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(
+        f"Profiled {result.duration:.1f}s: {result.samples} samples, "
+        f"{len(result.stacks)} stacks"
+    )
+    if format == ProfileFormat.SPEEDSCOPE:
+        return FastJSONResponse(result.speedscope())
+    return PlainTextResponse(result.collapsed())
+
+
+@router.get(
+    "/dead-letters",
+    response_model=List[DeadLetterEntry],
+    responses=COMMON_RESPONSES,
+)
+async def list_dead_letters(
+    channel: Optional[str] = Query(None, description="email or whatsapp"),
+    error_class: Optional[FailureClass] = None,
+    status: DeadLetterStatus = DeadLetterStatus.FAILED,
+    since: Optional[datetime] = Query(
+        None, description="Failed at or after (UTC if no offset)"
+    ),
+    until: Optional[datetime] = Query(
+        None, description="Failed before (UTC if no offset)"
+    ),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Failed sends kept for replay, oldest first, with their failure class and
+    original request.
+    """
+    letters = await dead_letters.entries(
+        channel=channel, error_class=error_class, status=status,
+        since=since, until=until, limit=limit, offset=offset,
+    )
+    return ModelResponse([DeadLetterEntry(**letter.to_dict()) for letter in letters])
+
+
+@router.post(
+    "/dead-letters/replay",
+    dependencies=[Depends(reject_when_draining)],
+    response_model=DeadLetterReplayStatus,
+    status_code=202,
+    responses=COMMON_RESPONSES,
+)
+async def replay_dead_letters(replay: DeadLetterReplayRequest):
+    """
+    Re-send the selected dead letters through the normal delivery path, in the
+    background.
+
+    Entries are sent `batch_size` at a time at no more than `rate` per second
+    (DEAD_LETTER_REPLAY_BATCH_SIZE / DEAD_LETTER_REPLAY_RATE by default). A
+    delivered entry is marked replayed; one that fails again stays failed with
+    one more attempt. Follow progress with GET /dead-letters/replays/{replay_id}.
+    """
+    return ModelResponse(await dead_letters.start_replay(replay), status_code=202)
+
+
+@router.get(
+    "/dead-letters/replays/{replay_id}",
+    response_model=DeadLetterReplayStatus,
+    responses={
+        404: {"model": ErrorDetail, "description": "Unknown replay"},
+        **COMMON_RESPONSES,
+    },
+)
+async def replay_status(replay_id: str):
+    """
+    Progress of a replay started by this worker process.
+    """
+    status = dead_letters.replay_status(replay_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return ModelResponse(status)
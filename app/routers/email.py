@@ -1,15 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, Body, HTTPException, Depends, Request
+from typing import Any, Dict, List
 import logging
 
 from app.auth import verify_api_key
-from app.schemas.email_schema import EmailRequest, EmailResponse, EmailStatus
+from app.lifecycle import reject_when_draining
+from app.negotiation import NegotiatedRoute
+from app.responses import ModelResponse
+from app.schemas.email_schema import AttachmentInfo, EmailRequest, EmailResponse
 from app.schemas.error_schemas import ErrorDetail
-from app.services.email_service import email_service
+from app.services.blob_store import BlobNotFound, BlobTooLarge, blob_store
+from app.services.bulk_validation import validate_bulk
+from app.services.email_service import ATTACHMENT_NOT_FOUND, email_service
+from app.services.readiness import readiness
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/email", tags=["email"])
+router = APIRouter(prefix="/email", tags=["email"], route_class=NegotiatedRoute)
 
 COMMON_RESPONSES = {
     401: {"model": ErrorDetail, "description": "Invalid or missing API Key"},
@@ -19,8 +25,13 @@ COMMON_RESPONSES = {
 
 @router.post(
     "/send",
+    dependencies=[Depends(reject_when_draining)],
     response_model=EmailResponse,
-    responses={400: {"model": ErrorDetail, "description": "Bad Request"}, **COMMON_RESPONSES},
+    responses={
+        400: {"model": ErrorDetail, "description": "Bad Request"},
+        422: {"model": ErrorDetail, "description": "Attachment not found"},
+        **COMMON_RESPONSES,
+    },
 )
 async def send_email(
     email_request: EmailRequest,
@@ -40,11 +51,11 @@ async def send_email(
         
         if not response.success:
             raise HTTPException(
-                status_code=500,
+                status_code=422 if response.message == ATTACHMENT_NOT_FOUND else 500,
                 detail=response.error_details or "Failed to send email"
             )
         
-        return response
+        return ModelResponse(response)
         
     except HTTPException:
         raise
@@ -58,21 +69,29 @@ async def send_email(
 
 @router.post(
     "/send-bulk",
+    dependencies=[Depends(reject_when_draining)],
     response_model=List[EmailResponse],
     responses={400: {"model": ErrorDetail, "description": "Bad Request"}, **COMMON_RESPONSES},
+    openapi_extra={"requestBody": {"content": {"application/json": {"schema": {
+        "type": "array", "items": {"$ref": "#/components/schemas/EmailRequest"}
+    }}}}},
 )
 async def send_bulk_emails(
-    email_requests: List[EmailRequest],
+    email_requests: List[Dict[str, Any]] = Body(...),
     _: None = Depends(verify_api_key),
 ):
     """
     Send multiple emails concurrently.
     
+    Items are validated one by one (addresses through a memoized validator); an
+    invalid item gets an unsuccessful response at its position instead of
+    rejecting the whole batch.
+
     Args:
-        email_requests: List of email requests
+        email_requests: List of email requests (EmailRequest objects)
         
     Returns:
-        List of EmailResponse with success status for each email
+        List of EmailResponse with success status for each email, in request order
     """
     try:
         if not email_requests:
@@ -87,8 +106,18 @@ async def send_bulk_emails(
                 detail="Maximum 100 emails allowed per bulk request"
             )
         
-        responses = await email_service.send_bulk_emails(email_requests)
-        return responses
+        validated = validate_bulk(email_requests)
+        valid = [item for item in validated if isinstance(item, EmailRequest)]
+        sent = iter(await email_service.send_bulk_emails(valid) if valid else [])
+
+        return ModelResponse([
+            next(sent) if isinstance(item, EmailRequest) else EmailResponse(
+                success=False,
+                message="Invalid email request",
+                error_details=item
+            )
+            for item in validated
+        ])
         
     except HTTPException:
         raise
@@ -100,6 +129,55 @@ async def send_bulk_emails(
         )
 
 
+@router.post(
+    "/attachments",
+    response_model=AttachmentInfo,
+    status_code=201,
+    responses={
+        413: {"model": ErrorDetail, "description": "Attachment too large"},
+        **COMMON_RESPONSES,
+    },
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/octet-stream": {"schema": {"type": "string", "format": "binary"}}
+    }}},
+)
+async def upload_attachment(
+    request: Request,
+    _: None = Depends(verify_api_key),
+):
+    """
+    Upload an attachment as the raw request body.
+
+    The body is streamed to the content-addressed blob store while it is hashed;
+    reference the returned sha256 from EmailRequest.attachments.
+
+    Returns:
+        AttachmentInfo with the content hash and size
+    """
+    try:
+        return await blob_store.put_stream(request.stream())
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.get(
+    "/attachments/{sha256}",
+    response_model=AttachmentInfo,
+    responses={
+        404: {"model": ErrorDetail, "description": "Attachment not found"},
+        **COMMON_RESPONSES,
+    },
+)
+async def attachment_info(sha256: str, _: None = Depends(verify_api_key)):
+    """
+    Metadata of a stored attachment.
+    """
+    try:
+        return blob_store.info(sha256)
+    except BlobNotFound:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+
 @router.get("/health")
 async def email_health_check():
     """
@@ -120,4 +198,25 @@ async def email_health_check():
         raise HTTPException(
             status_code=503,
             detail="Email service is not healthy"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/providers", responses=COMMON_RESPONSES)
+async def email_providers(_: None = Depends(verify_api_key)):
+    """
+    SMTP providers with their routing weight, observed latency, circuit state and
+    pool usage, plus recipient domains with sends in flight or paused by deferrals.
+    """
+    return ModelResponse({
+        "providers": email_service.router.stats(),
+        "domains": email_service.domain_throttle.stats(),
+    })
+
+
+@router.get("/ready")
+async def email_readiness_check():
+    """
+    Readiness probe for email: last cached result of an SMTP NOOP on a pooled session.
+    Never calls the provider in the request path; returns 503 when not ready.
+    """
+    return readiness.response("smtp")
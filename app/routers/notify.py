@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Body, HTTPException, Depends
+from typing import Any, Dict, List
+import logging
+
+from pydantic import ValidationError
+
+from app.auth import verify_api_key
+from app.lifecycle import reject_when_draining
+from app.negotiation import NegotiatedRoute
+from app.responses import ModelResponse
+from app.schemas.error_schemas import ErrorDetail
+from app.schemas.notification_schema import NotificationRequest, NotificationResponse
+from app.services.bulk_validation import format_validation_error
+from app.services.notification_service import notification_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/notify", tags=["notify"], route_class=NegotiatedRoute)
+
+COMMON_RESPONSES = {
+    401: {"model": ErrorDetail, "description": "Invalid or missing API Key"},
+    500: {"model": ErrorDetail, "description": "Internal server error"},
+}
+
+
+@router.post(
+    "",
+    dependencies=[Depends(reject_when_draining)],
+    response_model=NotificationResponse,
+    responses=COMMON_RESPONSES,
+)
+async def notify(
+    request: NotificationRequest,
+    _: None = Depends(verify_api_key),
+):
+    """
+    Notify one recipient on several channels at once.
+
+    The channels in `channels` are sent concurrently; `fallback` names the channel
+    to try when one of them fails (e.g. {"whatsapp": "email"}). Always answers 200
+    with one result per channel tried: `success` is true when at least one
+    channel delivered or was scheduled.
+    """
+    try:
+        return ModelResponse(await notification_service.notify(request))
+    except Exception as e:
+        logger.error(f"Unexpected error in notify endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post(
+    "/bulk",
+    dependencies=[Depends(reject_when_draining)],
+    response_model=List[NotificationResponse],
+    responses={
+        400: {"model": ErrorDetail, "description": "Bad Request"}, **COMMON_RESPONSES
+    },
+    openapi_extra={"requestBody": {"content": {"application/json": {"schema": {
+        "type": "array", "items": {"$ref": "#/components/schemas/NotificationRequest"}
+    }}}}},
+)
+async def notify_bulk(
+    requests: List[Dict[str, Any]] = Body(...),
+    _: None = Depends(verify_api_key),
+):
+    """
+    Send multiple notifications concurrently.
+
+    Items are validated one by one; an invalid item gets an unsuccessful response
+    at its position instead of rejecting the whole batch.
+    """
+    if not requests:
+        raise HTTPException(
+            status_code=400, detail="At least one notification is required"
+        )
+    if len(requests) > 100:
+        raise HTTPException(
+            status_code=400,
+            detail="Maximum 100 notifications allowed per bulk request",
+        )
+
+    validated = []
+    for item in requests:
+        try:
+            validated.append(NotificationRequest.model_validate(item))
+        except ValidationError as e:
+            validated.append(format_validation_error(e))
+    try:
+        valid = [item for item in validated if isinstance(item, NotificationRequest)]
+        sent = iter(await notification_service.notify_bulk(valid) if valid else [])
+        return ModelResponse([
+            next(sent)
+            if isinstance(item, NotificationRequest)
+            else NotificationResponse(success=False, error_details=item)
+            for item in validated
+        ])
+    except Exception as e:
+        logger.error(f"Unexpected error in notify_bulk endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
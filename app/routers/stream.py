@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+import json
+import logging
+from typing import Any, Optional
+
+from fastapi import (
+    APIRouter, Header, HTTPException, WebSocket, WebSocketDisconnect, status
+)
+from pydantic_core import to_json
+
+from app.auth import verify_api_key
+from app.config import settings
+from app.lifecycle import delivery_tracker
+from app.negotiation import msgpack, pack
+from app.services.submission_stream import SubmissionSession
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+
+def _decode(message: dict, binary: bool) -> Any:
+    """Client frame as Python objects; None when it cannot be decoded."""
+    try:
+        if message.get("text") is not None:
+            return json.loads(message["text"])
+        if binary and message.get("bytes") is not None:
+            return msgpack.unpackb(message["bytes"], raw=False)
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+async def _read(websocket: WebSocket, session: SubmissionSession, binary: bool) -> None:
+    """Handle client frames until the client leaves or keeps sending refused frames."""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            session.handle(_decode(message, binary))
+            if session.misbehaving:
+                await websocket.close(
+                    code=status.WS_1008_POLICY_VIOLATION,
+                    reason=f"{session.refused_in_a_row} frames refused in a row",
+                )
+                return
+    except WebSocketDisconnect:
+        pass
+
+
+async def _write(
+    websocket: WebSocket, session: SubmissionSession, binary: bool
+) -> None:
+    while True:
+        frame = await session.outgoing.get()
+        if binary:
+            await websocket.send_bytes(pack(frame))
+        else:
+            await websocket.send_text(to_json(frame).decode("utf-8"))
+
+
+@router.websocket("")
+async def submission_stream(
+    websocket: WebSocket,
+    x_api_key: Optional[str] = Header(None, alias="X-API-Key"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Persistent submission channel for trusted backends.
+
+    Authenticated like the HTTP API (X-API-Key or Authorization: Bearer on the
+    handshake). See app.services.submission_stream for the frame protocol;
+    each connection starts with STREAM_CREDITS credits.
+    """
+    try:
+        verify_api_key(x_api_key, authorization)
+    except HTTPException as e:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail)
+        )
+        return
+    if delivery_tracker.draining:
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason="Service is shutting down"
+        )
+        return
+
+    subprotocols = websocket.scope.get("subprotocols", [])
+    binary = msgpack is not None and MSGPACK_SUBPROTOCOL in subprotocols
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
+    session = SubmissionSession(settings.stream_credits, settings.stream_max_refusals)
+    session.outgoing.put_nowait(session.ready())
+    reader = asyncio.create_task(_read(websocket, session, binary))
+    writer = asyncio.create_task(_write(websocket, session, binary))
+    try:
+        # The writer only ends when a send fails: stop reading frames nobody will answer
+        await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if writer.done() and not writer.cancelled() and writer.exception() is not None:
+            logger.info(
+                f"Stream connection lost while writing: {str(writer.exception())}"
+            )
+            with contextlib.suppress(Exception):  # Usually already gone
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        reader.cancel()
+        writer.cancel()
+        await asyncio.gather(reader, writer, return_exceptions=True)
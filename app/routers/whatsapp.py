@@ -1,17 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends
-import urllib.request
-import urllib.parse
-import json
 import logging
-import os
 from app.auth import verify_api_key
 from app.config import settings
+from app.lifecycle import reject_when_draining
+from app.negotiation import NegotiatedRoute
+from app.responses import ModelResponse
 from app.schemas.whatsapp_schema import WhatsAppRequest, WhatsAppResponse
 from app.schemas.error_schemas import ErrorDetail
+from app.services.readiness import readiness
+from app.services.whatsapp_service import (
+    GRAPH_API_VERSION, TEMPLATE_LANGUAGE, TEMPLATE_NAME, whatsapp_service
+)
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=NegotiatedRoute)
 
 COMMON_RESPONSES = {
     401: {"model": ErrorDetail, "description": "Invalid or missing API Key"},
@@ -20,6 +23,7 @@ COMMON_RESPONSES = {
 
 @router.post(
     "/send-whatsapp",
+    dependencies=[Depends(reject_when_draining)],
     response_model=WhatsAppResponse,
     responses=COMMON_RESPONSES,
 )
@@ -27,99 +31,8 @@ async def send_whatsapp(
     request: WhatsAppRequest,
     _: None = Depends(verify_api_key),
 ):
-    # Verificar si WhatsApp está activado
-    if not settings.activar_whatsapp:
-        return WhatsAppResponse(
-            success=False,
-            message="La funcionalidad de whatsapp esta desactivada"
-        )
-    if not settings.whatsapp_token or not settings.whatsapp_url:
-        return WhatsAppResponse(
-            success=False,
-            message="WhatsApp no está configurado (faltan WHATSAPP_TOKEN o WHATSAPP_URL)"
-        )
-
     try:
-        # Use v22.0 as per the working documentation
-        url = f"https://graph.facebook.com/v22.0/{settings.whatsapp_url}/messages"
-        
-        # Prepare headers
-        headers = {
-            "Authorization": f"Bearer {settings.whatsapp_token}",
-            "Content-Type": "application/json"
-        }
-        
-        # Build payload with the notificar_oferta template
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": request.telefono,
-            "type": "template",
-            "template": {
-                "name": "notificar_oferta",
-                "language": { "code": "es_CO" },
-                "components": [
-                    {
-                        "type": "header",
-                        "parameters": [
-                            {
-                                "type": "image",
-                                "image": {
-                                    "link": "https://v0-ofertame-app.vercel.app/logo.png"
-                                }
-                            }
-                        ]
-                    },
-                    {
-                        "type": "body",
-                        "parameters": [
-                            {
-                                "type": "text",
-                                "text": request.mensaje
-                            }
-                        ]
-                    }
-                ]
-            }
-        }
-        
-        logger.info(f"Sending WhatsApp message to {request.telefono}")
-        logger.info(f"Message: {request.mensaje}")
-        logger.info(f"Payload: {json.dumps(payload, indent=2)}")
-        
-        # Convert payload to JSON string
-        data = json.dumps(payload).encode('utf-8')
-        
-        # Create request
-        req = urllib.request.Request(url, data=data, headers=headers, method='POST')
-        
-        # Send request
-        with urllib.request.urlopen(req) as response:
-            response_data = json.loads(response.read().decode('utf-8'))
-            
-            logger.info(f"WhatsApp API response: {json.dumps(response_data, indent=2)}")
-            
-            if response.status == 200:
-                return WhatsAppResponse(
-                    success=True,
-                    message="WhatsApp message sent successfully",
-                    message_id=response_data.get("messages", [{}])[0].get("id")
-                )
-            else:
-                logger.error(f"WhatsApp API error: {response.status} - {response_data}")
-                return WhatsAppResponse(
-                    success=False,
-                    message="Failed to send WhatsApp message",
-                    error_details=str(response_data)
-                )
-            
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8') if hasattr(e, 'read') else str(e)
-        logger.error(f"WhatsApp API HTTP error: {e.code} - {error_body}")
-        return WhatsAppResponse(
-            success=False,
-            message="WhatsApp API error",
-            error_details=f"HTTP {e.code}: {error_body}"
-        )
+        return ModelResponse(await whatsapp_service.send_whatsapp(request))
     except Exception as e:
         logger.error(f"Error sending WhatsApp message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -144,9 +57,9 @@ async def whatsapp_health_check():
             "service": "whatsapp",
             "message": "WhatsApp service is operational",
             "template_info": {
-                "template_name": "notificar_oferta",
-                "language": "es_CO",
-                "api_version": "v22.0"
+                "template_name": TEMPLATE_NAME,
+                "language": TEMPLATE_LANGUAGE,
+                "api_version": GRAPH_API_VERSION
             }
         }
     except Exception as e:
@@ -154,4 +67,13 @@ async def whatsapp_health_check():
         raise HTTPException(
             status_code=503,
             detail="WhatsApp service is not healthy"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/ready")
+async def whatsapp_readiness_check():
+    """
+    Readiness probe for WhatsApp: last cached result of a Graph API call.
+    Never calls the provider in the request path; returns 503 when not ready.
+    """
+    return readiness.response("whatsapp")
@@ -1,7 +1,23 @@
-from .email_schema import EmailRequest, EmailResponse, EmailStatus, EmailPriority
+from .email_schema import (
+    AttachmentInfo, AttachmentRef, EmailRequest, EmailResponse, EmailStatus,
+    EmailPriority, RecipientStatus, RecipientVerdict
+)
+from .dead_letter_schema import (
+    DeadLetterEntry, DeadLetterReplayRequest, DeadLetterReplayStatus, DeadLetterStatus,
+    FailureClass
+)
+from .notification_schema import (
+    ChannelResult, NotificationChannel, NotificationRequest, NotificationResponse
+)
 from .whatsapp_schema import WhatsAppRequest, WhatsAppResponse, WhatsAppStatus
 
 __all__ = [
+    "AttachmentInfo", "AttachmentRef",
     "EmailRequest", "EmailResponse", "EmailStatus", "EmailPriority",
+    "RecipientStatus", "RecipientVerdict",
+    "DeadLetterEntry", "DeadLetterReplayRequest", "DeadLetterReplayStatus",
+    "DeadLetterStatus", "FailureClass",
+    "ChannelResult", "NotificationChannel", "NotificationRequest",
+    "NotificationResponse",
     "WhatsAppRequest", "WhatsAppResponse", "WhatsAppStatus"
 ] 
\ No newline at end of file
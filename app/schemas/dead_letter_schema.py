@@ -0,0 +1,66 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+
+class FailureClass(str, Enum):
+    """Why a send ended up in the dead-letter store."""
+    # Relay/API down or unreachable; replay when back
+    PROVIDER_UNAVAILABLE = "provider_unavailable"
+    TEMPORARY = "temporary"  # 4xx or throttling from the provider
+    REJECTED = "rejected"  # Permanent refusal of this message; replay rarely helps
+    ERROR = "error"  # Anything else (bad attachment, rendering, ...)
+
+
+class DeadLetterStatus(str, Enum):
+    FAILED = "failed"
+    REPLAYED = "replayed"
+
+
+class DeadLetterEntry(BaseModel):
+    """Schema for one stored failed send."""
+    id: str
+    channel: str
+    error_class: FailureClass
+    error: str
+    failed_at: datetime
+    attempts: int
+    status: DeadLetterStatus
+    replayed_at: Optional[datetime] = None
+    request: Dict[str, Any] = Field(..., description="The original send request")
+
+
+class DeadLetterReplayRequest(BaseModel):
+    """Selection of dead letters to replay: explicit ids, or a filter."""
+    ids: Optional[List[str]] = Field(
+        default=None, max_length=10000, description="Entries to replay"
+    )
+    channel: Optional[str] = Field(default=None, description="email or whatsapp")
+    error_class: Optional[FailureClass] = None
+    since: Optional[datetime] = Field(
+        default=None, description="Failed at or after (UTC if no offset)"
+    )
+    until: Optional[datetime] = Field(
+        default=None, description="Failed before (UTC if no offset)"
+    )
+    limit: int = Field(
+        default=1000, ge=1, le=10000, description="Max entries selected by the filter"
+    )
+    batch_size: Optional[int] = Field(
+        default=None, ge=1, le=500, description="Sends in flight per batch"
+    )
+    rate: Optional[float] = Field(
+        default=None, gt=0, description="Max sends per second"
+    )
+
+
+class DeadLetterReplayStatus(BaseModel):
+    """Progress of a replay run."""
+    replay_id: str
+    selected: int
+    delivered: int = 0
+    failed: int = 0
+    done: bool = False
+    started_at: datetime
+    finished_at: Optional[datetime] = None
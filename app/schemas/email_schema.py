@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
+from datetime import datetime
 from enum import Enum
 
 
@@ -10,6 +11,32 @@ class EmailPriority(str, Enum):
     HIGH = "high"
 
 
+class AttachmentRef(BaseModel):
+    """Reference to a blob uploaded through POST /email/attachments."""
+    sha256: str = Field(
+        ...,
+        pattern=r"^[0-9a-f]{64}$",
+        description="Content hash returned by the upload",
+    )
+    filename: str = Field(
+        ...,
+        min_length=1,
+        max_length=255,
+        description="File name shown to the recipient",
+    )
+    content_type: str = Field(
+        default="application/octet-stream",
+        pattern=r"^[\w.+-]+/[\w.+-]+$",
+        description="MIME type",
+    )
+
+
+class AttachmentInfo(BaseModel):
+    """Stored blob: content hash and size in bytes."""
+    sha256: str
+    size: int
+
+
 class EmailRequest(BaseModel):
     """Schema for email sending request."""
     to: List[EmailStr] = Field(..., description="List of recipient email addresses")
@@ -19,6 +46,45 @@ class EmailRequest(BaseModel):
     bcc: Optional[List[EmailStr]] = Field(default=None, description="BCC recipients")
     priority: EmailPriority = Field(default=EmailPriority.NORMAL, description="Email priority")
     is_html: bool = Field(default=False, description="Whether the body is HTML content")
+    attachments: Optional[List[AttachmentRef]] = Field(
+        default=None, description="Previously uploaded blobs to attach"
+    )
+    send_at: Optional[datetime] = Field(
+        default=None,
+        description="Deliver at this time (UTC if no offset) instead of now",
+    )
+
+
+class EmailRequestLite(EmailRequest):
+    """
+    EmailRequest with addresses left as plain strings.
+
+    Used by the bulk ingest path, which validates addresses separately through a
+    memoized validator instead of running email-validator for every occurrence.
+    """
+    to: List[str] = Field(..., description="List of recipient email addresses")
+    cc: Optional[List[str]] = Field(default=None, description="CC recipients")
+    bcc: Optional[List[str]] = Field(default=None, description="BCC recipients")
+
+
+class RecipientStatus(str, Enum):
+    """Pre-send verdict for one recipient."""
+    ACCEPTED = "accepted"
+    UNVERIFIED = "unverified"  # MX lookup failed; sent anyway
+    SUPPRESSED = "suppressed"  # On the local suppression list
+    NO_MX = "no_mx"  # Domain does not accept mail
+    REFUSED = "refused"  # Rejected by the SMTP relay
+
+
+class RecipientVerdict(BaseModel):
+    """Recipient filter result for one address."""
+    address: str
+    status: RecipientStatus
+    reason: Optional[str] = None
+
+    @property
+    def deliverable(self) -> bool:
+        return self.status in (RecipientStatus.ACCEPTED, RecipientStatus.UNVERIFIED)
 
 
 class EmailResponse(BaseModel):
@@ -27,6 +93,18 @@ class EmailResponse(BaseModel):
     message: str
     email_id: Optional[str] = None
     error_details: Optional[str] = None
+    recipients: Optional[List[RecipientVerdict]] = Field(
+        default=None,
+        description="Per-recipient verdicts (when the recipient filter is enabled)",
+    )
+    scheduled_at: Optional[datetime] = Field(
+        default=None,
+        description="Release time when the send was deferred (send_at plus jitter)",
+    )
+    duplicate: bool = Field(
+        default=False,
+        description="Not sent: same content went to this recipient within DEDUP_WINDOW",
+    )
 
 
 class EmailStatus(BaseModel):
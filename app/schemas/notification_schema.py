@@ -0,0 +1,104 @@
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+from .email_schema import EmailPriority
+
+
+class NotificationChannel(str, Enum):
+    EMAIL = "email"
+    WHATSAPP = "whatsapp"
+
+
+class NotificationRecipient(BaseModel):
+    """Recipient profile: where the user can be reached on each channel."""
+    email: Optional[EmailStr] = Field(default=None, description="Email address")
+    telefono: Optional[str] = Field(default=None, description="WhatsApp phone number")
+
+
+class NotificationEmail(BaseModel):
+    """Email content of a notification; the recipient comes from the profile."""
+    subject: str = Field(..., min_length=1, max_length=200, description="Email subject")
+    body: str = Field(..., min_length=1, description="Email body content")
+    is_html: bool = Field(default=False, description="Whether the body is HTML content")
+    priority: EmailPriority = Field(
+        default=EmailPriority.NORMAL, description="Email priority"
+    )
+
+
+class NotificationWhatsApp(BaseModel):
+    """WhatsApp content of a notification (notificar_oferta template)."""
+    mensaje: str = Field(..., description="Message content to be sent in the template")
+
+
+class NotificationRequest(BaseModel):
+    """Schema for one multi-channel notification."""
+    recipient: NotificationRecipient
+    channels: List[NotificationChannel] = Field(
+        ..., min_length=1, description="Channels sent concurrently"
+    )
+    email: Optional[NotificationEmail] = None
+    whatsapp: Optional[NotificationWhatsApp] = None
+    fallback: Dict[NotificationChannel, NotificationChannel] = Field(
+        default_factory=dict,
+        description='Channel to try when another fails, e.g. {"whatsapp": "email"}',
+    )
+    send_at: Optional[datetime] = Field(
+        default=None,
+        description="Deliver at this time (UTC if no offset) instead of now",
+    )
+
+    @model_validator(mode="after")
+    def check_channels(self) -> "NotificationRequest":
+        if len(set(self.channels)) != len(self.channels):
+            raise ValueError("channels must not repeat")
+        for failed, fallback in self.fallback.items():
+            if failed not in self.channels:
+                raise ValueError(
+                    f"fallback for '{failed.value}', which is not in channels"
+                )
+            if fallback in self.channels:
+                raise ValueError(
+                    f"fallback '{fallback.value}' is already sent as a primary channel"
+                )
+        for channel in {*self.channels, *self.fallback.values()}:
+            if channel == NotificationChannel.EMAIL and (
+                self.recipient.email is None or self.email is None
+            ):
+                raise ValueError(
+                    "email channel needs recipient.email and email content"
+                )
+            if channel == NotificationChannel.WHATSAPP and (
+                not self.recipient.telefono or self.whatsapp is None
+            ):
+                raise ValueError(
+                    "whatsapp channel needs recipient.telefono and whatsapp content"
+                )
+        return self
+
+
+class ChannelResult(BaseModel):
+    """Outcome of one channel of a notification."""
+    channel: NotificationChannel
+    success: bool
+    message: str
+    id: Optional[str] = Field(
+        default=None, description="email_id or WhatsApp message_id"
+    )
+    error_details: Optional[str] = None
+    fallback_for: Optional[NotificationChannel] = Field(
+        default=None,
+        description="Set when this channel was sent because that one failed",
+    )
+    scheduled_at: Optional[datetime] = None
+    duplicate: bool = Field(
+        default=False, description="Skipped as a repeat of a recent send"
+    )
+
+
+class NotificationResponse(BaseModel):
+    """Combined result: success when any channel delivered (or was scheduled)."""
+    success: bool
+    results: List[ChannelResult] = Field(default_factory=list)
+    error_details: Optional[str] = None
@@ -1,11 +1,16 @@
 from pydantic import BaseModel, Field
 from typing import Optional
+from datetime import datetime
 
 
 class WhatsAppRequest(BaseModel):
     """Schema for WhatsApp sending request using the notificar_oferta template."""
     telefono: str = Field(..., description="Recipient phone number")
     mensaje: str = Field(..., description="Message content to be sent in the template")
+    send_at: Optional[datetime] = Field(
+        default=None,
+        description="Deliver at this time (UTC if no offset) instead of now",
+    )
 
 
 class WhatsAppResponse(BaseModel):
@@ -14,6 +19,14 @@ class WhatsAppResponse(BaseModel):
     message: str
     message_id: Optional[str] = None
     error_details: Optional[str] = None
+    scheduled_at: Optional[datetime] = Field(
+        default=None,
+        description="Release time when the send was deferred (send_at plus jitter)",
+    )
+    duplicate: bool = Field(
+        default=False,
+        description="Not sent: same content went to this recipient within DEDUP_WINDOW",
+    )
 
 
 class WhatsAppStatus(BaseModel):
@@ -0,0 +1,105 @@
+"""
+Production launcher.
+
+Runs uvicorn with one worker process per available CPU (honouring container CPU
+quotas), without reload, and drains in-flight deliveries on SIGTERM:
+
+    python -m app.server
+
+Workers share nothing; each one owns its SMTP pools and in-memory state.
+"""
+import logging
+import math
+import os
+from types import FrameType
+from typing import Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.config import settings
+from app.lifecycle import delivery_tracker
+
+# uvicorn configures this logger when the Config is built
+logger = logging.getLogger("uvicorn.error")
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CFS_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CFS_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """CPU limit imposed by the container (cgroup v2 or v1), in cores, or None."""
+    cpu_max = _read_first_line(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota_us = _read_first_line(CGROUP_V1_CFS_QUOTA)
+    period_us = _read_first_line(CGROUP_V1_CFS_PERIOD)
+    if quota_us and period_us and int(quota_us) > 0:
+        return int(quota_us) / int(period_us)
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: affinity mask capped by cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def resolve_workers(configured: int) -> int:
+    """Worker count: the configured value, or one per available CPU when 0."""
+    if configured > 0:
+        return configured
+    return available_cpus()
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that flags the process as draining once a stop signal arrives."""
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        delivery_tracker.begin_drain()
+        super().handle_exit(sig, frame)
+
+
+def main() -> None:
+    workers = resolve_workers(settings.web_concurrency)
+    config = uvicorn.Config(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        reload=False,
+        proxy_headers=True,
+        timeout_graceful_shutdown=math.ceil(settings.shutdown_drain_timeout),
+    )
+    server = DrainingServer(config=config)
+    logger.info(f"Starting {workers} worker(s) on {settings.host}:{settings.port}")
+
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Adaptive concurrency limits for calls to external providers (AIMD on latency).
+
+Each limiter bounds the calls in flight to one provider. The limit follows
+the provider instead of a fixed number: while call latency stays close to
+its smoothed baseline the limit grows additively (about one per limit's
+worth of calls, and only when the current limit is actually in use); when a
+call fails with a congestion error or takes longer than `tolerance` times
+the baseline, the limit is cut multiplicatively, at most once per baseline
+interval. The baseline is an exponential moving average of successful call
+latencies, so a provider that is slower all afternoon becomes the new normal.
+
+Current limits and in-flight counts are exported per limiter as
+`adaptive_concurrency_limit` and `adaptive_concurrency_in_flight`.
+"""
+import asyncio
+import math
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Iterable, Optional
+
+from app.config import settings
+from app.metrics import Sample, metrics
+
+decreases_total = metrics.counter(
+    "adaptive_concurrency_decreases_total",
+    "Adaptive limit cuts, by limiter and reason (latency or error)",
+)
+
+# Live limiters by name, sampled by the metrics collector below
+_limiters: "weakref.WeakValueDictionary[str, AdaptiveLimiter]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+class LimitedCall:
+    """One call holding a slot; tells the limiter how to count it."""
+
+    def __init__(self, clock: Callable[[], float]):
+        self._clock = clock
+        self.started = clock()
+        self.outcome = "ok"  # ok | drop (congestion) | ignore (not a latency sample)
+
+    def restart(self) -> None:
+        """Start timing now (e.g. after opening a connection: not provider latency)."""
+        self.started = self._clock()
+
+    def drop(self) -> None:
+        """The provider signalled congestion (throttling, 5xx) without raising."""
+        self.outcome = "drop"
+
+    def ignore(self) -> None:
+        self.outcome = "ignore"
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed latency and congestion errors."""
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        smoothing: float = 0.05,
+        is_congestion: Callable[[Exception], bool] = lambda e: True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            name: Label of the limiter in metrics and stats
+            initial: Starting limit
+            min_limit, max_limit: Bounds of the limit (equal bounds fix the limit)
+            tolerance: A call slower than baseline * tolerance counts as congestion
+            backoff_ratio: Factor applied to the limit on congestion
+            smoothing: Weight of each new sample in the latency baseline
+            is_congestion: Whether an exception raised by a call is a congestion signal;
+                other exceptions are not counted at all
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+        self._is_congestion = is_congestion
+        self._clock = clock
+        # Smoothed latency of successful calls, seconds
+        self.baseline: Optional[float] = None
+        self.in_flight = 0
+        self._last_decrease = -math.inf
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        _limiters[name] = self
+
+    @classmethod
+    def from_settings(
+        cls,
+        name: str,
+        fixed: int,
+        is_congestion: Callable[[Exception], bool] = lambda e: True,
+    ) -> "AdaptiveLimiter":
+        """Adaptive from `fixed` up to ADAPTIVE_CONCURRENCY_MAX, or `fixed` when off."""
+        if not settings.adaptive_concurrency:
+            return cls(
+                name,
+                fixed,
+                min_limit=fixed,
+                max_limit=fixed,
+                is_congestion=is_congestion,
+            )
+        return cls(
+            name, fixed, max_limit=max(fixed, settings.adaptive_concurrency_max),
+            tolerance=settings.adaptive_latency_tolerance, is_congestion=is_congestion,
+        )
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Waiters belong to one event loop; start over when called from a new one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters.clear()
+            self.in_flight = 0
+        return loop
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[LimitedCall]:
+        """Hold one slot for the duration of a call, waiting (FIFO) at the limit."""
+        loop = self._ensure_loop()
+        if self.in_flight < self.current and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if not waiter.cancelled():  # Granted a slot just before cancellation
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        in_use = self.in_flight
+        call = LimitedCall(self._clock)
+        try:
+            yield call
+        except Exception as e:
+            if call.outcome == "ok":
+                call.outcome = "drop" if self._is_congestion(e) else "ignore"
+            raise
+        except BaseException:
+            call.ignore()
+            raise
+        finally:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._observe(call, in_use)
+            self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.current:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _observe(self, call: LimitedCall, in_use: int) -> None:
+        if call.outcome == "ignore":
+            return
+        now = self._clock()
+        latency = now - call.started
+        slow = self.baseline is not None and latency > self.baseline * self.tolerance
+        if call.outcome == "drop" or slow:
+            # One cut per baseline interval: a burst of failures is one congestion event
+            if now - self._last_decrease >= (self.baseline or 0.0):
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+                self._last_decrease = now
+                reason = "error" if call.outcome == "drop" else "latency"
+                decreases_total.inc(limiter=self.name, reason=reason)
+        elif in_use * 2 >= self.current:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        if call.outcome == "ok":
+            self.baseline = latency if self.baseline is None else (
+                self.baseline + self.smoothing * (latency - self.baseline)
+            )
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.current,
+            "in_flight": self.in_flight,
+            "max_limit": self.max_limit,
+            "baseline_ms": (
+                round(self.baseline * 1000, 1) if self.baseline is not None else None
+            ),
+        }
+
+
+def collect() -> Iterable[Sample]:
+    for name, limiter in list(_limiters.items()):
+        labels = {"limiter": name}
+        yield "adaptive_concurrency_limit", labels, float(limiter.current)
+        yield "adaptive_concurrency_in_flight", labels, float(limiter.in_flight)
+
+
+metrics.register_collector(collect)
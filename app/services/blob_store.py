@@ -0,0 +1,189 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import mmap
+import os
+import re
+import tempfile
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict
+
+from app.config import settings
+from app.schemas.email_schema import AttachmentInfo
+
+logger = logging.getLogger(__name__)
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+# Input bytes per encode step: a multiple of 57 so every base64 line is a full 76 chars
+ENCODE_STEP = 57 * 1024
+# Upload bytes buffered per file write (each write is one hop to a worker thread)
+WRITE_STEP = 1024 * 1024
+
+
+class BlobTooLarge(ValueError):
+    """Uploaded blob exceeds the configured maximum size."""
+
+
+class BlobNotFound(KeyError):
+    """No blob stored under the given hash."""
+
+
+class BlobStore:
+    """
+    On-disk content-addressed store: each blob lives at <root>/<sha[:2]>/<sha>.
+
+    Blobs are written once through a temporary file and renamed into place, so
+    readers never see partial content and identical uploads share one file.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, sha256: str) -> str:
+        if not SHA256_RE.match(sha256):
+            raise BlobNotFound(sha256)
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def info(self, sha256: str) -> AttachmentInfo:
+        try:
+            size = os.path.getsize(self.path(sha256))
+        except OSError:
+            raise BlobNotFound(sha256) from None
+        return AttachmentInfo(sha256=sha256, size=size)
+
+    async def put_stream(self, chunks: AsyncIterator[bytes]) -> AttachmentInfo:
+        """
+        Store a streamed upload without buffering it whole; returns its hash and
+        size. File I/O runs in worker threads so large uploads don't stall the loop.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = await asyncio.to_thread(self._new_tmp_path)
+        try:
+            f = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                pending = bytearray()
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise BlobTooLarge(f"Attachment exceeds {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    pending += chunk
+                    if len(pending) >= WRITE_STEP:
+                        await asyncio.to_thread(f.write, pending)
+                        pending = bytearray()
+                if pending:
+                    await asyncio.to_thread(f.write, pending)
+            finally:
+                await asyncio.to_thread(f.close)
+            sha256 = digest.hexdigest()
+            await asyncio.to_thread(self._move_into_place, tmp_path, sha256)
+        finally:
+            await asyncio.to_thread(self._discard, tmp_path)
+        return AttachmentInfo(sha256=sha256, size=size)
+
+    def _new_tmp_path(self) -> str:
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    def _move_into_place(self, tmp_path: str, sha256: str) -> None:
+        final_path = self.path(sha256)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+
+    @staticmethod
+    def _discard(tmp_path: str) -> None:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def encode_base64(self, sha256: str) -> str:
+        """
+        Base64-encode a blob (76-char lines) reading it through mmap in fixed-size
+        steps, so only the encoded output is held in memory.
+        """
+        path = self.path(sha256)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(sha256) from None
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                encoded = bytearray()
+                for offset in range(0, len(data), ENCODE_STEP):
+                    encoded += base64.encodebytes(data[offset:offset + ENCODE_STEP])
+        return encoded.decode("ascii")
+
+
+class AttachmentCache:
+    """
+    Encoded attachment bodies kept in memory, bounded by total size (LRU).
+
+    A blob referenced by many sends is read and base64-encoded once; concurrent
+    requests for the same blob wait for the same encoding job.
+    """
+
+    def __init__(self, store: BlobStore, max_bytes: int):
+        self.store = store
+        self.max_bytes = max_bytes
+        self._encoded: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.encodes = 0
+
+    async def encoded(self, sha256: str) -> str:
+        body = self._encoded.get(sha256)
+        if body is not None:
+            self._encoded.move_to_end(sha256)
+            return body
+        pending = self._pending.get(sha256)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[sha256] = future
+        try:
+            body = await asyncio.to_thread(self.store.encode_base64, sha256)
+            self.encodes += 1
+            future.set_result(body)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._pending.pop(sha256, None)
+        self._store(sha256, body)
+        return body
+
+    def _store(self, sha256: str, body: str) -> None:
+        # Already stored by a caller that encoded it on another event loop
+        if len(body) > self.max_bytes or sha256 in self._encoded:
+            return
+        self._encoded[sha256] = body
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, evicted = self._encoded.popitem(last=False)
+            self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._encoded),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def default_blob_store_path() -> str:
+    return settings.blob_store_path or os.path.join(
+        tempfile.gettempdir(), "api-msj-blobs"
+    )
+
+
+# Global blob store and encoded-part cache of this process (the store is shared on disk)
+blob_store = BlobStore(default_blob_store_path(), settings.attachment_max_bytes)
+attachment_cache = AttachmentCache(blob_store, settings.attachment_cache_bytes)
@@ -0,0 +1,99 @@
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import ValidationError
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+
+from app.config import settings
+from app.schemas.email_schema import EmailRequest, EmailRequestLite
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=settings.bulk_address_cache_size)
+def normalize_address(address: str) -> str:
+    """
+    Validate and normalize one address exactly like EmailStr does, memoized across
+    requests.
+
+    Raises:
+        ValueError: if the address is not valid
+    """
+    try:
+        return validate_email(address)[1]
+    except PydanticCustomError as e:
+        raise ValueError(str(e)) from None
+
+
+class _BatchAddresses:
+    """Per-batch address memo: each distinct string is validated (or looked up) once."""
+
+    def __init__(self) -> None:
+        self._seen: Dict[str, Union[str, ValueError]] = {}
+
+    def normalize(self, address: str) -> str:
+        result = self._seen.get(address)
+        if result is None:
+            try:
+                result = normalize_address(address)
+            except ValueError as e:
+                result = e
+            self._seen[address] = result
+        if isinstance(result, ValueError):
+            raise result
+        return result
+
+    def normalize_all(
+        self, field: str, addresses: Optional[List[str]]
+    ) -> Optional[List[str]]:
+        if addresses is None:
+            return None
+        normalized = []
+        for i, address in enumerate(addresses):
+            try:
+                normalized.append(self.normalize(address))
+            except ValueError as e:
+                raise ValueError(f"{field}.{i}: {str(e)}") from None
+        return normalized
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """One-line 'field.path: message; ...' summary of a pydantic validation error."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'body'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+def validate_bulk(items: List[Any]) -> List[Union[EmailRequest, str]]:
+    """
+    Validate a bulk payload item by item.
+
+    Structure is checked with EmailRequestLite (no per-address email-validator call),
+    then addresses go through the memoized validator, deduplicated across the batch.
+    Valid items are built with model_construct, skipping a second validation pass.
+
+    Returns:
+        One entry per item, in order: the EmailRequest, or an error message
+    """
+    addresses = _BatchAddresses()
+    results: List[Union[EmailRequest, str]] = []
+    for item in items:
+        try:
+            lite = EmailRequestLite.model_validate(item)
+            values = dict(lite.__dict__)
+            values["to"] = addresses.normalize_all("to", lite.to)
+            values["cc"] = addresses.normalize_all("cc", lite.cc)
+            values["bcc"] = addresses.normalize_all("bcc", lite.bcc)
+        except ValidationError as e:
+            results.append(format_validation_error(e))
+            continue
+        except ValueError as e:
+            results.append(str(e))
+            continue
+        results.append(
+            EmailRequest.model_construct(_fields_set=lite.model_fields_set, **values)
+        )
+    return results
@@ -0,0 +1,395 @@
+"""
+Dead-letter store for sends that failed, with throttled bulk replay.
+
+A failed send is stored with its original request (zlib-compressed JSON) and
+a failure class, so an operator can list what failed during a provider outage
+and re-drive it through the normal delivery path once the provider is back.
+A replayed send that fails again updates the same entry (attempts + 1) instead
+of adding a new one. Entries live in SQLite next to the scheduler's database.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.config import settings
+from app.lifecycle import delivery_tracker
+from app.metrics import Sample, metrics
+from app.schemas.dead_letter_schema import (
+    DeadLetterReplayRequest, DeadLetterReplayStatus, DeadLetterStatus, FailureClass
+)
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REPLAY_STATUS_TTL = 24 * 3600.0  # Seconds a finished replay's status stays queryable
+MAX_REPLAY_STATUSES = 1000  # Replay statuses kept; least recently used dropped first
+
+dead_letters_total = metrics.counter(
+    "dead_letters_total", "Failed sends stored for replay, by channel and failure class"
+)
+replayed_total = metrics.counter(
+    "dead_letters_replayed_total", "Dead letters replayed, by channel and outcome"
+)
+
+
+@dataclass
+class DeadLetter:
+    id: str
+    channel: str
+    payload: str  # JSON of the original request
+    error_class: FailureClass
+    error: str
+    failed_at: float  # Unix time of the last failure
+    attempts: int = 1
+    status: DeadLetterStatus = DeadLetterStatus.FAILED
+    replayed_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Fields of the DeadLetterEntry schema."""
+        return {
+            "id": self.id,
+            "channel": self.channel,
+            "error_class": self.error_class,
+            "error": self.error,
+            "failed_at": datetime.fromtimestamp(self.failed_at, timezone.utc),
+            "attempts": self.attempts,
+            "status": self.status,
+            "replayed_at": (
+                datetime.fromtimestamp(self.replayed_at, timezone.utc)
+                if self.replayed_at
+                else None
+            ),
+            "request": json.loads(self.payload),
+        }
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class DeadLetterStore:
+    """SQLite table of dead letters, shared by the worker processes of one host."""
+
+    COLUMNS = (
+        "id, channel, payload, error_class, error, failed_at, attempts, status,"
+        " replayed_at"
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letters ("
+                " id TEXT PRIMARY KEY, channel TEXT NOT NULL, payload BLOB NOT NULL,"
+                " error_class TEXT NOT NULL, error TEXT NOT NULL,"
+                " failed_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 1,"
+                " status TEXT NOT NULL, replayed_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS dead_letters_selection"
+                " ON dead_letters (status, channel, failed_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(row: Sequence[Any]) -> DeadLetter:
+        (
+            id_, channel, payload, error_class, error, failed_at, attempts, status,
+            replayed_at,
+        ) = row
+        return DeadLetter(
+            id_, channel, zlib.decompress(payload).decode("utf-8"),
+            FailureClass(error_class), error, failed_at, attempts,
+            DeadLetterStatus(status), replayed_at,
+        )
+
+    def record(self, letter: DeadLetter) -> None:
+        """Insert, or count one more failed attempt of an entry being replayed."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT INTO dead_letters ({self.COLUMNS})"
+                " VALUES (?, ?, ?, ?, ?, ?, 1, ?, NULL)"
+                " ON CONFLICT(id) DO UPDATE SET error_class = excluded.error_class,"
+                " error = excluded.error, failed_at = excluded.failed_at,"
+                " attempts = attempts + 1, status = excluded.status,"
+                " replayed_at = NULL",
+                (
+                    letter.id, letter.channel,
+                    zlib.compress(letter.payload.encode("utf-8")),
+                    letter.error_class.value, letter.error, letter.failed_at,
+                    DeadLetterStatus.FAILED.value,
+                ),
+            )
+            conn.commit()
+
+    def select(
+        self,
+        ids: Optional[List[str]] = None,
+        channel: Optional[str] = None,
+        error_class: Optional[FailureClass] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        status: Optional[DeadLetterStatus] = DeadLetterStatus.FAILED,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[DeadLetter]:
+        """Entries matching every given filter, oldest failure first."""
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({', '.join('?' * len(ids))})" if ids else "0")
+            params += ids
+        for column, value in (
+            ("channel", channel),
+            ("error_class", error_class.value if error_class else None),
+            ("status", status.value if status else None),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("failed_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("failed_at < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {self.COLUMNS} FROM dead_letters{where}"
+                " ORDER BY failed_at LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def mark_replayed(self, letter_id: str, now: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE dead_letters SET status = ?, replayed_at = ? WHERE id = ?",
+                (DeadLetterStatus.REPLAYED.value, now, letter_id),
+            )
+            conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """Failed (not yet replayed) entries per channel."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT channel, COUNT(*) FROM dead_letters WHERE status = ?"
+                " GROUP BY channel",
+                (DeadLetterStatus.FAILED.value,),
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+Handler = Callable[[DeadLetter], Awaitable[bool]]
+
+
+class DeadLetterQueue:
+    """
+    Records failed sends and replays selections of them in throttled batches.
+
+    Each channel registers a handler that re-sends a stored request through its
+    normal delivery path, reusing the entry id so a new failure updates the entry.
+    """
+
+    def __init__(
+        self,
+        store: DeadLetterStore,
+        batch_size: int = 50,
+        rate: float = 20.0,
+        status_ttl: float = REPLAY_STATUS_TTL,
+        max_statuses: int = MAX_REPLAY_STATUSES,
+    ):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.rate = rate
+        self._handlers: Dict[str, Handler] = {}
+        self._replays: TTLCache[str, DeadLetterReplayStatus] = TTLCache(
+            max_statuses, status_ttl
+        )
+        self._tasks: set = set()  # Strong references to running replays
+
+    def register(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel] = handler
+
+    async def record(
+        self,
+        channel: str,
+        payload: str,
+        error_class: FailureClass,
+        error: str,
+        letter_id: Optional[str] = None,
+    ) -> None:
+        """Store a failed send. Never raises: losing it must not fail the caller."""
+        letter = DeadLetter(
+            id=letter_id or uuid.uuid4().hex, channel=channel, payload=payload,
+            error_class=error_class, error=error, failed_at=time.time(),
+        )
+        try:
+            await asyncio.to_thread(self.store.record, letter)
+        except sqlite3.Error as e:
+            logger.error(
+                f"Could not store dead letter {letter.id} ({channel}): {str(e)}"
+            )
+            return
+        dead_letters_total.inc(channel=channel, error_class=error_class.value)
+
+    async def entries(
+        self,
+        channel: Optional[str] = None,
+        error_class: Optional[FailureClass] = None,
+        status: Optional[DeadLetterStatus] = DeadLetterStatus.FAILED,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[DeadLetter]:
+        return await asyncio.to_thread(
+            self.store.select, channel=channel, error_class=error_class, status=status,
+            since=_timestamp(since), until=_timestamp(until),
+            limit=limit, offset=offset,
+        )
+
+    async def start_replay(
+        self, request: DeadLetterReplayRequest
+    ) -> DeadLetterReplayStatus:
+        """Select entries and replay them in the background; returns the run status."""
+        letters = await asyncio.to_thread(
+            self.store.select,
+            ids=request.ids,
+            channel=request.channel,
+            error_class=request.error_class,
+            since=_timestamp(request.since),
+            until=_timestamp(request.until),
+            limit=len(request.ids) if request.ids else request.limit,
+        )
+        status = DeadLetterReplayStatus(
+            replay_id=uuid.uuid4().hex,
+            selected=len(letters),
+            started_at=datetime.now(timezone.utc),
+        )
+        # Kept until the run finishes, then expires after status_ttl
+        self._replays.set(status.replay_id, status, ttl=math.inf)
+        task = asyncio.create_task(self._replay(
+            status,
+            letters,
+            request.batch_size or self.batch_size,
+            request.rate or self.rate,
+        ))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return status
+
+    def replay_status(self, replay_id: str) -> Optional[DeadLetterReplayStatus]:
+        return self._replays.get(replay_id)
+
+    async def _replay(
+        self,
+        status: DeadLetterReplayStatus,
+        letters: List[DeadLetter],
+        batch_size: int,
+        rate: float,
+    ) -> None:
+        logger.info(f"Replaying {len(letters)} dead letter(s), run {status.replay_id}")
+        try:
+            for start in range(0, len(letters), batch_size):
+                if delivery_tracker.draining:
+                    logger.warning(f"Replay {status.replay_id} stopped by shutdown")
+                    break
+                batch = letters[start:start + batch_size]
+                started = time.monotonic()
+                outcomes = await asyncio.gather(
+                    *(self._replay_one(letter) for letter in batch)
+                )
+                status.delivered += sum(outcomes)
+                status.failed += len(outcomes) - sum(outcomes)
+                # Throttle: a batch of n sends takes at least n / rate seconds
+                pause = 0.0
+                if rate > 0:
+                    pause = len(batch) / rate - (time.monotonic() - started)
+                if pause > 0 and start + batch_size < len(letters):
+                    await asyncio.sleep(pause)
+        finally:
+            status.done = True
+            status.finished_at = datetime.now(timezone.utc)
+            self._replays.set(status.replay_id, status)
+            logger.info(
+                f"Replay {status.replay_id} finished: {status.delivered} delivered, "
+                f"{status.failed} failed"
+            )
+
+    async def _replay_one(self, letter: DeadLetter) -> bool:
+        handler = self._handlers.get(letter.channel)
+        if handler is None:
+            logger.error(
+                f"Cannot replay dead letter {letter.id}: "
+                f"unknown channel '{letter.channel}'"
+            )
+            return False
+        try:
+            delivered = await handler(letter)
+        except Exception as e:
+            logger.error(f"Replay of dead letter {letter.id} failed: {str(e)}")
+            delivered = False
+        replayed_total.inc(
+            channel=letter.channel, outcome="delivered" if delivered else "failed"
+        )
+        if delivered:
+            await asyncio.to_thread(self.store.mark_replayed, letter.id, time.time())
+        return delivered
+
+    def collect(self) -> Iterable[Sample]:
+        """Metrics collector: dead letters waiting for replay, per channel."""
+        try:
+            counts = self.store.counts()
+        except sqlite3.Error:
+            return
+        for channel, count in counts.items():
+            yield "dead_letters_pending", {"channel": channel}, count
+
+
+def default_dead_letter_db_path() -> str:
+    return settings.dead_letter_db_path or os.path.join(
+        tempfile.gettempdir(), "api-msj-dead-letters.sqlite3"
+    )
+
+
+# Global dead-letter queue; channels register their replay handlers where their
+# service is defined
+dead_letters = DeadLetterQueue(
+    DeadLetterStore(default_dead_letter_db_path()),
+    batch_size=settings.dead_letter_replay_batch_size,
+    rate=settings.dead_letter_replay_rate,
+)
+metrics.register_collector(dead_letters.collect)
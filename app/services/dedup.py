@@ -0,0 +1,168 @@
+"""
+Duplicate-send suppression with time-rotated Bloom filters.
+
+A send is keyed on (channel, recipient, content hash). Delivered keys go into
+the current of two Bloom filter generations; every `window` seconds (or once
+the current one holds `capacity` keys) the older generation is dropped. A key
+is therefore remembered for at least `window` seconds and at most twice that,
+in a fixed amount of memory: about 1.44 * log2(2 / error_rate) bits per key and
+generation, e.g. ~4 MB for one million keys per window at a 0.1% rate.
+
+Only delivered sends are added, so a failed send can be retried
+at once. Sends in flight are tracked exactly, so two identical requests racing
+each other are also caught. A false positive suppresses a send that was never
+made, at most `error_rate` of the time.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import Counter as Multiset
+from typing import Callable, Iterable, List, Optional
+
+from app.config import settings
+from app.metrics import Sample, metrics
+
+logger = logging.getLogger(__name__)
+
+suppressed_total = metrics.counter(
+    "duplicates_suppressed_total",
+    "Sends skipped as duplicates of a recent send, by channel",
+)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte digests (double hashing on both halves)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes) -> Iterable[int]:
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(digest)
+        )
+
+
+class DuplicateFilter:
+    """
+    Remembers recently delivered (channel, recipient, content) keys.
+
+    Usage: `keys = filter.keys(...)`; `filter.claim(keys)` is False for a
+    duplicate; otherwise send and then call `filter.release(keys, delivered)`.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._current = self._new_generation()
+        self._previous = self._new_generation()
+        self._rotated_at = clock()
+        self._in_flight: Multiset = Multiset()
+
+    def _new_generation(self) -> BloomFilter:
+        # Lookups test both generations, so each one gets half the error budget
+        return BloomFilter(self.capacity, self.error_rate / 2)
+
+    @staticmethod
+    def keys(channel: str, recipients: Iterable[str], *content: str) -> List[bytes]:
+        """One key per distinct recipient, over the channel and the content parts."""
+        body = hashlib.blake2b(digest_size=16)
+        for part in content:
+            body.update(part.encode("utf-8"))
+            body.update(b"\0")
+        content_hash = body.digest()
+        return [
+            hashlib.blake2b(
+                f"{channel}\0{recipient.strip().lower()}\0".encode("utf-8")
+                + content_hash,
+                digest_size=16,
+            ).digest()
+            for recipient in dict.fromkeys(recipients)
+        ]
+
+    def _rotate(self) -> None:
+        now = self._clock()
+        full = self._current.count >= self.capacity
+        if now - self._rotated_at >= self.window or full:
+            # Idle for a whole generation: nothing in the current one is recent
+            expired = now - self._rotated_at >= 2 * self.window
+            self._previous = self._new_generation() if expired else self._current
+            self._current = self._new_generation()
+            self._rotated_at = now
+
+    def _seen(self, key: bytes) -> bool:
+        return self._in_flight[key] > 0 or key in self._current or key in self._previous
+
+    def claim(self, keys: List[bytes], channel: str = "") -> bool:
+        """
+        False when every key was delivered recently or is being sent right now.
+        Otherwise the keys are marked in flight and the send should go ahead.
+        """
+        with self._lock:
+            self._rotate()
+            if keys and all(self._seen(key) for key in keys):
+                suppressed_total.inc(channel=channel)
+                return False
+            self._in_flight.update(keys)
+            return True
+
+    def release(self, keys: List[bytes], delivered: bool) -> None:
+        """End of a claimed send: delivered keys are remembered for the window."""
+        with self._lock:
+            self._in_flight.subtract(keys)
+            for key in keys:
+                if self._in_flight[key] <= 0:
+                    del self._in_flight[key]
+                if delivered:
+                    self._current.add(key)
+
+    def collect(self) -> Iterable[Sample]:
+        """Metrics collector: keys in the current generation and filter memory."""
+        yield "dedup_keys", {"generation": "current"}, self._current.count
+        yield "dedup_keys", {"generation": "previous"}, self._previous.count
+        memory = len(self._current.bits) + len(self._previous.bits)
+        yield "dedup_memory_bytes", {}, memory
+
+
+def build_duplicate_filter() -> Optional[DuplicateFilter]:
+    """Filter configured from settings, or None when DEDUP_WINDOW is 0."""
+    if settings.dedup_window <= 0:
+        return None
+    return DuplicateFilter(
+        settings.dedup_window,
+        capacity=settings.dedup_capacity,
+        error_rate=settings.dedup_error_rate,
+    )
+
+
+# Process-wide filter shared by the email and WhatsApp services (None when disabled)
+duplicate_filter = build_duplicate_filter()
+if duplicate_filter is not None:
+    metrics.register_collector(duplicate_filter.collect)
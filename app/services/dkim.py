@@ -0,0 +1,129 @@
+"""
+DKIM signing (RFC 6376): rsa-sha256 with relaxed/relaxed canonicalization.
+
+RSA signatures come from the cryptography package. Private keys (PKCS#1 or
+PKCS#8 PEM) are loaded once per process, MIME worker processes included, and
+cached.
+"""
+import base64
+import hashlib
+import re
+import time
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+# Signed when present, in this order (RFC 6376 section 5.4.1)
+DEFAULT_SIGNED_HEADERS = (
+    "From", "To", "Cc", "Subject", "Date", "Message-ID", "MIME-Version", "Content-Type",
+)
+
+WSP_RE = re.compile(r"[ \t]+")
+FOLD_RE = re.compile(r"\r\n(?=[ \t])")
+
+
+class DKIMKeyError(ValueError):
+    """The DKIM private key is missing or not an unencrypted RSA key."""
+
+
+def parse_private_key(pem: str) -> rsa.RSAPrivateKey:
+    """Load an unencrypted RSA private key in PKCS#1 or PKCS#8 PEM format."""
+    try:
+        key = serialization.load_pem_private_key(pem.encode("ascii"), password=None)
+    except (ValueError, TypeError, UnsupportedAlgorithm) as e:
+        raise DKIMKeyError(f"Malformed or encrypted private key: {str(e)}") from None
+    if not isinstance(key, rsa.RSAPrivateKey):
+        raise DKIMKeyError("Only RSA keys are supported for DKIM")
+    return key
+
+
+@lru_cache(maxsize=8)
+def load_private_key(path: str) -> rsa.RSAPrivateKey:
+    """Read and parse a PEM key file once per process."""
+    try:
+        with open(path, encoding="ascii") as f:
+            return parse_private_key(f.read())
+    except OSError as e:
+        raise DKIMKeyError(f"Cannot read DKIM key {path}: {str(e)}") from None
+
+
+def canonicalize_header(name: str, value: str) -> bytes:
+    """Relaxed header canonicalization (RFC 6376 section 3.4.2), CRLF-terminated."""
+    value = WSP_RE.sub(" ", FOLD_RE.sub("", value)).strip()
+    line = f"{name.strip().lower()}:{value}\r\n"
+    return line.encode("utf-8", errors="surrogateescape")
+
+
+def canonicalize_body(body: bytes) -> bytes:
+    """Relaxed body canonicalization (RFC 6376 section 3.4.4)."""
+    lines = [
+        re.sub(rb"[ \t]+", b" ", line).rstrip(b" ") for line in body.split(b"\r\n")
+    ]
+    while lines and not lines[-1]:
+        lines.pop()
+    return b"".join(line + b"\r\n" for line in lines)
+
+
+def _split_headers(header_block: bytes) -> List[Tuple[str, str]]:
+    """(name, raw value) pairs, keeping folding inside values."""
+    fields: List[Tuple[str, str]] = []
+    for line in header_block.decode("utf-8", errors="surrogateescape").split("\r\n"):
+        if line[:1] in (" ", "\t") and fields:
+            name, value = fields[-1]
+            fields[-1] = (name, value + "\r\n" + line)
+        elif ":" in line:
+            name, value = line.split(":", 1)
+            fields.append((name, value))
+    return fields
+
+
+class DKIMSigner:
+    """Adds a DKIM-Signature header to flattened (CRLF) messages."""
+
+    def __init__(
+        self,
+        domain: str,
+        selector: str,
+        key: rsa.RSAPrivateKey,
+        headers: Iterable[str] = DEFAULT_SIGNED_HEADERS,
+    ):
+        self.domain = domain
+        self.selector = selector
+        self.key = key
+        self.headers = tuple(headers)
+
+    def sign(self, message: bytes, timestamp: Optional[int] = None) -> bytes:
+        """Return the message with a DKIM-Signature header prepended."""
+        header_block, separator, body = message.partition(b"\r\n\r\n")
+        fields = _split_headers(header_block)
+        body_hash = base64.b64encode(
+            hashlib.sha256(canonicalize_body(body)).digest()
+        ).decode()
+
+        # Sign the last occurrence of each listed header that is present
+        signed_names, signed_data = [], b""
+        for name in self.headers:
+            for field_name, value in reversed(fields):
+                if field_name.strip().lower() == name.lower():
+                    signed_names.append(name)
+                    signed_data += canonicalize_header(field_name, value)
+                    break
+
+        tags = [
+            "v=1", "a=rsa-sha256", "c=relaxed/relaxed",
+            f"d={self.domain}", f"s={self.selector}",
+            f"t={int(time.time()) if timestamp is None else timestamp}",
+            f"h={':'.join(signed_names)}", f"bh={body_hash}", "b=",
+        ]
+        unsigned = "; ".join(tags)
+        # No trailing CRLF after the signature header itself
+        signed_data += canonicalize_header("DKIM-Signature", unsigned)[:-2]
+        signature = base64.b64encode(
+            self.key.sign(signed_data, padding.PKCS1v15(), hashes.SHA256())
+        ).decode()
+
+        header = "DKIM-Signature: " + ";\r\n\t".join(tags) + signature + "\r\n"
+        return header.encode("ascii") + header_block + separator + body
@@ -0,0 +1,254 @@
+"""
+Per-recipient-domain concurrency, rate caps and deferral backoff for SMTP delivery.
+
+Large mailbox providers defer mail (4xx) that arrives too fast. Every send
+takes a slot on each recipient domain it touches, bounded by that domain's
+concurrency and rate; domains listed together in SMTP_DOMAIN_LIMITS (e.g.
+outlook.com and hotmail.com) share one set of caps. When a domain defers a
+recipient, only that domain is paused, with a backoff that doubles on repeated
+deferrals and resets after a successful send, while other domains keep flowing.
+Sends queue for their domain's slots and rate like for any local limit; a send
+that finds its domain paused for longer than `max_wait` fails as a temporary
+error (dead-lettered for replay) instead of holding the request open.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+import aiosmtplib
+
+from app.config import DomainLimitConfig, settings
+from app.metrics import Sample, metrics
+from app.services.scheduler import TokenBucket
+from app.services.smtp_providers import is_provider_failure
+
+logger = logging.getLogger(__name__)
+
+DEFERRED = 451  # Reply code of DomainDeferred: local error, try again later
+MAX_DOMAINS = 10000  # Domain states kept; idle ones dropped least recently used first
+
+deferrals_total = metrics.counter(
+    "smtp_domain_deferrals_total", "4xx deferrals received, by recipient domain (group)"
+)
+throttled_total = metrics.counter(
+    "smtp_domain_throttled_total", "Sends failed waiting for a paused domain"
+)
+
+
+class DomainDeferred(aiosmtplib.SMTPResponseException):
+    """A recipient domain could not take the send within max_wait (temporary)."""
+
+    def __init__(self, domain: str, message: str):
+        super().__init__(DEFERRED, message)
+        self.domain = domain
+
+
+def recipient_domain(address: str) -> str:
+    return address.rpartition("@")[2].strip().rstrip(".").lower()
+
+
+class _Domain:
+    def __init__(self, name: str, concurrency: int, rate: float, burst: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.backoff = 0.0  # Current pause length; 0 when the domain is not deferring
+        self.paused_until = 0.0
+
+    @property
+    def idle(self) -> bool:
+        return self.in_flight == 0 and self.backoff == 0
+
+
+class DomainThrottle:
+    """Concurrency and rate slots per recipient domain, paused by its deferrals."""
+
+    def __init__(
+        self,
+        limits: Iterable[DomainLimitConfig] = (),
+        concurrency: int = 10,
+        rate: float = 0.0,
+        backoff: float = 30.0,
+        backoff_max: float = 900.0,
+        max_wait: float = 10.0,
+    ):
+        """
+        Args:
+            limits: Caps for listed domains; each group shares one set of slots
+            concurrency: Sends in flight per other domain (0 = no limit)
+            rate: Sends per second per other domain (0 = no limit)
+            backoff: Pause after a deferral, doubled on each repeat up to backoff_max
+            max_wait: Longest deferral pause a send waits out before failing with
+                DomainDeferred
+        """
+        self._limits: Dict[str, DomainLimitConfig] = {
+            domain.lower(): limit for limit in limits for domain in limit.domains
+        }
+        self.concurrency = concurrency
+        self.rate = rate
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self._domains: "OrderedDict[str, _Domain]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_settings(cls) -> "DomainThrottle":
+        return cls(
+            settings.smtp_domain_limits,
+            concurrency=settings.smtp_domain_concurrency,
+            rate=settings.smtp_domain_rate,
+            backoff=settings.smtp_domain_backoff,
+            backoff_max=settings.smtp_domain_backoff_max,
+            max_wait=settings.smtp_domain_max_wait,
+        )
+
+    def _key(self, address: str) -> str:
+        """Domain of an address, or the first domain of its configured group."""
+        domain = recipient_domain(address)
+        limit = self._limits.get(domain)
+        return limit.domains[0].lower() if limit else domain
+
+    def _state(self, key: str) -> _Domain:
+        state = self._domains.get(key)
+        if state is not None:
+            self._domains.move_to_end(key)
+            return state
+        limit = self._limits.get(key)
+        if limit is not None:
+            state = _Domain(key, limit.concurrency, limit.rate, limit.burst)
+        else:
+            state = _Domain(key, self.concurrency, self.rate, 1)
+        self._domains[key] = state
+        if len(self._domains) > MAX_DOMAINS:
+            stale = next(
+                (k for k, s in self._domains.items() if s.idle and k != key), None
+            )
+            if stale is not None:
+                del self._domains[stale]
+        return state
+
+    def _ensure_loop(self) -> None:
+        """Bind to the running loop; semaphores of a previous loop cannot be awaited."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for state in self._domains.values():
+                state.slots = None
+                state.in_flight = 0
+            self._loop = loop
+
+    @asynccontextmanager
+    async def acquire(self, recipients: Iterable[str]) -> AsyncIterator[List[str]]:
+        """
+        Hold one slot on every recipient domain for the duration of a send.
+
+        Raises:
+            DomainDeferred: a domain is paused for longer than max_wait
+        """
+        self._ensure_loop()
+        keys = sorted({self._key(address) for address in recipients})
+        async with AsyncExitStack() as stack:
+            # Always taken in sorted order, so sends sharing domains cannot deadlock
+            for key in keys:
+                await self._enter(stack, self._state(key))
+            yield keys
+
+    async def _enter(self, stack: AsyncExitStack, state: _Domain) -> None:
+        # Waiting behind our own sends is queueing, not a deferral: not bounded by
+        # max_wait
+        if state.concurrency > 0:
+            if state.slots is None:
+                state.slots = asyncio.Semaphore(state.concurrency)
+            await state.slots.acquire()
+            stack.callback(state.slots.release)
+        pause = state.paused_until - time.monotonic()
+        if pause > 0:
+            if pause > self.max_wait:
+                raise self._throttled(
+                    state,
+                    f"Domain {state.name} is deferring mail, paused for {pause:.0f}s",
+                )
+            await asyncio.sleep(pause)
+        delay = state.bucket.delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        state.in_flight += 1
+        stack.callback(self._leave, state)
+
+    @staticmethod
+    def _leave(state: _Domain) -> None:
+        state.in_flight -= 1
+
+    @staticmethod
+    def _throttled(state: _Domain, message: str) -> DomainDeferred:
+        throttled_total.inc(domain=state.name)
+        return DomainDeferred(state.name, message)
+
+    def observe(
+        self,
+        recipients: Iterable[str],
+        refused: Optional[Dict[str, aiosmtplib.SMTPResponse]] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """
+        Learn from the outcome of a send: pause the domains that deferred (4xx),
+        reset the backoff of domains that accepted.
+        """
+        keys = {self._key(address) for address in recipients}
+        deferred: Set[str] = set()
+        if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+            deferred = {
+                self._key(e.recipient) for e in error.recipients if 400 <= e.code < 500
+            }
+        elif (
+            isinstance(error, aiosmtplib.SMTPResponseException)
+            and 400 <= error.code < 500
+            and not is_provider_failure(error)
+            and not isinstance(error, DomainDeferred)
+        ):
+            deferred = keys  # Deferred at MAIL/DATA: not attributable to one domain
+        for address, response in (refused or {}).items():
+            if 400 <= response.code < 500:
+                deferred.add(self._key(address))
+        now = time.monotonic()
+        for key in keys:
+            state = self._state(key)
+            if key in deferred:
+                if now >= state.paused_until:  # Concurrent deferrals count once
+                    state.backoff = min(
+                        self.backoff_max, state.backoff * 2 or self.backoff
+                    )
+                    state.paused_until = now + state.backoff
+                    logger.warning(
+                        f"Domain {key} deferred mail; pausing it for "
+                        f"{state.backoff:.0f}s"
+                    )
+                deferrals_total.inc(domain=key)
+            elif error is None:
+                state.backoff = 0.0
+
+    def stats(self) -> List[dict]:
+        """Domains with sends in flight or paused by deferrals."""
+        now = time.monotonic()
+        return [
+            {
+                "domain": state.name,
+                "in_flight": state.in_flight,
+                "paused_for": round(max(0.0, state.paused_until - now), 1),
+                "backoff": state.backoff,
+            }
+            for state in self._domains.values()
+            if not state.idle
+        ]
+
+    def collect(self) -> Iterable[Sample]:
+        """Metrics collector: sends in flight and remaining pause per busy domain."""
+        for stat in self.stats():
+            labels = {"domain": stat["domain"]}
+            yield "smtp_domain_in_flight", labels, stat["in_flight"]
+            yield "smtp_domain_paused_seconds", labels, stat["paused_for"]
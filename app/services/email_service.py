@@ -1,93 +1,311 @@
 import asyncio
 import logging
-from typing import List, Optional
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+from typing import Dict, List, Optional, Tuple
 from email.utils import formataddr
-import aiosmtplib
 from datetime import datetime
 import uuid
 
-from app.config import settings
-from app.schemas.email_schema import EmailRequest, EmailResponse, EmailPriority
+import aiosmtplib
+
+from app.config import SMTPProviderConfig, settings
+from app.lifecycle import delivery_tracker
+from app.logging_config import log_context
+from app.metrics import metrics
+from app.services.domain_throttle import DomainThrottle
+from app.services.dedup import DuplicateFilter, duplicate_filter
+from app.services.blob_store import AttachmentCache, BlobNotFound, attachment_cache
+from app.services.message_builder import (
+    AttachmentPart, MessageBuilder, MessageSpec, OutgoingMessage, build_message_builder
+)
+from app.services.recipient_filter import RecipientFilter, build_recipient_filter
+from app.services.scheduler import ScheduledJob, scheduler
+from app.services.dead_letters import DeadLetter, dead_letters
+from app.services.smtp_providers import (
+    ProviderRouter, classify_failure, default_provider_configs
+)
+from app.schemas.email_schema import (
+    EmailRequest, EmailResponse, RecipientStatus, RecipientVerdict
+)
 
 logger = logging.getLogger(__name__)
 
+ATTACHMENT_NOT_FOUND = "Attachment not found"
+
 
 class EmailService:
     """Service for handling email operations using async SMTP."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        providers: Optional[List[SMTPProviderConfig]] = None,
+        recipient_filter: Optional[RecipientFilter] = None,
+        attachments: Optional[AttachmentCache] = None,
+        builder: Optional[MessageBuilder] = None,
+        duplicates: Optional[DuplicateFilter] = None,
+        domain_throttle: Optional[DomainThrottle] = None,
+    ):
+        """
+        Args:
+            providers: SMTP relays to route across; defaults to SMTP_PROVIDERS or
+                SMTP_HOST
+            recipient_filter: Pre-send recipient check; defaults to the configured one
+                (if enabled)
+            attachments: Encoded attachment cache; defaults to the process-wide one
+            builder: MIME renderer and DKIM signer; defaults to the configured one
+            duplicates: Duplicate-send filter; defaults to the process-wide one
+                (if enabled)
+            domain_throttle: Per-recipient-domain caps; defaults to SMTP_DOMAIN_*
+                settings
+        """
         self.smtp_host = settings.smtp_host
-        self.smtp_port = settings.smtp_port
-        self.smtp_user = settings.smtp_user
-        self.smtp_pass = settings.smtp_pass
         self.email_from = settings.email_from
+        self.router = ProviderRouter.from_configs(
+            providers or default_provider_configs()
+        )
+        self.recipient_filter = recipient_filter or build_recipient_filter()
+        self.attachments = attachments or attachment_cache
+        self.builder = builder or build_message_builder()
+        self.duplicates = duplicates or duplicate_filter
+        self.domain_throttle = domain_throttle or DomainThrottle.from_settings()
+        self._last_delivery_ok: Optional[float] = None
     
-    async def send_email(self, email_request: EmailRequest) -> EmailResponse:
+    async def send_email(
+        self, email_request: EmailRequest, email_id: Optional[str] = None
+    ) -> EmailResponse:
         """
         Send email asynchronously using SMTP.
         
+        A failed send is stored in the dead-letter queue under its email_id. With
+        DEDUP_WINDOW set, a send of the same content to the same recipients as a
+        recent one is skipped and reported as a successful duplicate.
+
         Args:
             email_request: Email request containing recipient, subject, and body
+            email_id: Reuse this id (scheduled sends, dead-letter replays) or a new one
             
         Returns:
             EmailResponse with success status and details
         """
-        email_id = str(uuid.uuid4())
-        
+        email_id = email_id or str(uuid.uuid4())
+        with log_context(email_id=email_id):
+            return await self._send(email_request, email_id)
+
+    async def _send(self, email_request: EmailRequest, email_id: str) -> EmailResponse:
+        # Before dedup, scheduling and delivery: a missing blob would only fail at
+        # render time
+        missing = self.missing_attachment(email_request)
+        if missing is not None:
+            logger.warning(
+                f"Email not sent, attachment {missing} not found. ID: {email_id}"
+            )
+            return EmailResponse(
+                success=False,
+                message=ATTACHMENT_NOT_FOUND,
+                email_id=email_id,
+                error_details=f"Attachment {missing} not found"
+            )
+
+        if scheduler.is_deferred(email_request.send_at):
+            return await self._schedule(email_request, email_id)
+
+        if self.duplicates is None:
+            return await self._deliver(email_request, email_id)
+        keys = self.duplicates.keys(
+            "email",
+            [*email_request.to, *(email_request.cc or []), *(email_request.bcc or [])],
+            email_request.subject,
+            email_request.body,
+            str(email_request.is_html),
+            *(attachment.sha256 for attachment in email_request.attachments or []),
+        )
+        if not self.duplicates.claim(keys, "email"):
+            logger.info(f"Email not sent, duplicate of a recent send. ID: {email_id}")
+            return EmailResponse(
+                success=True,
+                message="Duplicate suppressed",
+                email_id=email_id,
+                duplicate=True
+            )
+        delivered = False
+        try:
+            response = await self._deliver(email_request, email_id)
+            delivered = response.success
+            return response
+        finally:
+            self.duplicates.release(keys, delivered)
+
+    def missing_attachment(self, email_request: EmailRequest) -> Optional[str]:
+        """Hash of the first attachment reference without a stored blob, if any."""
+        for ref in email_request.attachments or []:
+            try:
+                self.attachments.store.info(ref.sha256)
+            except BlobNotFound:
+                return ref.sha256
+        return None
+
+    async def _deliver(
+        self, email_request: EmailRequest, email_id: str
+    ) -> EmailResponse:
+        """Filter recipients, build and send the message now; dead-letter failures."""
+        original = email_request
+        verdicts: Optional[List[RecipientVerdict]] = None
+
         try:
+            # Drop suppressed recipients and domains without MX before opening a session
+            if self.recipient_filter is not None:
+                email_request, verdicts = await self._filter_recipients(email_request)
+                if email_request is None:
+                    logger.info(
+                        f"Email not sent, no deliverable recipients. ID: {email_id}"
+                    )
+                    return EmailResponse(
+                        success=False,
+                        message="No deliverable recipients",
+                        email_id=email_id,
+                        error_details=(
+                            "All recipients were rejected by the recipient filter"
+                        ),
+                        recipients=verdicts
+                    )
+
             # Create message
             message = await self._create_message(email_request, email_id)
             
             # Send email
-            await self._send_smtp_message(message)
+            with delivery_tracker.track():
+                refused = await self._send_smtp_message(message)
+            self._last_delivery_ok = time.monotonic()
+            self._record_refusals(verdicts, {
+                address: (response.code, response.message)
+                for address, response in refused.items()
+            })
             
             logger.info(f"Email sent successfully. ID: {email_id}")
             
             return EmailResponse(
                 success=True,
                 message="Email sent successfully",
-                email_id=email_id
+                email_id=email_id,
+                recipients=verdicts
             )
             
         except Exception as e:
+            if isinstance(e, aiosmtplib.SMTPRecipientsRefused):
+                self._record_refusals(verdicts, {
+                    error.recipient: (error.code, error.message)
+                    for error in e.recipients
+                })
             error_msg = f"Failed to send email: {str(e)}"
             logger.error(f"Email sending failed. ID: {email_id}, Error: {error_msg}")
+            if settings.dead_letter_enabled:
+                await dead_letters.record(
+                    "email", original.model_dump_json(exclude={"send_at"}),
+                    classify_failure(e), error_msg, letter_id=email_id,
+                )
             
             return EmailResponse(
                 success=False,
                 message="Failed to send email",
                 email_id=email_id,
-                error_details=error_msg
+                error_details=error_msg,
+                recipients=verdicts
             )
     
-    async def _create_message(self, email_request: EmailRequest, email_id: str) -> MIMEMultipart:
-        """Create MIME message from email request."""
-        message = MIMEMultipart()
-        # Mostrar nombre comercial de la app en el remitente
-        message["From"] = formataddr(("OfertaMe", self.email_from))
-        message["To"] = ", ".join(email_request.to)
-        message["Subject"] = email_request.subject
-        message["Message-ID"] = f"<{email_id}@{self.smtp_host}>"
-        
-        # Add CC if provided
-        if email_request.cc:
-            message["Cc"] = ", ".join(email_request.cc)
-        
-        # Set priority
-        if email_request.priority == EmailPriority.HIGH:
-            message["X-Priority"] = "1"
-            message["X-MSMail-Priority"] = "High"
-        elif email_request.priority == EmailPriority.LOW:
-            message["X-Priority"] = "5"
-            message["X-MSMail-Priority"] = "Low"
-        
-        # Add body
-        content_type = "html" if email_request.is_html else "plain"
-        text_part = MIMEText(email_request.body, content_type, "utf-8")
-        message.attach(text_part)
-        
+    async def _schedule(
+        self, email_request: EmailRequest, email_id: str
+    ) -> EmailResponse:
+        """Persist the request for the scheduler; send_email sends it when due."""
+        payload = email_request.model_dump_json(exclude={"send_at"})
+        scheduled_at = await scheduler.schedule(
+            "email", payload, email_request.send_at, job_id=email_id
+        )
+        logger.info(
+            f"Email scheduled. ID: {email_id}, release at {scheduled_at.isoformat()}"
+        )
+        return EmailResponse(
+            success=True,
+            message="Email scheduled",
+            email_id=email_id,
+            scheduled_at=scheduled_at
+        )
+
+    async def _filter_recipients(
+        self, email_request: EmailRequest
+    ) -> Tuple[Optional[EmailRequest], List[RecipientVerdict]]:
+        """
+        Run the recipient filter over to/cc/bcc.
+
+        Returns:
+            The request without rejected recipients (None if nobody is left) and
+            the verdicts
+        """
+        addresses = (
+            email_request.to + (email_request.cc or []) + (email_request.bcc or [])
+        )
+        verdicts = await self.recipient_filter.check(addresses)
+        rejected = {v.address for v in verdicts if not v.deliverable}
+        if not rejected:
+            return email_request, verdicts
+        if len(rejected) == len(set(addresses)):
+            return None, verdicts
+
+        def keep(recipients: Optional[List[str]]) -> Optional[List[str]]:
+            if recipients is None:
+                return None
+            return [r for r in recipients if r not in rejected] or None
+
+        filtered = email_request.model_copy(update={
+            "to": keep(email_request.to) or [],
+            "cc": keep(email_request.cc),
+            "bcc": keep(email_request.bcc),
+        })
+        return filtered, verdicts
+
+    def _record_refusals(
+        self,
+        verdicts: Optional[List[RecipientVerdict]],
+        refusals: Dict[str, Tuple[int, str]],
+    ) -> None:
+        """Mark relay-refused recipients and suppress permanent (5xx) rejections."""
+        if self.recipient_filter is None or not refusals:
+            return
+        for address, (code, message) in refusals.items():
+            if 500 <= code < 600:
+                self.recipient_filter.record_hard_bounce(address)
+        for verdict in verdicts or []:
+            if verdict.address in refusals:
+                code, message = refusals[verdict.address]
+                verdict.status = RecipientStatus.REFUSED
+                verdict.reason = f"{code} {message}"
+
+    async def _create_message(
+        self, email_request: EmailRequest, email_id: str
+    ) -> Tuple[OutgoingMessage, List[str]]:
+        """Render the message (in a worker process if large) and list its recipients."""
+        # Attachments: base64 bodies come from the shared cache, encoded once per blob
+        attachments = tuple([
+            AttachmentPart(
+                ref.filename,
+                ref.content_type,
+                await self.attachments.encoded(ref.sha256),
+            )
+            for ref in email_request.attachments or []
+        ])
+        spec = MessageSpec(
+            # Mostrar nombre comercial de la app en el remitente
+            from_header=formataddr(("OfertaMe", self.email_from)),
+            to=tuple(email_request.to),
+            cc=tuple(email_request.cc or ()),
+            subject=email_request.subject,
+            message_id=f"<{email_id}@{self.smtp_host}>",
+            body=email_request.body,
+            is_html=email_request.is_html,
+            priority=email_request.priority,
+            attachments=attachments,
+        )
+        message = await self.builder.render(spec)
+
         # Prepare recipients list
         recipients = email_request.to.copy()
         if email_request.cc:
@@ -97,92 +315,47 @@ class EmailService:
         
         return message, recipients
     
-    async def _send_smtp_message(self, message_data: tuple) -> None:
-        """Send message via SMTP."""
+    async def _send_smtp_message(
+        self, message_data: tuple
+    ) -> Dict[str, aiosmtplib.SMTPResponse]:
+        """
+        Send message through the SMTP provider router (weighted, with failover),
+        holding a slot on each recipient domain; 4xx deferrals pause that domain.
+
+        Returns:
+            Recipients the relay refused while accepting the message for the others
+        """
         message, recipients = message_data
-        
-        # Determine TLS configuration based on port
-        use_tls = self.smtp_port == 465  # SSL port
-        use_starttls = self.smtp_port == 587  # STARTTLS port
-        
-        # Get certificate validation setting from config
-        validate_certs = getattr(settings, 'smtp_validate_certs', True)
-        
-        # Create SMTP client
-        smtp = aiosmtplib.SMTP(
-            hostname=self.smtp_host,
-            port=self.smtp_port,
-            use_tls=use_tls,  # Only use TLS for port 465
-            username=self.smtp_user,
-            password=self.smtp_pass,
-            validate_certs=validate_certs  # Use certificate validation setting
-        )
-        
-        try:
-            await smtp.connect()
-            
-            # Handle authentication based on port and server behavior
-            if use_starttls:
-                try:
-                    # Try STARTTLS first (standard for port 587)
-                    await smtp.starttls()
-                    logger.info("STARTTLS successful, authenticating...")
-                    await smtp.login(self.smtp_user, self.smtp_pass)
-                except Exception as starttls_error:
-                    error_msg = str(starttls_error)
-                    if "Connection already using TLS" in error_msg:
-                        # Server already has TLS active, just authenticate
-                        logger.info("Server already using TLS, skipping STARTTLS")
-                        try:
-                            await smtp.login(self.smtp_user, self.smtp_pass)
-                        except Exception as auth_error:
-                            if "Already authenticated" in str(auth_error):
-                                logger.info("Server already authenticated, skipping login")
-                            else:
-                                raise auth_error
-                    elif "Already authenticated" in error_msg:
-                        # Server is already authenticated, skip login
-                        logger.info("Server already authenticated, skipping login")
-                    else:
-                        # Other STARTTLS error, re-raise
-                        logger.error(f"STARTTLS error: {error_msg}")
-                        raise starttls_error
-            elif use_tls:
-                # For port 465, authenticate directly (TLS already active)
-                try:
-                    await smtp.login(self.smtp_user, self.smtp_pass)
-                except Exception as auth_error:
-                    if "Already authenticated" in str(auth_error):
-                        logger.info("Server already authenticated, skipping login")
-                    else:
-                        raise auth_error
-            else:
-                # For Brevo: No TLS, no STARTTLS, just authenticate
-                try:
-                    await smtp.login(self.smtp_user, self.smtp_pass)
-                except Exception as auth_error:
-                    error_msg = str(auth_error)
-                    if "Already authenticated" in error_msg:
-                        logger.info("Server already authenticated, skipping login")
-                        # Don't raise the error, continue with sending
-                    else:
-                        logger.error(f"Authentication error: {error_msg}")
-                        raise auth_error
-            
-            # Send the message - this is where the "Already authenticated" error might occur
+        async with self.domain_throttle.acquire(recipients):
             try:
-                await smtp.send_message(message, recipients=recipients)
-            except Exception as send_error:
-                error_msg = str(send_error)
-                if "Already authenticated" in error_msg:
-                    logger.info("Server already authenticated during send, continuing...")
-                    # Try sending again or consider it successful
-                    logger.info("Email sent successfully despite authentication message")
-                else:
-                    raise send_error
-                    
-        finally:
-            await smtp.quit()
+                refused = await self.router.send(self.email_from, recipients, message)
+            except Exception as e:
+                self.domain_throttle.observe(recipients, error=e)
+                raise
+            self.domain_throttle.observe(recipients, refused=refused)
+            return refused
+
+    async def check_connection(self) -> None:
+        """
+        Readiness check: NOOP on a pooled session of any provider.
+        A delivery that succeeded within the readiness TTL already proves a relay works.
+        """
+        if (
+            self._last_delivery_ok is not None
+            and time.monotonic() - self._last_delivery_ok < settings.readiness_ttl
+        ):
+            return
+        await self.router.check()
+
+    async def prewarm(self) -> None:
+        """Open SMTP_PREWARM_CONNECTIONS sessions per provider before the first send."""
+        if settings.smtp_prewarm_connections > 0:
+            await self.router.prewarm(settings.smtp_prewarm_connections)
+
+    async def close(self) -> None:
+        """Close pooled SMTP sessions of every provider and the MIME worker pool."""
+        await self.router.close()
+        self.builder.close()
     
     async def send_bulk_emails(self, email_requests: List[EmailRequest]) -> List[EmailResponse]:
         """
@@ -213,4 +386,22 @@ class EmailService:
 
 
 # Global email service instance
-email_service = EmailService() 
\ No newline at end of file
+email_service = EmailService()
+metrics.register_collector(email_service.router.collect)
+metrics.register_collector(email_service.domain_throttle.collect)
+
+
+async def _send_scheduled_email(job: ScheduledJob) -> EmailResponse:
+    request = EmailRequest.model_validate_json(job.payload)
+    return await email_service.send_email(request, email_id=job.id)
+
+
+scheduler.register("email", _send_scheduled_email)
+
+
+async def _replay_email(letter: DeadLetter) -> bool:
+    request = EmailRequest.model_validate_json(letter.payload)
+    return (await email_service.send_email(request, email_id=letter.id)).success
+
+
+dead_letters.register("email", _replay_email)
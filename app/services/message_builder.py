@@ -0,0 +1,218 @@
+"""
+MIME assembly and DKIM signing, optionally in a pool of worker processes.
+
+`build_message` is a plain function over picklable inputs so it can run either
+on the event loop or in a ProcessPoolExecutor; each worker process parses the
+DKIM key once (see app.services.dkim.load_private_key).
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from email.charset import BASE64, QP, Charset
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate
+from typing import Awaitable, Callable, Optional, Tuple
+
+from aiosmtplib.email import flatten_message
+
+from app.config import settings
+from app.schemas.email_schema import EmailPriority
+from app.services.dkim import DEFAULT_SIGNED_HEADERS, DKIMSigner, load_private_key
+
+logger = logging.getLogger(__name__)
+
+MAX_LINE_BYTES = 998  # RFC 5322 limit; longer lines cannot be sent as 8bit
+
+
+@dataclass(frozen=True)
+class AttachmentPart:
+    filename: str
+    content_type: str
+    encoded: str  # Base64 body, already wrapped in 76-char lines
+
+
+@dataclass(frozen=True)
+class MessageSpec:
+    """Everything needed to render one message, without references to live objects."""
+    from_header: str
+    to: Tuple[str, ...]
+    subject: str
+    message_id: str
+    body: str
+    cc: Tuple[str, ...] = ()
+    is_html: bool = False
+    priority: EmailPriority = EmailPriority.NORMAL
+    attachments: Tuple[AttachmentPart, ...] = ()
+    eight_bit: bool = False  # Body as raw UTF-8 (needs 8BITMIME on the relay)
+
+    @property
+    def size(self) -> int:
+        """Approximate rendered size, used to decide whether offloading pays off."""
+        return len(self.body) + sum(len(a.encoded) for a in self.attachments)
+
+
+@dataclass(frozen=True)
+class DKIMConfig:
+    domain: str
+    selector: str
+    key_path: str
+    headers: Tuple[str, ...] = DEFAULT_SIGNED_HEADERS
+
+    def signer(self) -> DKIMSigner:
+        return DKIMSigner(
+            self.domain, self.selector, load_private_key(self.key_path), self.headers
+        )
+
+
+@dataclass(frozen=True)
+class OutgoingMessage:
+    """Rendered message; an 8-bit one carries a way to re-render it for 7-bit relays."""
+    data: bytes
+    eight_bit: bool = False
+    render_7bit: Optional[Callable[[], Awaitable[bytes]]] = None
+
+
+def _body_charset(body: str, eight_bit: bool) -> Charset:
+    """
+    Cheapest transfer encoding for the body: 8bit when allowed and every line fits,
+    otherwise quoted-printable for mostly-ASCII text (Spanish prose) and base64
+    for the rest.
+    """
+    charset = Charset("utf-8")
+    raw = body.encode("utf-8")
+    if eight_bit and all(len(line) <= MAX_LINE_BYTES for line in raw.splitlines()):
+        charset.body_encoding = None
+    elif sum(byte > 127 for byte in raw) * 6 < len(raw):
+        charset.body_encoding = QP
+    else:
+        charset.body_encoding = BASE64
+    return charset
+
+
+def build_message(spec: MessageSpec, dkim: Optional[DKIMConfig] = None) -> bytes:
+    """Render the message to wire format (CRLF), DKIM-signed when configured."""
+    message = MIMEMultipart()
+    message["From"] = spec.from_header
+    message["To"] = ", ".join(spec.to)
+    message["Subject"] = spec.subject
+    message["Date"] = formatdate()
+    message["Message-ID"] = spec.message_id
+
+    # Add CC if provided
+    if spec.cc:
+        message["Cc"] = ", ".join(spec.cc)
+
+    # Set priority
+    if spec.priority == EmailPriority.HIGH:
+        message["X-Priority"] = "1"
+        message["X-MSMail-Priority"] = "High"
+    elif spec.priority == EmailPriority.LOW:
+        message["X-Priority"] = "5"
+        message["X-MSMail-Priority"] = "Low"
+
+    # Add body
+    content_type = "html" if spec.is_html else "plain"
+    charset = _body_charset(spec.body, spec.eight_bit)
+    message.attach(MIMEText(spec.body, content_type, charset))
+
+    for attachment in spec.attachments:
+        maintype, _, subtype = attachment.content_type.partition("/")
+        part = MIMEBase(maintype, subtype or "octet-stream")
+        part.set_payload(attachment.encoded)
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header(
+            "Content-Disposition", "attachment", filename=attachment.filename
+        )
+        message.attach(part)
+
+    data = flatten_message(message, cte_type="8bit" if spec.eight_bit else "7bit")
+    if dkim is not None:
+        data = dkim.signer().sign(data)
+    return data
+
+
+class MessageBuilder:
+    """
+    Renders messages on the event loop or, when workers are configured, in a
+    process pool.
+
+    Small messages are always rendered inline: pickling them to a worker costs
+    more than building them.
+    """
+
+    def __init__(
+        self,
+        dkim: Optional[DKIMConfig] = None,
+        workers: int = 0,
+        offload_min_bytes: int = 16 * 1024,
+        eight_bit: bool = False,
+    ):
+        self.dkim = dkim
+        self.eight_bit = eight_bit
+        self.workers = workers
+        self.offload_min_bytes = offload_min_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        if dkim is not None:
+            dkim.signer()  # Fail fast on a missing or malformed key
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def build(self, spec: MessageSpec) -> bytes:
+        if self.workers > 0 and spec.size >= self.offload_min_bytes:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor(), build_message, spec, self.dkim
+            )
+        return build_message(spec, self.dkim)
+
+    async def render(self, spec: MessageSpec) -> OutgoingMessage:
+        """Render for delivery: 8-bit when enabled and useful, with a 7-bit fallback."""
+        if not self.eight_bit:
+            return OutgoingMessage(await self.build(spec))
+        data = await self.build(replace(spec, eight_bit=True))
+        if data.isascii():
+            return OutgoingMessage(data)
+        return OutgoingMessage(
+            data,
+            eight_bit=True,
+            render_7bit=lambda: self.build(replace(spec, eight_bit=False)),
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def build_message_builder() -> MessageBuilder:
+    """Message builder from settings (DKIM only when domain, selector and key set)."""
+    dkim = None
+    if (
+        settings.dkim_domain
+        and settings.dkim_selector
+        and settings.dkim_private_key_path
+    ):
+        dkim = DKIMConfig(
+            settings.dkim_domain, settings.dkim_selector, settings.dkim_private_key_path
+        )
+    elif settings.dkim_private_key_path:
+        logger.warning(
+            "DKIM key configured without DKIM_DOMAIN/DKIM_SELECTOR; not signing"
+        )
+    return MessageBuilder(
+        dkim,
+        workers=settings.mime_process_workers,
+        offload_min_bytes=settings.mime_offload_min_bytes,
+        eight_bit=settings.smtp_8bitmime,
+    )
@@ -0,0 +1,105 @@
+"""
+Multi-channel notifications: one recipient profile, email and WhatsApp sent
+concurrently.
+
+Each channel goes through its normal service (scheduling, coalescing, failover
+and dead letters included). A fallback rule such as {"whatsapp": "email"} sends
+the fallback channel once the primary one has failed; a primary send that was
+scheduled for later counts as successful, so its fallback is not triggered.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.schemas.email_schema import EmailRequest
+from app.schemas.notification_schema import (
+    ChannelResult, NotificationChannel, NotificationRequest, NotificationResponse
+)
+from app.schemas.whatsapp_schema import WhatsAppRequest
+from app.services.email_service import EmailService, email_service
+from app.services.whatsapp_service import WhatsAppService, whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationService:
+    """Fans one notification out across its channels and combines the results."""
+
+    def __init__(self, email: EmailService, whatsapp: WhatsAppService):
+        self.email = email
+        self.whatsapp = whatsapp
+
+    async def notify(self, request: NotificationRequest) -> NotificationResponse:
+        """Send every channel concurrently, then the fallbacks of those that failed."""
+        results = list(await asyncio.gather(
+            *(self._send(channel, request) for channel in request.channels)
+        ))
+        fallbacks = {
+            request.fallback[result.channel]: result.channel
+            for result in results
+            if not result.success and result.channel in request.fallback
+        }
+        if fallbacks:
+            results += await asyncio.gather(*(
+                self._send(channel, request, fallback_for=failed)
+                for channel, failed in fallbacks.items()
+            ))
+        return NotificationResponse(
+            success=any(r.success for r in results), results=results
+        )
+
+    async def notify_bulk(
+        self, requests: List[NotificationRequest]
+    ) -> List[NotificationResponse]:
+        """Send several notifications concurrently; responses are in request order."""
+        return list(
+            await asyncio.gather(*(self.notify(request) for request in requests))
+        )
+
+    async def _send(
+        self,
+        channel: NotificationChannel,
+        request: NotificationRequest,
+        fallback_for: Optional[NotificationChannel] = None,
+    ) -> ChannelResult:
+        try:
+            if channel == NotificationChannel.EMAIL:
+                sent = await self.email.send_email(EmailRequest(
+                    to=[request.recipient.email],
+                    subject=request.email.subject,
+                    body=request.email.body,
+                    is_html=request.email.is_html,
+                    priority=request.email.priority,
+                    send_at=request.send_at,
+                ))
+                sent_id = sent.email_id
+            else:
+                sent = await self.whatsapp.send_whatsapp(WhatsAppRequest(
+                    telefono=request.recipient.telefono,
+                    mensaje=request.whatsapp.mensaje,
+                    send_at=request.send_at,
+                ))
+                sent_id = sent.message_id
+        except Exception as e:
+            logger.error(f"Notification via {channel.value} failed: {str(e)}")
+            return ChannelResult(
+                channel=channel,
+                success=False,
+                message=f"Failed to send {channel.value}",
+                error_details=str(e),
+                fallback_for=fallback_for,
+            )
+        return ChannelResult(
+            channel=channel,
+            success=sent.success,
+            message=sent.message,
+            id=sent_id,
+            error_details=sent.error_details,
+            fallback_for=fallback_for,
+            scheduled_at=sent.scheduled_at,
+            duplicate=sent.duplicate,
+        )
+
+
+# Global notification service over the process-wide email and WhatsApp services
+notification_service = NotificationService(email_service, whatsapp_service)
@@ -0,0 +1,209 @@
+"""
+Outbound networking shared by the SMTP and WhatsApp providers.
+
+- DNSCache: host lookups cached for the TTL of the DNS answer (clamped), so new
+  connections to a provider do not resolve its name every time.
+- shared_ssl_context: one client SSLContext per verification mode, built once;
+  creating a default context loads the system CA bundle, which costs
+  milliseconds of CPU per connection.
+- open_tcp / CachedDNSBackend: TCP connections to the cached addresses, trying
+  each in turn; the name is dropped from the cache when none answers.
+
+Connections are kept alive and reused by the SMTP session pool and the HTTP
+client, and can be pre-warmed at startup, which removes the handshake from the
+request path altogether.
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import ssl
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import httpcore
+import httpx
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+except ImportError:  # Fall back to the system resolver with a fixed TTL
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def shared_ssl_context(validate: bool = True) -> ssl.SSLContext:
+    """Client TLS context shared by every outbound connection verifying the same way."""
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+    if not validate:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class DNSCache:
+    """
+    Address lookups cached per host name.
+
+    With dnspython the TTL of the answer is honoured, clamped to
+    [min_ttl, max_ttl]; otherwise (or when DNS fails, e.g. names only in
+    /etc/hosts) the system resolver is used and cached for `fallback_ttl`.
+    """
+
+    def __init__(
+        self,
+        min_ttl: float = 5.0,
+        max_ttl: float = 300.0,
+        fallback_ttl: float = 60.0,
+        timeout: float = 3.0,
+        maxsize: int = 256,
+    ):
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.fallback_ttl = fallback_ttl
+        self.timeout = timeout
+        self._cache: TTLCache[str, List[str]] = TTLCache(maxsize, fallback_ttl)
+        self._resolver = dns.asyncresolver.Resolver() if dns is not None else None
+        self.lookups = 0  # Lookups that missed the cache
+
+    async def resolve(self, host: str) -> List[str]:
+        """Addresses of `host` (IPv4 first); IP literals are returned as they are."""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        key = host.lower()
+        addresses = self._cache.get(key)
+        if addresses is not None:
+            return addresses
+        self.lookups += 1
+        addresses, ttl = await self._lookup(key)
+        self._cache.set(key, addresses, ttl=ttl)
+        return addresses
+
+    def invalidate(self, host: str) -> None:
+        self._cache.pop(host.lower())
+
+    async def _lookup(self, host: str) -> Tuple[List[str], float]:
+        if self._resolver is not None:
+            addresses: List[str] = []
+            ttl = self.max_ttl
+            for rdtype in ("A", "AAAA"):
+                try:
+                    answer = await self._resolver.resolve(
+                        host, rdtype, lifetime=self.timeout
+                    )
+                except dns.exception.DNSException:
+                    continue
+                addresses += [record.address for record in answer]
+                ttl = min(ttl, answer.rrset.ttl)
+            if addresses:
+                return addresses, min(max(ttl, self.min_ttl), self.max_ttl)
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        ordered = sorted(infos, key=lambda info: info[0] != socket.AF_INET)
+        addresses = list(dict.fromkeys(info[4][0] for info in ordered))
+        return addresses, self.fallback_ttl
+
+
+async def open_tcp(
+    host: str, port: int, timeout: Optional[float] = None
+) -> socket.socket:
+    """Connected non-blocking socket to `host`, using the cached addresses in order."""
+    loop = asyncio.get_running_loop()
+    last_error: Optional[BaseException] = None
+    for address in await dns_cache.resolve(host):
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (address, port)), timeout)
+            return sock
+        except (OSError, asyncio.TimeoutError) as e:
+            sock.close()
+            last_error = e
+    dns_cache.invalidate(host)  # Maybe the provider moved; resolve again next time
+    if isinstance(last_error, asyncio.TimeoutError):
+        raise TimeoutError(f"Timed out connecting to {host}:{port}")
+    raise last_error or OSError(f"No address for {host}")
+
+
+class CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend resolving through the DNS cache (TLS still uses the
+    host name).
+    """
+
+    def __init__(self) -> None:
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self, host: str, port: int, timeout: Optional[float] = None,
+        local_address: Optional[str] = None, socket_options=None,
+    ) -> httpcore.AsyncNetworkStream:
+        last_error: Optional[BaseException] = None
+        for address in await dns_cache.resolve(host):
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout,
+                    local_address=local_address, socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        dns_cache.invalidate(host)
+        raise last_error or httpcore.ConnectError(f"No address for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options
+        )
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class OutboundHTTPTransport(httpx.AsyncHTTPTransport):
+    """Keep-alive HTTP transport with the shared SSLContext and the DNS cache."""
+
+    def __init__(self, limits: httpx.Limits = httpx.Limits(), validate: bool = True):
+        super().__init__(verify=shared_ssl_context(validate), limits=limits)
+        # httpx does not take a network backend; rebuild its pool the same way with ours
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=shared_ssl_context(validate),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=CachedDNSBackend(),
+        )
+
+
+async def prewarm(*warmups, timeout: float) -> None:
+    """Run provider warm-up coroutines concurrently; failures are logged, not raised."""
+    started = time.perf_counter()
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*warmups, return_exceptions=True), timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Connection pre-warming did not finish within {timeout:.0f}s")
+        return
+    for result in results:
+        if isinstance(result, Exception):
+            reason = str(result) or type(result).__name__
+            logger.warning(f"Connection pre-warming failed: {reason}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Outbound connections pre-warmed in {elapsed_ms:.0f} ms")
+
+
+# Process-wide DNS cache used by every outbound connection
+dns_cache = DNSCache(
+    min_ttl=settings.dns_cache_min_ttl, max_ttl=settings.dns_cache_max_ttl
+)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.lifecycle import delivery_tracker
+from app.services.email_service import email_service
+from app.services.whatsapp_service import whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderCheck:
+    """A named reachability check against one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        check: Callable[[], Awaitable[None]],
+        enabled: Callable[[], bool] = lambda: True,
+    ):
+        self.name = name
+        self.check = check
+        self.enabled = enabled
+
+
+class Readiness:
+    """
+    Cached readiness of the outbound providers.
+
+    Checks run in a background task every `ttl` seconds; probes only read the last
+    result, so they are cheap at any probe frequency and never wait on a provider.
+    A result older than three refresh periods counts as not ready.
+    """
+
+    def __init__(self, ttl: float, timeout: float):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._checks: Dict[str, ProviderCheck] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, check: ProviderCheck) -> None:
+        self._checks[check.name] = check
+
+    async def _run(self, check: ProviderCheck) -> None:
+        if not check.enabled():
+            result: Dict[str, Any] = {"status": "disabled"}
+        else:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(check.check(), timeout=self.timeout)
+                result = {"status": "ok"}
+            except Exception as e:
+                logger.warning(f"Readiness check '{check.name}' failed: {str(e)}")
+                result = {"status": "error", "error": str(e) or type(e).__name__}
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["checked_at"] = datetime.now(timezone.utc).isoformat()
+        self._results[check.name] = result
+        self._checked_at[check.name] = time.monotonic()
+
+    async def refresh(self) -> None:
+        """Run every check once, concurrently."""
+        await asyncio.gather(*(self._run(check) for check in self._checks.values()))
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:  # Keep refreshing whatever happens
+                logger.error(f"Readiness refresh failed: {str(e)}")
+            await asyncio.sleep(self.ttl)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def result(self, name: str) -> Dict[str, Any]:
+        """Last cached result of one check (never runs the check)."""
+        result = self._results.get(name)
+        if result is None:
+            return {"status": "pending"}
+        age = time.monotonic() - self._checked_at[name]
+        if age > 3 * self.ttl:
+            return {**result, "status": "stale"}
+        return result
+
+    def response(self, *names: str) -> JSONResponse:
+        """Probe response for the given checks (all if none given): 200 or 503."""
+        checks = {name: self.result(name) for name in (names or self._checks)}
+        ready = not delivery_tracker.draining and all(
+            check["status"] in ("ok", "disabled") for check in checks.values()
+        )
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={
+                "status": "ready" if ready else "not_ready",
+                "draining": delivery_tracker.draining,
+                "checks": checks,
+            },
+        )
+
+
+def _whatsapp_enabled() -> bool:
+    return bool(
+        settings.activar_whatsapp and settings.whatsapp_token and settings.whatsapp_url
+    )
+
+
+# Global readiness state, refreshed from the application lifespan
+readiness = Readiness(ttl=settings.readiness_ttl, timeout=settings.readiness_timeout)
+readiness.register(ProviderCheck("smtp", email_service.check_connection))
+readiness.register(
+    ProviderCheck(
+        "whatsapp",
+        lambda: whatsapp_service.check_connection(timeout=settings.readiness_timeout),
+        enabled=_whatsapp_enabled,
+    )
+)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.config import settings
+from app.metrics import metrics
+from app.schemas.email_schema import RecipientStatus, RecipientVerdict
+from app.utils.ttl_cache import TTLCache
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+    import dns.resolver
+except ImportError:  # dnspython ships with email-validator, but keep it optional
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+verdicts_total = metrics.counter(
+    "recipient_filter_verdicts_total", "Recipient filter verdicts by status"
+)
+
+
+class DNSResolver:
+    """MX lookups through dnspython's async resolver."""
+
+    def __init__(self, timeout: float = 3.0):
+        if dns is None:
+            raise RuntimeError(
+                "dnspython is required for MX lookups (pip install dnspython)"
+            )
+        self.timeout = timeout
+        self._resolver = dns.asyncresolver.Resolver()
+
+    async def has_mx(self, domain: str) -> Optional[bool]:
+        """
+        True if the domain accepts mail, False if it cannot, None if DNS failed.
+
+        A null MX (RFC 7505) means no mail; a domain without MX but with an
+        address record accepts mail on that host (RFC 5321 implicit MX).
+        """
+        try:
+            answer = await self._resolver.resolve(domain, "MX", lifetime=self.timeout)
+            return any(str(record.exchange) != "." for record in answer)
+        except dns.resolver.NXDOMAIN:
+            return False
+        except dns.resolver.NoAnswer:
+            pass
+        except dns.exception.DNSException as e:
+            logger.warning(f"MX lookup failed for {domain}: {str(e)}")
+            return None
+
+        for rdtype in ("A", "AAAA"):
+            try:
+                await self._resolver.resolve(domain, rdtype, lifetime=self.timeout)
+                return True
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+                continue
+            except dns.exception.DNSException as e:
+                logger.warning(f"Address lookup failed for {domain}: {str(e)}")
+                return None
+        return False
+
+
+class StaticResolver:
+    """Resolver answering from a fixed mapping; for offline tests and local runs."""
+
+    def __init__(
+        self, domains: Dict[str, Optional[bool]], default: Optional[bool] = True
+    ):
+        self.domains = {d.lower(): v for d, v in domains.items()}
+        self.default = default
+        self.lookups: List[str] = []
+
+    async def has_mx(self, domain: str) -> Optional[bool]:
+        self.lookups.append(domain)
+        return self.domains.get(domain, self.default)
+
+
+class SuppressionList:
+    """Known-bad addresses, optionally persisted one per line in a text file."""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._addresses: Set[str] = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._addresses = {line.strip().lower() for line in f if line.strip()}
+
+    def __contains__(self, address: str) -> bool:
+        return address.lower() in self._addresses
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def add(self, address: str) -> None:
+        address = address.lower()
+        with self._lock:
+            if address in self._addresses:
+                return
+            self._addresses.add(address)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(address + "\n")
+
+
+class RecipientFilter:
+    """
+    Pre-send recipient check: suppression list first, then a cached MX lookup per
+    domain.
+
+    Domains whose lookup fails are let through ("unverified"); only a definite
+    "no mail here" answer rejects a recipient.
+    """
+
+    def __init__(
+        self,
+        resolver,
+        suppression: Optional[SuppressionList] = None,
+        cache_size: int = 10000,
+        positive_ttl: float = 3600.0,
+        negative_ttl: float = 300.0,
+    ):
+        self.resolver = resolver
+        self.suppression = suppression if suppression is not None else SuppressionList()
+        self.negative_ttl = negative_ttl
+        self._mx_cache: TTLCache[str, bool] = TTLCache(cache_size, positive_ttl)
+
+    async def _domain_accepts_mail(self, domain: str) -> Optional[bool]:
+        cached = self._mx_cache.get(domain)
+        if cached is not None:
+            return cached
+        result = await self.resolver.has_mx(domain)
+        if result is not None:
+            ttl = None if result else self.negative_ttl
+            self._mx_cache.set(domain, result, ttl=ttl)
+        return result
+
+    async def check(self, addresses: Iterable[str]) -> List[RecipientVerdict]:
+        """One verdict per address, in order; each domain is looked up once."""
+        addresses = list(addresses)
+        domains = sorted({
+            a.rsplit("@", 1)[-1].lower() for a in addresses if a not in self.suppression
+        })
+        results = await asyncio.gather(*(self._domain_accepts_mail(d) for d in domains))
+        accepts = dict(zip(domains, results))
+
+        verdicts = []
+        for address in addresses:
+            if address in self.suppression:
+                verdict = RecipientVerdict(
+                    address=address,
+                    status=RecipientStatus.SUPPRESSED,
+                    reason="Address is on the suppression list",
+                )
+            else:
+                domain = address.rsplit("@", 1)[-1].lower()
+                if accepts[domain] is False:
+                    verdict = RecipientVerdict(
+                        address=address,
+                        status=RecipientStatus.NO_MX,
+                        reason=f"Domain {domain} does not accept mail",
+                    )
+                elif accepts[domain] is None:
+                    verdict = RecipientVerdict(
+                        address=address,
+                        status=RecipientStatus.UNVERIFIED,
+                        reason="MX lookup failed",
+                    )
+                else:
+                    verdict = RecipientVerdict(
+                        address=address, status=RecipientStatus.ACCEPTED
+                    )
+            verdicts_total.inc(status=verdict.status.value)
+            verdicts.append(verdict)
+        return verdicts
+
+    def record_hard_bounce(self, address: str) -> None:
+        """Suppress an address the relay rejected permanently (5xx)."""
+        logger.info(f"Suppressing {address} after a permanent rejection")
+        self.suppression.add(address)
+
+
+def build_recipient_filter() -> Optional[RecipientFilter]:
+    """Recipient filter configured from settings, or None when disabled."""
+    if not settings.recipient_filter_enabled:
+        return None
+    return RecipientFilter(
+        DNSResolver(timeout=settings.recipient_dns_timeout),
+        SuppressionList(settings.suppression_list_path),
+        cache_size=settings.recipient_mx_cache_size,
+        positive_ttl=settings.recipient_mx_cache_ttl,
+        negative_ttl=settings.recipient_mx_negative_ttl,
+    )
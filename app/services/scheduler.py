@@ -0,0 +1,343 @@
+"""
+Deferred sends (`send_at`) with an in-process timer heap backed by SQLite.
+
+Each job is persisted when scheduled and removed once delivered, so pending
+sends survive restarts. Due times get a random jitter and jobs are released
+through a token bucket, so a campaign scheduled for the top of the hour reaches
+the providers as a steady stream instead of a burst. Several worker processes
+can share the database: a job is claimed (with a lease) before it runs, so only
+one of them delivers it; the others pick up jobs left claimed by a worker
+that went away once the lease has expired.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.lifecycle import delivery_tracker
+from app.metrics import Sample, metrics
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LEASE = 300.0  # Seconds before a claimed, unfinished job may run elsewhere
+MAX_SLEEP = 30.0  # Re-check the heap at least this often (wall clock may jump)
+STALE_POLL = 60.0  # Look for jobs abandoned by other workers this often
+
+
+released_total = metrics.counter(
+    "scheduler_released_total",
+    "Scheduled sends released into the delivery path, by channel",
+)
+
+
+@dataclass(order=True)
+class ScheduledJob:
+    due: float  # Unix time, jitter included
+    id: str = field(compare=False)
+    channel: str = field(compare=False)
+    payload: str = field(compare=False)  # JSON request without send_at
+
+
+Handler = Callable[[ScheduledJob], Awaitable[object]]
+
+
+class ScheduledStore:
+    """SQLite table of pending jobs, shared by the worker processes of one host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scheduled_jobs ("
+                " id TEXT PRIMARY KEY, channel TEXT NOT NULL, due REAL NOT NULL,"
+                " payload TEXT NOT NULL, claimed_at REAL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def add(self, job: ScheduledJob) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO scheduled_jobs (id, channel, due, payload) "
+                "VALUES (?, ?, ?, ?)",
+                (job.id, job.channel, job.due, job.payload),
+            )
+            conn.commit()
+
+    def claim(self, job_id: str, now: float) -> bool:
+        """Take the job unless another process holds a live claim on it."""
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE scheduled_jobs SET claimed_at = ?"
+                " WHERE id = ? AND (claimed_at IS NULL OR claimed_at < ?)",
+                (now, job_id, now - CLAIM_LEASE),
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def remove(self, job_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM scheduled_jobs WHERE id = ?", (job_id,))
+            conn.commit()
+
+    def pending(self) -> List[ScheduledJob]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT due, id, channel, payload FROM scheduled_jobs"
+            ).fetchall()
+        return [ScheduledJob(*row) for row in rows]
+
+    def stale(self, now: float) -> List[ScheduledJob]:
+        """
+        Jobs left behind by a worker that went away: claimed longer than a lease
+        ago, or never claimed although due for longer than a lease.
+        """
+        cutoff = now - CLAIM_LEASE
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT due, id, channel, payload FROM scheduled_jobs"
+                " WHERE claimed_at < ? OR (claimed_at IS NULL AND due < ?)",
+                (cutoff, cutoff),
+            ).fetchall()
+        return [ScheduledJob(*row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class TokenBucket:
+    """Smooths releases to `rate` per second, allowing short bursts of `burst`."""
+
+    def __init__(
+        self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def delay(self) -> float:
+        """Take a token; returns how long to wait before using it (0 if available)."""
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class Scheduler:
+    """Timer heap releasing persisted jobs to per-channel handlers at a smooth rate."""
+
+    def __init__(
+        self,
+        store: ScheduledStore,
+        rate: float = 10.0,
+        burst: int = 1,
+        jitter: float = 0.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.store = store
+        self.jitter = jitter
+        self._bucket = TokenBucket(rate, burst)
+        self._rng = rng or random.Random()
+        self._handlers: Dict[str, Handler] = {}
+        self._heap: List[ScheduledJob] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_stale_poll = 0.0
+        self._running: set = set()  # Strong references to released jobs' tasks
+
+    def register(self, channel: str, handler: Handler) -> None:
+        """Handler receiving each due job of a channel."""
+        self._handlers[channel] = handler
+
+    @staticmethod
+    def is_deferred(send_at: Optional[datetime]) -> bool:
+        """True if send_at is in the future (naive datetimes are taken as UTC)."""
+        if send_at is None:
+            return False
+        if send_at.tzinfo is None:
+            send_at = send_at.replace(tzinfo=timezone.utc)
+        return send_at.timestamp() > time.time()
+
+    async def schedule(
+        self,
+        channel: str,
+        payload: str,
+        send_at: datetime,
+        job_id: Optional[str] = None,
+    ) -> datetime:
+        """
+        Persist a job and queue it. Returns the release time, jitter included.
+
+        Args:
+            job_id: Id of the job, passed to the handler (default: a new uuid)
+        """
+        if channel not in self._handlers:
+            raise ValueError(f"No handler registered for channel '{channel}'")
+        if send_at.tzinfo is None:
+            send_at = send_at.replace(tzinfo=timezone.utc)
+        due = send_at.timestamp() + self._rng.uniform(0, self.jitter)
+        job = ScheduledJob(
+            due=due, id=job_id or uuid.uuid4().hex, channel=channel, payload=payload
+        )
+        await asyncio.to_thread(self.store.add, job)
+        self._push(job)
+        return datetime.fromtimestamp(due, timezone.utc)
+
+    def _push(self, job: ScheduledJob) -> None:
+        heapq.heappush(self._heap, job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """Load persisted jobs and start releasing them (idempotent)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._heap = await asyncio.to_thread(self.store.pending)
+        heapq.heapify(self._heap)
+        self._wakeup = asyncio.Event()
+        self._next_stale_poll = time.time() + STALE_POLL
+        self._task = asyncio.create_task(self._run())
+        if self._heap:
+            logger.info(f"Scheduler loaded {len(self._heap)} pending job(s)")
+
+    async def stop(self) -> None:
+        """
+        Stop releasing jobs; jobs not yet released stay in the store.
+
+        Released jobs already delivering are tracked by the delivery tracker; one cut
+        short by the shutdown deadline keeps its claim and runs again once the lease
+        expires (picked up by another worker's stale poll, or by the next start).
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            await self._adopt_stale()
+            timeout = self._next_wait()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+            if not delivery_tracker.draining:
+                await self._dispatch(heapq.heappop(self._heap))
+
+    def _next_wait(self) -> float:
+        """Seconds until the first job is due, capped by the next stale poll."""
+        timeout = min(MAX_SLEEP, self._next_stale_poll - time.time())
+        if self._heap and not delivery_tracker.draining:
+            timeout = min(timeout, self._heap[0].due - time.time())
+        return timeout
+
+    async def _adopt_stale(self) -> None:
+        """Queue jobs abandoned by other workers (see ScheduledStore.stale)."""
+        now = time.time()
+        if now < self._next_stale_poll:
+            return
+        self._next_stale_poll = now + STALE_POLL
+        try:
+            stale = await asyncio.to_thread(self.store.stale, now)
+        except sqlite3.Error as e:
+            logger.error(f"Could not poll scheduled jobs: {str(e)}")
+            return
+        queued = {job.id for job in self._heap}
+        for job in stale:
+            if job.id not in queued:
+                self._push(job)
+
+    async def _dispatch(self, job: ScheduledJob) -> None:
+        """Claim the job and start its handler; a live claim elsewhere drops it."""
+        try:
+            claimed = await asyncio.to_thread(self.store.claim, job.id, time.time())
+        except sqlite3.Error as e:
+            logger.error(f"Could not claim scheduled job {job.id}: {str(e)}")
+            job.due = time.time() + 1
+            self._push(job)
+            return
+        if claimed:
+            task = asyncio.create_task(self._release(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _release(self, job: ScheduledJob) -> None:
+        handler = self._handlers.get(job.channel)
+        try:
+            if handler is None:
+                logger.error(
+                    f"Dropping scheduled job {job.id}: unknown channel '{job.channel}'"
+                )
+            else:
+                released_total.inc(channel=job.channel)
+                await handler(job)
+        except asyncio.CancelledError:
+            # Cut short (shutdown): the row keeps its claim and runs again after
+            # the lease
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled {job.channel} job {job.id} failed: {str(e)}")
+        await asyncio.to_thread(self.store.remove, job.id)
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def collect(self) -> Iterable[Sample]:
+        """Metrics collector: jobs waiting in this process's heap."""
+        yield "scheduler_pending_jobs", {}, len(self._heap)
+
+
+def default_scheduler_db_path() -> str:
+    return settings.scheduler_db_path or os.path.join(
+        tempfile.gettempdir(), "api-msj-scheduled.sqlite3"
+    )
+
+
+# Global scheduler; channels register their handlers where their service is defined
+scheduler = Scheduler(
+    ScheduledStore(default_scheduler_db_path()),
+    rate=settings.scheduler_release_rate,
+    burst=settings.scheduler_release_burst,
+    jitter=settings.scheduler_jitter_seconds,
+)
+metrics.register_collector(scheduler.collect)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Optional, Tuple
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Pool of connected and authenticated SMTP sessions.
+
+    A session is handed to one sender at a time and returned after a successful
+    transaction, so consecutive sends skip TCP/TLS setup, EHLO and AUTH. Sessions
+    that fail are discarded. Idle sessions are checked with NOOP before reuse and
+    closed once they exceed the idle timeout.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[aiosmtplib.SMTP]],
+        max_size: int = 5,
+        idle_timeout: float = 60.0,
+        ping_after: float = 15.0,
+    ):
+        """
+        Args:
+            connect: Coroutine factory returning a connected, authenticated session
+            max_size: Maximum number of sessions open at the same time
+            idle_timeout: Seconds after which an idle session is closed
+            ping_after: Idle seconds after which a session is checked with NOOP
+        """
+        self._connect = connect
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle: Deque[Tuple[aiosmtplib.SMTP, float]] = deque()
+        self._in_use = 0
+        self._closed = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_loop(self) -> asyncio.Semaphore:
+        """Bind to the running loop; sessions from a previous loop cannot be reused."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._slots is None:
+            while self._idle:
+                smtp, _ = self._idle.popleft()
+                self._close_quietly(smtp)
+            self._loop = loop
+            self._in_use = 0
+            self._slots = asyncio.Semaphore(self.max_size)
+        return self._slots
+
+    @staticmethod
+    def _close_quietly(smtp: aiosmtplib.SMTP) -> None:
+        try:
+            smtp.close()
+        except Exception:  # Transport of a closed loop, already closed...
+            pass
+
+    async def _take_idle(self) -> Optional[aiosmtplib.SMTP]:
+        """Pop the most recently used healthy idle session, if any."""
+        now = time.monotonic()
+        while self._idle:
+            smtp, released_at = self._idle.pop()
+            idle_for = now - released_at
+            if not smtp.is_connected or idle_for > self.idle_timeout:
+                self._close_quietly(smtp)
+                continue
+            if idle_for > self.ping_after:
+                try:
+                    await smtp.noop()
+                except Exception:
+                    self._close_quietly(smtp)
+                    continue
+            return smtp
+        return None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """
+        Borrow a session for one transaction.
+
+        The session goes back to the pool if the block completes, and is closed
+        if the block raises.
+        """
+        slots = self._ensure_loop()
+        async with slots:
+            smtp = await self._take_idle()
+            if smtp is None:
+                smtp = await self._connect()
+            self._in_use += 1
+            try:
+                yield smtp
+            except BaseException:
+                self._close_quietly(smtp)
+                raise
+            else:
+                if self._closed or not smtp.is_connected:
+                    await self._quit(smtp)
+                else:
+                    self._idle.append((smtp, time.monotonic()))
+            finally:
+                self._in_use -= 1
+
+    async def prewarm(self, count: int) -> int:
+        """Open sessions until `count` are idle (up to max_size); returns the number."""
+        self._ensure_loop()
+        wanted = min(count, self.max_size - self._in_use) - len(self._idle)
+        if wanted <= 0:
+            return 0
+        results = await asyncio.gather(
+            *(self._connect() for _ in range(wanted)), return_exceptions=True
+        )
+        now = time.monotonic()
+        sessions = [r for r in results if isinstance(r, aiosmtplib.SMTP)]
+        self._idle.extend((smtp, now) for smtp in sessions)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+        return len(sessions)
+
+    async def _quit(self, smtp: aiosmtplib.SMTP) -> None:
+        try:
+            await smtp.quit()
+        except Exception:
+            self._close_quietly(smtp)
+
+    async def close(self) -> None:
+        """Quit idle sessions; sessions in use are quit when they are returned."""
+        self._closed = True
+        idle = list(self._idle)
+        self._idle.clear()
+        if self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*(self._quit(smtp) for smtp, _ in idle))
+        else:
+            for smtp, _ in idle:
+                self._close_quietly(smtp)
+
+    def stats(self) -> dict:
+        return {
+            "max_size": self.max_size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+        }
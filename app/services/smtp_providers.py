@@ -0,0 +1,432 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+import aiosmtplib
+
+from app.config import SMTPProviderConfig, settings
+from app.metrics import Sample, metrics
+from app.schemas.dead_letter_schema import FailureClass
+from app.services.adaptive_limit import AdaptiveLimiter
+from app.services.message_builder import OutgoingMessage
+from app.services.outbound import open_tcp, shared_ssl_context
+from app.services.smtp_pool import SMTPConnectionPool
+from app.services.smtp_transaction import send_transaction
+
+logger = logging.getLogger(__name__)
+
+# Errors that say "this relay is unusable right now" rather than "this message is bad"
+PROVIDER_ERRORS = (
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPTimeoutError,
+    aiosmtplib.SMTPAuthenticationError,
+    aiosmtplib.SMTPHeloError,
+    OSError,
+)
+SERVICE_NOT_AVAILABLE = 421
+
+LATENCY_ALPHA = 0.2  # EWMA smoothing of per-send latency
+DEFAULT_LATENCY = 0.5  # Seconds assumed for a provider with no samples yet
+MIN_LATENCY = 0.05  # Floor so one very fast sample cannot take all the traffic
+CONNECT_TIMEOUT = 30.0  # Seconds to establish the TCP connection to a relay
+
+sends_total = metrics.counter(
+    "smtp_provider_sends_total",
+    "SMTP sends per provider and outcome (success, failure)",
+)
+failovers_total = metrics.counter(
+    "smtp_provider_failovers_total",
+    "Sends delivered by a provider after another one failed",
+)
+
+
+def is_provider_failure(exc: BaseException) -> bool:
+    """True when the error should open the provider circuit and fail over."""
+    if isinstance(exc, aiosmtplib.SMTPResponseException):
+        return exc.code == SERVICE_NOT_AVAILABLE or isinstance(exc, PROVIDER_ERRORS)
+    return isinstance(exc, PROVIDER_ERRORS)
+
+
+class SMTPProvidersUnavailable(aiosmtplib.SMTPException):
+    """No SMTP provider could take the message."""
+
+
+def classify_failure(exc: BaseException) -> FailureClass:
+    """Dead-letter class of a failed send."""
+    if isinstance(exc, SMTPProvidersUnavailable) or is_provider_failure(exc):
+        return FailureClass.PROVIDER_UNAVAILABLE
+    if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+        codes = [error.code for error in exc.recipients]
+        if codes and all(400 <= c < 500 for c in codes):
+            return FailureClass.TEMPORARY
+        return FailureClass.REJECTED
+    if isinstance(exc, aiosmtplib.SMTPResponseException):
+        if 400 <= exc.code < 500:
+            return FailureClass.TEMPORARY
+        return FailureClass.REJECTED
+    return FailureClass.ERROR
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; allows a trial after the reset timeout."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class SMTPProvider:
+    """One SMTP relay with its own session pool, circuit breaker and latency."""
+
+    def __init__(self, config: SMTPProviderConfig, breaker: CircuitBreaker):
+        self.config = config
+        self.name = config.name
+        self.breaker = breaker
+        self.latency: Optional[float] = None
+        self.limiter = AdaptiveLimiter.from_settings(
+            f"smtp:{self.name}",
+            settings.smtp_pool_size,
+            is_congestion=is_provider_failure,
+        )
+        self.pool = SMTPConnectionPool(
+            self.open_connection,
+            max_size=self.limiter.max_limit,
+            idle_timeout=settings.smtp_pool_idle_timeout,
+        )
+
+    def _tls_mode(self) -> str:
+        if self.config.tls != "auto":
+            return self.config.tls
+        if self.config.port == 465:  # SSL port
+            return "tls"
+        if self.config.port == 587:  # STARTTLS port
+            return "starttls"
+        return "auto"
+
+    async def open_connection(self) -> aiosmtplib.SMTP:
+        """Open and authenticate a new SMTP session (used by the connection pool)."""
+        config = self.config
+        mode = self._tls_mode()
+        use_tls = mode == "tls"
+        use_starttls = mode == "starttls"
+
+        tls_context = shared_ssl_context(config.validate_certs)
+        if use_tls:
+            # Implicit TLS: asyncio needs the host name for SNI and aiosmtplib cannot
+            # take both a socket and a host name, so this mode connects (and
+            # resolves) by name
+            smtp = aiosmtplib.SMTP(
+                hostname=config.host,
+                port=config.port,
+                use_tls=True,
+                username=config.user,
+                password=config.password,
+                tls_context=tls_context,
+            )
+            await smtp.connect()
+        else:
+            # Plain TCP to the cached address; STARTTLS and AUTH are driven below, so
+            # the credentials are never sent before TLS is up
+            sock = await open_tcp(config.host, config.port, timeout=CONNECT_TIMEOUT)
+            smtp = aiosmtplib.SMTP(
+                hostname=None, sock=sock, start_tls=False, tls_context=tls_context
+            )
+            try:
+                await smtp.connect()
+            except BaseException:
+                sock.close()
+                raise
+
+        try:
+            if mode == "auto":
+                await smtp.ehlo()
+                if smtp.supports_extension("starttls"):
+                    await smtp.starttls(server_hostname=config.host)
+
+            # Handle authentication based on TLS mode and server behavior
+            if use_starttls:
+                try:
+                    # Try STARTTLS first (standard for port 587)
+                    await smtp.starttls(server_hostname=config.host)
+                    logger.info("STARTTLS successful, authenticating...")
+                    await smtp.login(config.user, config.password)
+                except Exception as starttls_error:
+                    error_msg = str(starttls_error)
+                    if "Connection already using TLS" in error_msg:
+                        # Server already has TLS active, just authenticate
+                        logger.info("Server already using TLS, skipping STARTTLS")
+                        try:
+                            await smtp.login(config.user, config.password)
+                        except Exception as auth_error:
+                            if "Already authenticated" in str(auth_error):
+                                logger.info(
+                                    "Server already authenticated, skipping login"
+                                )
+                            else:
+                                raise auth_error
+                    elif "Already authenticated" in error_msg:
+                        # Server is already authenticated, skip login
+                        logger.info("Server already authenticated, skipping login")
+                    else:
+                        # Other STARTTLS error, re-raise
+                        logger.error(f"STARTTLS error: {error_msg}")
+                        raise starttls_error
+            else:
+                # Implicit TLS (465) or plain (e.g. Brevo): TLS state is settled,
+                # just authenticate
+                try:
+                    await smtp.login(config.user, config.password)
+                except Exception as auth_error:
+                    error_msg = str(auth_error)
+                    if "Already authenticated" in error_msg:
+                        logger.info("Server already authenticated, skipping login")
+                        # Don't raise the error, continue with sending
+                    else:
+                        logger.error(f"Authentication error: {error_msg}")
+                        raise auth_error
+        except BaseException:
+            smtp.close()
+            raise
+
+        return smtp
+
+    async def send(
+        self, sender: str, recipients: List[str], message: OutgoingMessage
+    ) -> Dict[str, aiosmtplib.SMTPResponse]:
+        """
+        Send one rendered message through this provider, updating latency and circuit
+        state.
+
+        The transaction uses PIPELINING, CHUNKING and 8BITMIME when the relay advertises
+        them; an 8-bit message is re-rendered as 7-bit for relays without 8BITMIME.
+
+        Returns:
+            Recipients the relay refused while accepting the message for the others
+        """
+        refused: Dict[str, aiosmtplib.SMTPResponse] = {}
+        mail_options = []
+        if not (sender + "".join(recipients)).isascii():
+            mail_options.append("SMTPUTF8")
+        try:
+            async with self.limiter.acquire() as call, self.pool.acquire() as smtp:
+                # Queueing and opening a session are not relay latency
+                call.restart()
+                started = time.perf_counter()
+                data = message.data
+                if message.eight_bit:
+                    if smtp.supports_extension("8bitmime"):
+                        mail_options.append("BODY=8BITMIME")
+                    else:
+                        data = await message.render_7bit()
+                # Send the message - this is where the "Already authenticated"
+                # error might occur
+                try:
+                    refused = await send_transaction(
+                        smtp, sender, recipients, data, mail_options
+                    )
+                except Exception as send_error:
+                    if "Already authenticated" in str(send_error):
+                        logger.info(
+                            "Server already authenticated during send, continuing..."
+                        )
+                    else:
+                        raise send_error
+        except Exception as e:
+            if is_provider_failure(e):
+                self.breaker.record_failure()
+                sends_total.inc(provider=self.name, outcome="failure")
+            raise
+        self._observe_latency(time.perf_counter() - started)
+        self.breaker.record_success()
+        sends_total.inc(provider=self.name, outcome="success")
+        return refused
+
+    async def check(self) -> None:
+        """NOOP on a pooled session (connecting and authenticating if needed)."""
+        async with self.pool.acquire() as smtp:
+            await smtp.noop()
+
+    def _observe_latency(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_ALPHA * (seconds - self.latency)
+
+    def effective_weight(self) -> float:
+        """Configured weight scaled down by observed latency."""
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        return self.config.weight / max(latency, MIN_LATENCY)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "host": self.config.host,
+            "port": self.config.port,
+            "weight": self.config.weight,
+            "effective_weight": round(self.effective_weight(), 3),
+            "latency_ms": (
+                round(self.latency * 1000, 1) if self.latency is not None else None
+            ),
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "sent": int(sends_total.value(provider=self.name, outcome="success")),
+            "failed": int(sends_total.value(provider=self.name, outcome="failure")),
+            "pool": self.pool.stats(),
+            "concurrency": self.limiter.stats(),
+        }
+
+
+class ProviderRouter:
+    """
+    Latency-aware weighted routing across SMTP providers with failover.
+
+    The first provider is drawn at random, proportionally to effective weight, among
+    providers whose circuit is not open; the others follow by effective weight and are
+    tried in turn when a provider fails to connect, authenticate or answer.
+    """
+
+    def __init__(
+        self, providers: List[SMTPProvider], rng: Optional[random.Random] = None
+    ):
+        if not providers:
+            raise ValueError("At least one SMTP provider is required")
+        self.providers = providers
+        self._rng = rng or random.Random()
+
+    @classmethod
+    def from_configs(cls, configs: List[SMTPProviderConfig]) -> "ProviderRouter":
+        return cls([
+            SMTPProvider(
+                config,
+                CircuitBreaker(
+                    settings.smtp_circuit_failure_threshold,
+                    settings.smtp_circuit_reset_timeout,
+                ),
+            )
+            for config in configs
+        ])
+
+    def candidates(self) -> List[SMTPProvider]:
+        """Providers to try for the next message, in order."""
+        available = [p for p in self.providers if p.breaker.allow()]
+        if len(available) <= 1:
+            return available
+        weights = [p.effective_weight() for p in available]
+        if sum(weights) > 0:
+            first = self._rng.choices(available, weights=weights)[0]
+        else:
+            first = available[0]
+        rest = sorted(
+            (p for p in available if p is not first),
+            key=lambda p: -p.effective_weight(),
+        )
+        return [first] + rest
+
+    async def send(
+        self, sender: str, recipients: List[str], message: OutgoingMessage
+    ) -> Dict[str, aiosmtplib.SMTPResponse]:
+        """Deliver via the first provider that accepts; returns refused recipients."""
+        candidates = self.candidates()
+        if not candidates:
+            raise SMTPProvidersUnavailable(
+                "No SMTP provider available (all circuits open)"
+            )
+        errors = []
+        for attempt, provider in enumerate(candidates):
+            try:
+                refused = await provider.send(sender, recipients, message)
+            except Exception as e:
+                if not is_provider_failure(e):
+                    raise
+                logger.warning(f"SMTP provider {provider.name} failed: {str(e)}")
+                errors.append(f"{provider.name}: {str(e)}")
+                continue
+            if attempt:
+                failovers_total.inc(provider=provider.name)
+            return refused
+        raise SMTPProvidersUnavailable(
+            "All SMTP providers failed: " + "; ".join(errors)
+        )
+
+    async def check(self) -> None:
+        """Pass if any provider answers NOOP; raise with every error otherwise."""
+        errors = []
+        for provider in self.candidates() or self.providers:
+            try:
+                await provider.check()
+                return
+            except Exception as e:
+                errors.append(f"{provider.name}: {str(e) or type(e).__name__}")
+        raise SMTPProvidersUnavailable("; ".join(errors))
+
+    async def prewarm(self, sessions: int) -> None:
+        """Open up to `sessions` pooled sessions per provider, concurrently."""
+        results = await asyncio.gather(
+            *(provider.pool.prewarm(sessions) for provider in self.providers),
+            return_exceptions=True,
+        )
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    f"Could not pre-warm SMTP provider {provider.name}: {str(result)}"
+                )
+
+    async def close(self) -> None:
+        for provider in self.providers:
+            await provider.pool.close()
+
+    def stats(self) -> List[dict]:
+        return [provider.stats() for provider in self.providers]
+
+    def collect(self) -> Iterable[Sample]:
+        """Metrics collector: per-provider latency, circuit state and pool usage."""
+        circuit_values = {"closed": 0, "half_open": 1, "open": 2}
+        for p in self.providers:
+            labels = {"provider": p.name}
+            if p.latency is not None:
+                yield "smtp_provider_latency_seconds", labels, p.latency
+            yield "smtp_provider_circuit_state", labels, circuit_values[p.breaker.state]
+            pool = p.pool.stats()
+            yield "smtp_pool_sessions", {**labels, "state": "idle"}, pool["idle"]
+            yield "smtp_pool_sessions", {**labels, "state": "in_use"}, pool["in_use"]
+
+
+def default_provider_configs() -> List[SMTPProviderConfig]:
+    """SMTP_PROVIDERS if set, otherwise the single relay from SMTP_HOST/SMTP_PORT/..."""
+    if settings.smtp_providers:
+        return list(settings.smtp_providers)
+    return [
+        SMTPProviderConfig(
+            name=settings.smtp_host,
+            host=settings.smtp_host,
+            port=settings.smtp_port,
+            user=settings.smtp_user,
+            password=settings.smtp_pass,
+            validate_certs=settings.smtp_validate_certs,
+        )
+    ]
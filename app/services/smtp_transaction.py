@@ -0,0 +1,267 @@
+"""
+One mail transaction over an open aiosmtplib session, using ESMTP extensions.
+
+- PIPELINING (RFC 2920): MAIL, every RCPT and DATA/BDAT go out in one write and
+  the replies are read afterwards, so a message costs one or two round trips
+  instead of one per command.
+- CHUNKING (RFC 3030): the body is sent with BDAT in fixed-size chunks, without
+  dot-stuffing or a terminating line.
+
+aiosmtplib reads replies one command at a time and drops replies that arrive
+while no command is waiting, so during the transaction the transport's protocol
+is swapped for a small reply reader and restored afterwards. Without either
+extension the session's own sendmail() is used.
+"""
+import asyncio
+import re
+from typing import Dict, List, NoReturn, Optional
+
+import aiosmtplib
+from aiosmtplib import SMTPResponse
+from aiosmtplib.email import quote_address
+
+BDAT_CHUNK_SIZE = 1024 * 1024
+LINE_ENDINGS_RE = re.compile(rb"(?:\r\n|\n|\r(?!\n))")
+PERIOD_RE = re.compile(rb"(?m)^\.")
+
+
+class _ReplyReader(asyncio.Protocol):
+    """Transport protocol that buffers every SMTP reply until it is read."""
+
+    def __init__(self, original: asyncio.BaseProtocol):
+        self._original = original
+        self._buffer = bytearray()
+        self._event = asyncio.Event()
+        self._lost: Optional[BaseException] = None
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        self._event.set()
+
+    def eof_received(self) -> Optional[bool]:
+        return self._original.eof_received()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._lost = exc or aiosmtplib.SMTPServerDisconnected("Connection lost")
+        self._event.set()
+        self._original.connection_lost(exc)
+
+    def _parse(self) -> Optional[SMTPResponse]:
+        lines, offset = [], 0
+        while True:
+            end = self._buffer.find(b"\n", offset)
+            if end == -1:
+                return None
+            line = bytes(self._buffer[offset:end + 1])
+            offset = end + 1
+            try:
+                code = int(line[:3])
+            except ValueError:
+                raise aiosmtplib.SMTPResponseException(
+                    -1, f"Malformed SMTP response line: {line!r}"
+                ) from None
+            lines.append(line[4:].strip(b" \t\r\n"))
+            if line[3:4] != b"-":
+                del self._buffer[:offset]
+                text = b"\n".join(lines).decode("utf-8", "surrogateescape")
+                return SMTPResponse(code, text)
+
+    async def read(self, timeout: Optional[float]) -> SMTPResponse:
+        while True:
+            response = self._parse()
+            if response is not None:
+                return response
+            if self._lost is not None:
+                raise aiosmtplib.SMTPServerDisconnected(str(self._lost))
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise aiosmtplib.SMTPReadTimeoutError(
+                    "Timed out waiting for server response"
+                )
+
+
+def _command(*parts: bytes) -> bytes:
+    return b" ".join(parts) + b"\r\n"
+
+
+async def send_transaction(
+    smtp: aiosmtplib.SMTP,
+    sender: str,
+    recipients: List[str],
+    message: bytes,
+    mail_options: Optional[List[str]] = None,
+) -> Dict[str, SMTPResponse]:
+    """
+    Send one message, pipelined and/or chunked when the server advertises it.
+
+    Returns:
+        Recipients the server refused while accepting the message for the others
+
+    Raises:
+        SMTPSenderRefused, SMTPRecipientsRefused, SMTPDataError as aiosmtplib's
+        sendmail does
+    """
+    mail_options = list(mail_options or [])
+    if smtp.is_ehlo_or_helo_needed:
+        await smtp.ehlo()
+    pipelining = smtp.supports_extension("pipelining")
+    chunking = smtp.supports_extension("chunking")
+    if not pipelining and not chunking:
+        refused, _ = await smtp.sendmail(
+            sender, recipients, message, mail_options=mail_options
+        )
+        return refused
+
+    encoding = "ascii"
+    if any(option.lower() == "smtputf8" for option in mail_options):
+        if not smtp.supports_extension("smtputf8"):
+            raise aiosmtplib.SMTPNotSupported(
+                "SMTPUTF8 is not supported by this server"
+            )
+        encoding = "utf-8"
+    if smtp.supports_extension("size"):
+        mail_options.insert(0, f"SIZE={len(message)}")
+
+    envelope = [_command(
+        b"MAIL", b"FROM:" + quote_address(sender).encode(encoding),
+        *(option.encode("ascii") for option in mail_options)
+    )]
+    envelope += [
+        _command(b"RCPT", b"TO:" + quote_address(r).encode(encoding))
+        for r in recipients
+    ]
+    if chunking:
+        chunks = [
+            message[i:i + BDAT_CHUNK_SIZE]
+            for i in range(0, len(message), BDAT_CHUNK_SIZE)
+        ] or [b""]
+        body = [
+            _command(
+                b"BDAT",
+                str(len(chunk)).encode(),
+                *([b"LAST"] if i == len(chunks) - 1 else []),
+            )
+            + chunk
+            for i, chunk in enumerate(chunks)
+        ]
+    else:
+        body = [b"DATA\r\n"]
+
+    transport = smtp.protocol.transport
+    original = transport.get_protocol()
+    reader = _ReplyReader(original)
+    transport.set_protocol(reader)
+    try:
+        return await _exchange(
+            smtp, reader, sender, recipients, envelope, body, message, pipelining
+        )
+    finally:
+        if not transport.is_closing():
+            transport.set_protocol(original)
+
+
+async def _exchange(
+    smtp: aiosmtplib.SMTP,
+    reader: _ReplyReader,
+    sender: str,
+    recipients: List[str],
+    envelope: List[bytes],
+    body: List[bytes],
+    message: bytes,
+    pipelining: bool,
+) -> Dict[str, SMTPResponse]:
+    replies = await _send_commands(smtp, reader, envelope, body, pipelining)
+    mail_reply = replies[0]
+    if mail_reply.code != 250:
+        await _reset_and_raise(
+            smtp,
+            reader,
+            aiosmtplib.SMTPSenderRefused(mail_reply.code, mail_reply.message, sender),
+        )
+    refused = {
+        recipient: reply
+        for recipient, reply in zip(recipients, replies[1:len(envelope)])
+        if reply.code not in (250, 251)
+    }
+    if len(refused) == len(recipients):
+        await _reset_and_raise(smtp, reader, aiosmtplib.SMTPRecipientsRefused([
+            aiosmtplib.SMTPRecipientRefused(reply.code, reply.message, recipient)
+            for recipient, reply in refused.items()
+        ]))
+    await _send_body(smtp, reader, body, replies[len(envelope):], message)
+    return refused
+
+
+async def _send_commands(
+    smtp: aiosmtplib.SMTP,
+    reader: _ReplyReader,
+    envelope: List[bytes],
+    body: List[bytes],
+    pipelining: bool,
+) -> List[SMTPResponse]:
+    """
+    Write the envelope and body commands and read their replies: in one write
+    when pipelining, else one at a time, stopping once the server refuses.
+    """
+    transport = smtp.protocol.transport
+    replies: List[SMTPResponse] = []
+    if pipelining:
+        commands = envelope + body
+        transport.write(b"".join(commands))
+        for _ in commands:
+            replies.append(await reader.read(smtp.timeout))
+        return replies
+
+    for command in envelope:
+        transport.write(command)
+        replies.append(await reader.read(smtp.timeout))
+        if replies[0].code != 250:
+            return replies  # Sender refused: no RCPT is sent
+    if any(r.code in (250, 251) for r in replies[1:]):
+        for command in body:
+            transport.write(command)
+            replies.append(await reader.read(smtp.timeout))
+            if replies[-1].code != 250:
+                break
+    return replies
+
+
+async def _send_body(
+    smtp: aiosmtplib.SMTP,
+    reader: _ReplyReader,
+    body: List[bytes],
+    body_replies: List[SMTPResponse],
+    message: bytes,
+) -> None:
+    """After DATA's 354, send the dot-stuffed message; then check the body replies."""
+    if body == [b"DATA\r\n"]:
+        if body_replies[0].code != 354:
+            await _reset_and_raise(
+                smtp,
+                reader,
+                aiosmtplib.SMTPDataError(body_replies[0].code, body_replies[0].message),
+            )
+        data = PERIOD_RE.sub(b"..", LINE_ENDINGS_RE.sub(b"\r\n", message))
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        smtp.protocol.transport.write(data + b".\r\n")
+        body_replies = [await reader.read(smtp.timeout)]
+    for reply in body_replies:
+        if reply.code != 250:
+            await _reset_and_raise(
+                smtp, reader, aiosmtplib.SMTPDataError(reply.code, reply.message)
+            )
+
+
+async def _reset_and_raise(
+    smtp: aiosmtplib.SMTP, reader: _ReplyReader, exc: aiosmtplib.SMTPException
+) -> NoReturn:
+    """RSET so the pooled session can be reused, then raise `exc`."""
+    try:
+        smtp.protocol.transport.write(b"RSET\r\n")
+        await reader.read(smtp.timeout)
+    except (aiosmtplib.SMTPException, OSError):
+        pass
+    raise exc
@@ -0,0 +1,147 @@
+"""
+Long-lived submission channel: many sends over one authenticated WebSocket.
+
+Frames are JSON objects (text frames, or binary MessagePack frames when the
+connection negotiated the "msgpack" subprotocol):
+
+    server  {"type": "ready", "credits": N}
+    client  {"type": "send", "id": "<correlation id>",
+             "channel": "email" | "whatsapp" | "notify",
+             "request": {...same body as the HTTP endpoint...}}
+    server  {"type": "ack", "id": ...}                      accepted; delivery started
+            {"type": "nack", "id": ..., "error": "..."}      rejected; no credit used
+            {"type": "result", "id": ..., "response": {...}, "credits": 1}
+
+Flow control is credit based: an accepted send holds one credit until its
+result is sent, which hands the credit back. A send arriving without credit is
+refused, so one producer cannot have more than N sends in the delivery queues.
+A client that keeps sending after `max_refusals` refusals in a row (ignoring
+its credits, or sending garbage) is disconnected with 1008, which also bounds
+the nacks waiting in the outgoing queue.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.lifecycle import delivery_tracker
+from app.metrics import metrics
+from app.schemas.email_schema import EmailRequest
+from app.schemas.notification_schema import NotificationRequest
+from app.schemas.whatsapp_schema import WhatsAppRequest
+from app.services.bulk_validation import format_validation_error
+from app.services.email_service import email_service
+from app.services.notification_service import notification_service
+from app.services.whatsapp_service import whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+commands_total = metrics.counter(
+    "stream_commands_total",
+    "Send commands received over the WebSocket channel, by channel and outcome",
+)
+
+# Deliveries of every session; they finish even if their connection closes
+_running: Set[asyncio.Task] = set()
+
+
+async def _send_email(request: EmailRequest) -> BaseModel:
+    return await email_service.send_email(request)
+
+
+async def _send_whatsapp(request: WhatsAppRequest) -> BaseModel:
+    return await whatsapp_service.send_whatsapp(request)
+
+
+async def _notify(request: NotificationRequest) -> BaseModel:
+    return await notification_service.notify(request)
+
+
+CHANNELS: Dict[str, Tuple[Type[BaseModel], Callable[[Any], Awaitable[BaseModel]]]] = {
+    "email": (EmailRequest, _send_email),
+    "whatsapp": (WhatsAppRequest, _send_whatsapp),
+    "notify": (NotificationRequest, _notify),
+}
+
+
+class SubmissionSession:
+    """Protocol state of one connection: credits, validation and outgoing frames."""
+
+    def __init__(self, credits: int, max_refusals: int = 100):
+        self.credits = max(1, credits)
+        self.max_refusals = max_refusals
+        self.refused_in_a_row = 0
+        self.outgoing: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def misbehaving(self) -> bool:
+        """The last max_refusals frames were all refused; the connection should end."""
+        return self.max_refusals > 0 and self.refused_in_a_row >= self.max_refusals
+
+    def ready(self) -> Dict[str, Any]:
+        return {"type": "ready", "credits": self.credits}
+
+    def _nack(self, correlation_id: Any, error: str, channel: str = "unknown") -> None:
+        commands_total.inc(channel=channel, outcome="rejected")
+        self.refused_in_a_row += 1
+        self.outgoing.put_nowait({"type": "nack", "id": correlation_id, "error": error})
+
+    def handle(self, frame: Any) -> None:
+        """Validate one client frame; start the delivery or answer with a nack."""
+        if not isinstance(frame, dict):
+            return self._nack(None, "Frame must be an object")
+        correlation_id = frame.get("id")
+        if frame.get("type") != "send":
+            return self._nack(
+                correlation_id, f"Unknown frame type: {frame.get('type')!r}"
+            )
+        channel = frame.get("channel")
+        if channel not in CHANNELS:
+            return self._nack(correlation_id, f"Unknown channel: {channel!r}")
+        if delivery_tracker.draining:
+            return self._nack(
+                correlation_id, "Service is shutting down; retry the request", channel
+            )
+        if self.credits <= 0:
+            return self._nack(
+                correlation_id,
+                "No credit: wait for a result before sending more",
+                channel,
+            )
+        schema, send = CHANNELS[channel]
+        try:
+            request = schema.model_validate(frame.get("request"))
+        except ValidationError as e:
+            return self._nack(correlation_id, format_validation_error(e), channel)
+
+        self.credits -= 1
+        self.refused_in_a_row = 0
+        commands_total.inc(channel=channel, outcome="accepted")
+        self.outgoing.put_nowait({"type": "ack", "id": correlation_id})
+        task = asyncio.create_task(
+            self._deliver(correlation_id, channel, send, request)
+        )
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+
+    async def _deliver(
+        self,
+        correlation_id: Any,
+        channel: str,
+        send: Callable[[Any], Awaitable[BaseModel]],
+        request: BaseModel,
+    ) -> None:
+        try:
+            response: Any = await send(request)
+        except Exception as e:
+            logger.error(f"Stream {channel} send {correlation_id!r} failed: {str(e)}")
+            response = {
+                "success": False,
+                "message": "Internal server error",
+                "error_details": str(e),
+            }
+        self.credits += 1
+        self.outgoing.put_nowait(
+            {"type": "result", "id": correlation_id, "response": response, "credits": 1}
+        )
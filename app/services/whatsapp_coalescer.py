@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.config import settings
+from app.lifecycle import delivery_tracker
+from app.metrics import metrics
+from app.schemas.whatsapp_schema import WhatsAppRequest, WhatsAppResponse
+
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[WhatsAppRequest], Awaitable[WhatsAppResponse]]
+
+# Template text parameters may not contain newlines, tabs or runs of more than
+# four spaces (Graph API error 132018), so merged messages stay on one line
+SEPARATOR = " | "
+
+coalesced_total = metrics.counter(
+    "whatsapp_coalesced_total",
+    "WhatsApp requests merged into another request's message",
+)
+
+
+def _single_line(text: str) -> str:
+    return " ".join(text.split())
+
+
+class _Batch:
+    """Messages waiting for one phone; every submitter awaits the same future."""
+
+    def __init__(self, telefono: str, first: str):
+        self.telefono = telefono
+        self.messages: List[str] = [first]
+        self.chars = len(first)
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.timer: Optional[asyncio.Task] = None
+        self.flushed = False
+
+
+class WhatsAppCoalescer:
+    """
+    Merges notifications to the same phone sent within `window` seconds into one
+    template send.
+
+    A batch is sent when its window ends, when it reaches `max_messages`, or earlier
+    when the total of buffered messages hits `max_pending` (oldest batches first),
+    which keeps the buffer bounded under bursts. A message that would push the
+    merged text past `max_chars` starts a new batch. Every merged request gets
+    the response of the shared send, including its message_id.
+    """
+
+    def __init__(
+        self,
+        send: Sender,
+        window: float,
+        max_messages: int = 5,
+        max_chars: int = 1000,
+        max_pending: int = 1000,
+    ):
+        self.send = send
+        self.window = window
+        self.max_messages = max(1, max_messages)
+        self.max_chars = max_chars
+        self.max_pending = max(1, max_pending)
+        self._batches: Dict[str, _Batch] = {}  # Insertion order = oldest first
+        self._pending = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def submit(self, request: WhatsAppRequest) -> WhatsAppResponse:
+        if delivery_tracker.draining:
+            return await self.send(request)
+
+        mensaje = _single_line(request.mensaje)
+        batch = self._batches.get(request.telefono)
+        loop = asyncio.get_running_loop()
+        if batch is not None and batch.future.get_loop() is not loop:
+            # Left over from an event loop that is gone; nobody can await it any more
+            self._detach(batch)
+            batch = None
+        if (
+            batch is not None
+            and batch.chars + len(SEPARATOR) + len(mensaje) > self.max_chars
+        ):
+            self._start_flush(batch)
+            batch = None
+
+        if batch is None:
+            batch = _Batch(request.telefono, mensaje)
+            self._batches[request.telefono] = batch
+            batch.timer = self._spawn(self._flush_after_window(batch))
+        else:
+            batch.messages.append(mensaje)
+            batch.chars += len(SEPARATOR) + len(mensaje)
+            coalesced_total.inc()
+        self._pending += 1
+
+        if len(batch.messages) >= self.max_messages:
+            self._start_flush(batch)
+        while self._pending > self.max_pending and self._batches:
+            self._start_flush(next(iter(self._batches.values())))
+
+        return await asyncio.shield(batch.future)
+
+    def _spawn(self, coro: Awaitable[None]) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _detach(self, batch: _Batch) -> bool:
+        """Take the batch out of the buffer; False if it was already flushed."""
+        if batch.flushed:
+            return False
+        batch.flushed = True
+        self._pending -= len(batch.messages)
+        if batch.timer is not None and batch.timer is not asyncio.current_task():
+            batch.timer.cancel()
+        if self._batches.get(batch.telefono) is batch:
+            del self._batches[batch.telefono]
+        return True
+
+    def _start_flush(self, batch: _Batch) -> None:
+        if self._detach(batch):
+            self._spawn(self._send(batch))
+
+    async def _flush_after_window(self, batch: _Batch) -> None:
+        await asyncio.sleep(self.window)
+        if self._detach(batch):
+            await self._send(batch)
+
+    async def _send(self, batch: _Batch) -> None:
+        merged = WhatsAppRequest(
+            telefono=batch.telefono, mensaje=SEPARATOR.join(batch.messages)
+        )
+        if len(batch.messages) > 1:
+            logger.info(
+                f"Sending {len(batch.messages)} coalesced messages to {batch.telefono}"
+            )
+        try:
+            batch.future.set_result(await self.send(merged))
+        except Exception as e:
+            batch.future.set_exception(e)
+            batch.future.exception()  # Mark retrieved in case every submitter went away
+
+    async def flush_all(self) -> None:
+        """Send every buffered batch now and wait for the sends (used on shutdown)."""
+        loop = asyncio.get_running_loop()
+        for batch in list(self._batches.values()):
+            if batch.future.get_loop() is loop:
+                self._start_flush(batch)
+        tasks = [t for t in self._tasks if t.get_loop() is loop]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def build_whatsapp_coalescer(send: Sender) -> Optional[WhatsAppCoalescer]:
+    """Coalescer configured from settings; None when WHATSAPP_COALESCE_WINDOW is 0."""
+    if settings.whatsapp_coalesce_window <= 0:
+        return None
+    return WhatsAppCoalescer(
+        send,
+        window=settings.whatsapp_coalesce_window,
+        max_messages=settings.whatsapp_coalesce_max_messages,
+        max_chars=settings.whatsapp_coalesce_max_chars,
+        max_pending=settings.whatsapp_coalesce_max_pending,
+    )
@@ -0,0 +1,101 @@
+"""
+Cache of WhatsApp media ids for template header media.
+
+Instead of a "link" that Meta fetches from our host for every message, the
+header image is uploaded once to the Graph API media endpoint and messages
+reference the returned id. Ids are valid for 30 days; the cache re-uploads in
+the background once an id is older than `ttl` and keeps using the old one
+until the new id arrives. Lookups never wait for an upload: until the first
+one succeeds (or after it fails) callers fall back to the link.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MEDIA_ID_LIFETIME = 30 * 24 * 3600.0  # Graph API keeps uploaded media for 30 days
+RETRY_AFTER = 300.0  # Seconds before a failed upload is tried again
+
+uploads_total = metrics.counter(
+    "whatsapp_media_uploads_total", "Header media uploads to the Graph API, by outcome"
+)
+
+
+@dataclass
+class CachedMedia:
+    media_id: str
+    uploaded_at: float  # Unix time
+
+    @property
+    def expires_at(self) -> float:
+        return self.uploaded_at + MEDIA_ID_LIFETIME
+
+
+class WhatsAppMediaCache:
+    """Media ids by source URL, uploaded once and refreshed before they lapse."""
+
+    def __init__(
+        self,
+        upload: Callable[[str], Awaitable[str]],
+        ttl: float = 25 * 24 * 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            upload: Coroutine uploading the media at a URL; returns its media id
+            ttl: Age after which an id is refreshed (must be below 30 days)
+        """
+        self._upload = upload
+        self.ttl = min(ttl, MEDIA_ID_LIFETIME)
+        self._clock = clock
+        self._media: Dict[str, CachedMedia] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._uploads: Dict[str, asyncio.Task] = {}
+
+    def media_id(self, url: str) -> Optional[str]:
+        """
+        Cached id for `url`, or None to send the link. Starts a background upload
+        when there is no id yet or the current one is due for refresh.
+        """
+        now = self._clock()
+        cached = self._media.get(url)
+        if cached is None or now - cached.uploaded_at >= self.ttl:
+            self._start_upload(url, now)
+        if cached is not None and now < cached.expires_at:
+            return cached.media_id
+        return None
+
+    def invalidate(self, url: str) -> None:
+        """Forget the id of `url` (rejected by the API); the next lookup re-uploads."""
+        self._media.pop(url, None)
+        self._failed_at.pop(url, None)
+
+    def _start_upload(self, url: str, now: float) -> None:
+        if now - self._failed_at.get(url, -RETRY_AFTER) < RETRY_AFTER:
+            return
+        task = self._uploads.get(url)
+        loop = asyncio.get_running_loop()
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._uploads[url] = asyncio.create_task(self.refresh(url))
+
+    async def refresh(self, url: str) -> Optional[str]:
+        """Upload now; returns the new id, or None if the upload failed (logged)."""
+        try:
+            media_id = await self._upload(url)
+        except Exception as e:
+            self._failed_at[url] = self._clock()
+            uploads_total.inc(outcome="failure")
+            reason = str(e) or type(e).__name__
+            logger.warning(f"Could not upload WhatsApp media {url}: {reason}")
+            return None
+        self._media[url] = CachedMedia(media_id, self._clock())
+        self._failed_at.pop(url, None)
+        uploads_total.inc(outcome="success")
+        logger.info(f"Uploaded WhatsApp media {url} as {media_id}")
+        return media_id
@@ -0,0 +1,355 @@
+import asyncio
+import json
+import logging
+import mimetypes
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.lifecycle import delivery_tracker
+from app.schemas.dead_letter_schema import FailureClass
+from app.schemas.whatsapp_schema import WhatsAppRequest, WhatsAppResponse
+from app.services.adaptive_limit import AdaptiveLimiter
+from app.services.dead_letters import DeadLetter, dead_letters
+from app.services.dedup import DuplicateFilter, duplicate_filter
+from app.services.outbound import OutboundHTTPTransport
+from app.services.scheduler import ScheduledJob, scheduler
+from app.services.whatsapp_coalescer import build_whatsapp_coalescer
+from app.services.whatsapp_media import WhatsAppMediaCache
+
+logger = logging.getLogger(__name__)
+
+# Use v22.0 as per the working documentation
+GRAPH_API_VERSION = "v22.0"
+GRAPH_API_BASE_URL = f"https://graph.facebook.com/{GRAPH_API_VERSION}"
+TEMPLATE_NAME = "notificar_oferta"
+TEMPLATE_LANGUAGE = "es_CO"
+HEADER_IMAGE_URL = "https://v0-ofertame-app.vercel.app/logo.png"
+REQUEST_TIMEOUT = 30.0  # Seconds for one Graph API call
+KEEPALIVE_EXPIRY = 60.0  # Seconds before an idle keep-alive connection is closed
+
+
+def _classify_status(status: int) -> FailureClass:
+    """Dead-letter class of a Graph API error status."""
+    if status == 429:
+        return FailureClass.TEMPORARY
+    if status >= 500:
+        return FailureClass.PROVIDER_UNAVAILABLE
+    return FailureClass.REJECTED
+
+
+class WhatsAppService:
+    """Service for sending WhatsApp template messages through the Graph API."""
+
+    def __init__(self, duplicates: Optional[DuplicateFilter] = None) -> None:
+        # Optional: merges notifications to the same phone (WHATSAPP_COALESCE_WINDOW)
+        self.coalescer = build_whatsapp_coalescer(self._deliver)
+        # Optional: skips repeats of recently delivered messages (DEDUP_WINDOW)
+        self.duplicates = duplicates or duplicate_filter
+        # Optional: header image uploaded once and referenced by media id
+        self.media = (
+            WhatsAppMediaCache(self.upload_media, ttl=settings.whatsapp_media_ttl)
+            if settings.whatsapp_media_cache else None
+        )
+        # Graph API calls in flight, adapted to its latency and throttling
+        # (ADAPTIVE_CONCURRENCY)
+        self.limiter = AdaptiveLimiter.from_settings(
+            "whatsapp", settings.whatsapp_max_connections,
+            is_congestion=lambda e: isinstance(e, httpx.TransportError),
+        )
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        """Keep-alive Graph API client of the running loop (one per event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                base_url=GRAPH_API_BASE_URL,
+                transport=OutboundHTTPTransport(httpx.Limits(
+                    max_connections=self.limiter.max_limit,
+                    max_keepalive_connections=settings.whatsapp_max_connections,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                )),
+                timeout=REQUEST_TIMEOUT,
+            )
+            self._http_loop = loop
+        return self._http
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {settings.whatsapp_token}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(
+        self, request: WhatsAppRequest, header_media_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the notificar_oferta template payload for one recipient.
+
+        The header image is referenced by its uploaded media id when given,
+        otherwise by HEADER_IMAGE_URL (fetched by Meta for every message).
+        """
+        if header_media_id:
+            header_image = {"id": header_media_id}
+        else:
+            header_image = {"link": HEADER_IMAGE_URL}
+        return {
+            "messaging_product": "whatsapp",
+            "to": request.telefono,
+            "type": "template",
+            "template": {
+                "name": TEMPLATE_NAME,
+                "language": {"code": TEMPLATE_LANGUAGE},
+                "components": [
+                    {
+                        "type": "header",
+                        "parameters": [
+                            {
+                                "type": "image",
+                                "image": header_image
+                            }
+                        ]
+                    },
+                    {
+                        "type": "body",
+                        "parameters": [
+                            {
+                                "type": "text",
+                                "text": request.mensaje
+                            }
+                        ]
+                    }
+                ]
+            }
+        }
+
+    async def send_whatsapp(self, request: WhatsAppRequest) -> WhatsAppResponse:
+        """
+        Send the notificar_oferta template to one phone number.
+
+        Future send_at values are handed to the scheduler; with coalescing enabled the
+        message may be merged with others to the same phone (shared response). With
+        DEDUP_WINDOW set, a repeat of a recently delivered message is skipped.
+        Provider and configuration errors are returned as unsuccessful responses;
+        unexpected errors are raised.
+        """
+        # Verificar si WhatsApp está activado
+        if not settings.activar_whatsapp:
+            return WhatsAppResponse(
+                success=False,
+                message="La funcionalidad de whatsapp esta desactivada"
+            )
+        if not settings.whatsapp_token or not settings.whatsapp_url:
+            return WhatsAppResponse(
+                success=False,
+                message=(
+                    "WhatsApp no está configurado "
+                    "(faltan WHATSAPP_TOKEN o WHATSAPP_URL)"
+                )
+            )
+
+        if scheduler.is_deferred(request.send_at):
+            scheduled_at = await scheduler.schedule(
+                "whatsapp",
+                request.model_dump_json(exclude={"send_at"}),
+                request.send_at,
+            )
+            logger.info(
+                f"WhatsApp message to {request.telefono} scheduled for "
+                f"{scheduled_at.isoformat()}"
+            )
+            return WhatsAppResponse(
+                success=True,
+                message="WhatsApp message scheduled",
+                scheduled_at=scheduled_at
+            )
+
+        if self.duplicates is None:
+            return await self._send_now(request)
+        keys = self.duplicates.keys("whatsapp", [request.telefono], request.mensaje)
+        if not self.duplicates.claim(keys, "whatsapp"):
+            logger.info(
+                f"WhatsApp message to {request.telefono} not sent, "
+                "duplicate of a recent send"
+            )
+            return WhatsAppResponse(
+                success=True,
+                message="Duplicate suppressed",
+                duplicate=True
+            )
+        delivered = False
+        try:
+            response = await self._send_now(request)
+            delivered = response.success
+            return response
+        finally:
+            self.duplicates.release(keys, delivered)
+
+    async def _send_now(self, request: WhatsAppRequest) -> WhatsAppResponse:
+        if self.coalescer is not None:
+            return await self.coalescer.submit(request)
+        return await self._deliver(request)
+
+    async def _deliver(
+        self, request: WhatsAppRequest, letter_id: Optional[str] = None
+    ) -> WhatsAppResponse:
+        """
+        POST one template message to the Graph API.
+
+        Failures are stored in the dead-letter queue (under letter_id when replaying
+        one).
+        """
+        media_id = None
+        if self.media is not None:
+            media_id = self.media.media_id(HEADER_IMAGE_URL)
+        payload = self.build_payload(request, media_id)
+
+        logger.info(f"Sending WhatsApp message to {request.telefono}")
+        logger.info(f"Message: {request.mensaje}")
+        logger.info(f"Payload: {json.dumps(payload, indent=2)}")
+
+        try:
+            with delivery_tracker.track():
+                async with self.limiter.acquire() as call:
+                    response = await self._client().post(
+                        f"/{settings.whatsapp_url}/messages",
+                        json=payload,
+                        headers=self._headers(),
+                    )
+                    if response.status_code == 429 or response.status_code >= 500:
+                        call.drop()
+        except httpx.TransportError as e:
+            await self._dead_letter(
+                request, FailureClass.PROVIDER_UNAVAILABLE, str(e), letter_id
+            )
+            raise
+        status = response.status_code
+        if status >= 400:
+            logger.error(f"WhatsApp API HTTP error: {status} - {response.text}")
+            if media_id is not None and status == 400:
+                # A lapsed or deleted media id: upload again, fall back to the link
+                # meanwhile
+                self.media.invalidate(HEADER_IMAGE_URL)
+            error_details = f"HTTP {status}: {response.text}"
+            await self._dead_letter(
+                request, _classify_status(status), error_details, letter_id
+            )
+            return WhatsAppResponse(
+                success=False,
+                message="WhatsApp API error",
+                error_details=error_details
+            )
+        response_data = response.json()
+
+        logger.info(f"WhatsApp API response: {json.dumps(response_data, indent=2)}")
+
+        if status == 200:
+            return WhatsAppResponse(
+                success=True,
+                message="WhatsApp message sent successfully",
+                message_id=response_data.get("messages", [{}])[0].get("id")
+            )
+        logger.error(f"WhatsApp API error: {status} - {response_data}")
+        await self._dead_letter(
+            request, FailureClass.ERROR, str(response_data), letter_id
+        )
+        return WhatsAppResponse(
+            success=False,
+            message="Failed to send WhatsApp message",
+            error_details=str(response_data)
+        )
+
+    async def _dead_letter(
+        self,
+        request: WhatsAppRequest,
+        error_class: FailureClass,
+        error: str,
+        letter_id: Optional[str],
+    ) -> None:
+        if settings.dead_letter_enabled:
+            await dead_letters.record(
+                "whatsapp",
+                request.model_dump_json(exclude={"send_at"}),
+                error_class,
+                error,
+                letter_id=letter_id,
+            )
+
+    async def upload_media(self, url: str) -> str:
+        """
+        Upload media to the Graph API media endpoint and return its id.
+
+        The content is read from WHATSAPP_HEADER_IMAGE_PATH when set, otherwise
+        downloaded from `url`.
+        """
+        client = self._client()
+        if settings.whatsapp_header_image_path:
+            path = settings.whatsapp_header_image_path
+            content = await asyncio.to_thread(Path(path).read_bytes)
+            content_type = mimetypes.guess_type(path)[0] or "image/png"
+        else:
+            source = await client.get(url)
+            source.raise_for_status()
+            content = source.content
+            content_type = source.headers.get("content-type", "image/png").split(";")[0]
+        response = await client.post(
+            f"/{settings.whatsapp_url}/media",
+            data={"messaging_product": "whatsapp", "type": content_type},
+            files={"file": (url.rsplit("/", 1)[-1] or "header", content, content_type)},
+            headers={"Authorization": f"Bearer {settings.whatsapp_token}"},
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def check_connection(self, timeout: float = 5.0) -> None:
+        """Readiness check: lightweight Graph API read of the sender phone number."""
+        response = await self._client().get(
+            f"/{settings.whatsapp_url}", params={"fields": "id"},
+            headers=self._headers(), timeout=timeout,
+        )
+        response.raise_for_status()
+
+    async def prewarm(self, timeout: float = 5.0) -> None:
+        """Open a Graph API connection and upload the header media before sending."""
+        if (
+            settings.activar_whatsapp
+            and settings.whatsapp_token
+            and settings.whatsapp_url
+        ):
+            await self.check_connection(timeout)
+            if self.media is not None:
+                await self.media.refresh(HEADER_IMAGE_URL)
+
+    async def close(self) -> None:
+        """Close keep-alive connections (only the running loop's close cleanly)."""
+        if self._http is not None and self._http_loop is asyncio.get_running_loop():
+            await self._http.aclose()
+        self._http = None
+
+
+# Global WhatsApp service instance
+whatsapp_service = WhatsAppService()
+
+
+async def _send_scheduled_whatsapp(job: ScheduledJob) -> WhatsAppResponse:
+    return await whatsapp_service.send_whatsapp(
+        WhatsAppRequest.model_validate_json(job.payload)
+    )
+
+
+scheduler.register("whatsapp", _send_scheduled_whatsapp)
+
+
+async def _replay_whatsapp(letter: DeadLetter) -> bool:
+    # Straight to delivery: a replayed message is not merged with live ones
+    if not settings.activar_whatsapp:
+        return False
+    request = WhatsAppRequest.model_validate_json(letter.payload)
+    return (await whatsapp_service._deliver(request, letter_id=letter.id)).success
+
+
+dead_letters.register("whatsapp", _replay_whatsapp)
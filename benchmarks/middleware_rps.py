@@ -0,0 +1,130 @@
+"""
+Requests per second through the app's middleware stack, in process.
+
+Compares the pure ASGI RequestContextMiddleware with the same concerns
+implemented as an `@app.middleware("http")` function (BaseHTTPMiddleware),
+on /health and on /api/v1/email/send delivering to the in-process fake SMTP
+server used by the tests. Requests go through httpx's ASGI transport, so the
+numbers measure the application, not the network or the HTTP parser:
+
+    python -m benchmarks.middleware_rps --duration 5 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+# Required settings; sends go to the fake SMTP server started below
+for name, value in {
+    "API_MSJ_SECRET": "bench-secret", "EMAIL_FROM": "bench@example.com",
+    "SMTP_HOST": "127.0.0.1", "SMTP_USER": "bench", "SMTP_PASS": "bench",
+    "LOG_LEVEL": "WARNING",  # One INFO line per send would dominate the profile
+}.items():
+    os.environ.setdefault(name, value)
+
+import httpx  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.config import SMTPProviderConfig, settings  # noqa: E402
+from app.logging_config import log_context  # noqa: E402
+from app.main import app  # noqa: E402
+from app.middleware import RequestContextMiddleware  # noqa: E402
+from app.routers import email as email_router  # noqa: E402
+from app.services.email_service import EmailService  # noqa: E402
+from tests.fake_smtp import FakeSMTPServer  # noqa: E402
+
+EMAIL = {"to": ["cliente@example.com"], "subject": "Oferta", "body": "Nueva oferta"}
+
+
+async def process_time_header(request, call_next):
+    """The middleware as it was before: BaseHTTPMiddleware with a wall clock."""
+    start_time = time.time()
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    with log_context(request_id=request_id):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    response.headers["X-Process-Time"] = str(time.time() - start_time)
+    return response
+
+
+def use_middleware(variant: str) -> None:
+    """Rebuild the app's middleware stack with one request-context implementation."""
+    replaced = (RequestContextMiddleware, BaseHTTPMiddleware)
+    stack = [m for m in app.user_middleware if m.cls not in replaced]
+    if variant == "asgi":
+        stack.insert(0, Middleware(RequestContextMiddleware))
+    else:
+        stack.insert(0, Middleware(BaseHTTPMiddleware, dispatch=process_time_header))
+    app.user_middleware = stack
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def measure(path: str, body, duration: float, concurrency: int) -> float:
+    headers = {"X-API-Key": settings.api_msj_secret}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        deadline = time.perf_counter() + duration
+        done = 0
+
+        async def worker() -> None:
+            nonlocal done
+            while time.perf_counter() < deadline:
+                if body is None:
+                    response = await client.get(path, headers=headers)
+                else:
+                    response = await client.post(path, json=body, headers=headers)
+                response.raise_for_status()
+                done += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return done / (time.perf_counter() - start)
+
+
+async def run(duration: float, concurrency: int, smtp: FakeSMTPServer) -> None:
+    email_router.email_service = EmailService(providers=[
+        SMTPProviderConfig(
+            name="bench", host=smtp.host, port=smtp.port, user="u", password="p"
+        )
+    ])
+    endpoints = [("/health", None), ("/api/v1/email/send", EMAIL)]
+    print(f"{'endpoint':<22}{'base-http rps':>16}{'asgi rps':>12}{'gain':>9}")
+    for path, body in endpoints:
+        results = {}
+        for variant in ("base-http", "asgi"):
+            use_middleware(variant)
+            # Warm-up: pools, caches
+            await measure(path, body, min(1.0, duration), concurrency)
+            results[variant] = await measure(path, body, duration, concurrency)
+        gain = results["asgi"] / results["base-http"] - 1
+        print(
+            f"{path:<22}{results['base-http']:>16.0f}{results['asgi']:>12.0f}"
+            f"{gain:>+9.1%}"
+        )
+    await email_router.email_service.close()
+    use_middleware("asgi")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Seconds per measurement"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=32, help="Concurrent clients"
+    )
+    args = parser.parse_args()
+
+    smtp = FakeSMTPServer().start()
+    try:
+        asyncio.run(run(args.duration, args.concurrency, smtp))
+    finally:
+        smtp.stop()
+
+
+if __name__ == "__main__":
+    main()
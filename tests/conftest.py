@@ -3,6 +3,8 @@ Pytest fixtures for api-msj tests.
 Sets API_MSJ_SECRET and other required env vars so the app loads and auth works in tests.
 """
 import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -16,6 +18,10 @@ REQUIRED_ENV = {
     "EMAIL_FROM": "test@test.com",
     "WHATSAPP_TOKEN": "test",
     "WHATSAPP_URL": "test",
+    # Keep scheduled jobs, dead letters and uploaded blobs of test runs out of the shared defaults
+    "SCHEDULER_DB_PATH": os.path.join(tempfile.mkdtemp(prefix="api-msj-tests-"), "scheduled.sqlite3"),
+    "DEAD_LETTER_DB_PATH": os.path.join(tempfile.mkdtemp(prefix="api-msj-tests-"), "dead.sqlite3"),
+    "BLOB_STORE_PATH": os.path.join(tempfile.gettempdir(), "api-msj-tests-blobs"),
 }
 for k, v in REQUIRED_ENV.items():
     os.environ.setdefault(k, v)
@@ -39,3 +45,26 @@ def auth_headers():
 def api_v1():
     """API v1 base path."""
     return "/api/v1"
+
+
+@pytest.fixture
+def fake_smtp():
+    """In-process SMTP server recording received messages."""
+    from tests.fake_smtp import FakeSMTPServer
+
+    server = FakeSMTPServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def smtp_service(fake_smtp):
+    """EmailService pointed at the fake SMTP server."""
+    from app.config import SMTPProviderConfig
+    from app.services.email_service import EmailService
+
+    return EmailService(providers=[
+        SMTPProviderConfig(
+            name="fake", host=fake_smtp.host, port=fake_smtp.port, user="u", password="p"
+        )
+    ])
@@ -0,0 +1,110 @@
+"""
+Minimal in-process stand-in for the WhatsApp Graph API, for tests.
+
+Runs on its own event loop in a background thread and speaks just enough
+HTTP/1.1 (keep-alive, Content-Length or chunked bodies) for httpx: POSTs to
+.../messages get a message id, POSTs to .../media a media id, and any GET
+returns a small PNG (the header image the media cache uploads).
+"""
+import asyncio
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+@dataclass
+class FakeGraphServer:
+    host: str = "127.0.0.1"
+    port: int = 0
+    status: int = 200  # Status of POST replies (e.g. 429 to simulate throttling)
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeGraphServer":
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        async def shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    return b"".join(chunks)
+                chunks.append(chunk[:-2])
+        return await reader.readexactly(int(headers.get("content-length", "0")))
+
+    def _reply(self, method: str, path: str) -> Tuple[int, str, bytes]:
+        if method == "GET":
+            return 200, "image/png", PNG
+        if self.status >= 400:
+            body = {"error": {"message": "Fake Graph API error", "code": self.status}}
+        elif path.endswith("/media"):
+            body = {"id": f"media-{self.requests}"}
+        else:
+            body = {"messaging_product": "whatsapp", "messages": [{"id": f"wamid.{self.requests}"}]}
+        return self.status, "application/json", json.dumps(body).encode()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                await self._read_body(reader, headers)
+                self.requests += 1
+
+                status, content_type, body = self._reply(method, path)
+                writer.write(
+                    f"HTTP/1.1 {status} Fake\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
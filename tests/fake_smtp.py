@@ -0,0 +1,169 @@
+"""
+Minimal in-process SMTP server for tests.
+
+Runs on its own event loop in a background thread, accepts any credentials and
+records every message it receives.
+"""
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class ReceivedMessage:
+    sender: str
+    recipients: List[str]
+    data: bytes
+    mail_options: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FakeSMTPServer:
+    host: str = "127.0.0.1"
+    port: int = 0
+    extensions: List[str] = field(default_factory=lambda: ["AUTH PLAIN LOGIN", "8BITMIME"])
+    messages: List[ReceivedMessage] = field(default_factory=list)
+    connections: int = 0
+    commands: List[str] = field(default_factory=list)
+    rcpt_reply: Optional[str] = None  # Override the reply to RCPT (e.g. "450 4.2.1 Try later")
+    rcpt_replies: Dict[str, str] = field(default_factory=dict)  # Per-address RCPT replies
+    pipelined: List[str] = field(default_factory=list)  # Commands that arrived with more queued behind
+    record: bool = True  # False: keep no messages or commands, only count (soak runs)
+    received: int = 0  # Messages accepted
+
+    def start(self) -> "FakeSMTPServer":
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        async def shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def _accept(self, message: ReceivedMessage) -> None:
+        self.received += 1
+        if self.record:
+            self.messages.append(message)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        session = _Session(reader, writer)
+        session.reply("220 fake.smtp ESMTP ready")
+        handlers = {
+            "EHLO": self._ehlo, "HELO": self._ehlo, "AUTH": self._auth, "MAIL": self._mail,
+            "RCPT": self._rcpt, "BDAT": self._bdat, "DATA": self._data,
+            "RSET": self._ok, "NOOP": self._ok, "QUIT": self._quit,
+        }
+        try:
+            while not session.closed:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                verb = line.split(" ", 1)[0].upper()
+                if self.record:
+                    self.commands.append(verb)
+                    if reader._buffer:
+                        self.pipelined.append(verb)
+                await handlers.get(verb, self._unknown)(session, line)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _ehlo(self, session: "_Session", line: str) -> None:
+        lines = ["fake.smtp"] + self.extensions
+        for i, ext in enumerate(lines):
+            sep = " " if i == len(lines) - 1 else "-"
+            session.reply(f"250{sep}{ext}")
+
+    async def _auth(self, session: "_Session", line: str) -> None:
+        session.reply("235 2.7.0 Authentication successful")
+
+    async def _mail(self, session: "_Session", line: str) -> None:
+        address, _, rest = line[10:].partition(">")
+        session.sender, session.options = address.lstrip("<"), rest.split()
+        session.recipients, session.chunks = [], []
+        session.reply("250 OK")
+
+    async def _rcpt(self, session: "_Session", line: str) -> None:
+        address = line[8:].split(">")[0].lstrip("<")
+        override = self.rcpt_replies.get(address) or self.rcpt_reply
+        if override:
+            session.reply(override)
+            return
+        session.recipients.append(address)
+        session.reply("250 OK")
+
+    async def _bdat(self, session: "_Session", line: str) -> None:
+        size, *last = line.split()[1:]
+        session.chunks.append(await session.reader.readexactly(int(size)))
+        if not session.recipients:
+            session.reply("554 5.5.1 No valid recipients")
+        elif last:
+            self._accept(session.message())
+            session.reply("250 OK queued")
+        else:
+            session.reply(f"250 OK {size} octets received")
+
+    async def _data(self, session: "_Session", line: str) -> None:
+        if not session.recipients:
+            session.reply("554 5.5.1 No valid recipients")
+            return
+        session.reply("354 End data with <CR><LF>.<CR><LF>")
+        session.chunks = []
+        while True:
+            chunk = await session.reader.readline()
+            if chunk in (b".\r\n", b""):
+                break
+            session.chunks.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+        self._accept(session.message())
+        session.reply("250 OK queued")
+
+    async def _ok(self, session: "_Session", line: str) -> None:
+        session.reply("250 OK")
+
+    async def _quit(self, session: "_Session", line: str) -> None:
+        session.reply("221 Bye")
+        session.closed = True
+
+    async def _unknown(self, session: "_Session", line: str) -> None:
+        session.reply("502 Command not implemented")
+
+
+@dataclass
+class _Session:
+    """One client connection and its current mail transaction."""
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    sender: str = ""
+    recipients: List[str] = field(default_factory=list)
+    options: List[str] = field(default_factory=list)
+    chunks: List[bytes] = field(default_factory=list)
+    closed: bool = False
+
+    def reply(self, line: str) -> None:
+        self.writer.write(line.encode() + b"\r\n")
+
+    def message(self) -> ReceivedMessage:
+        return ReceivedMessage(
+            self.sender, self.recipients, b"".join(self.chunks), self.options
+        )
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.metrics import metrics
+from app.services.adaptive_limit import AdaptiveLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _calls(limiter, clock, latencies, concurrency=None, fail=None):
+    """Run calls `concurrency` at a time (default: the current limit), each taking its latency."""
+
+    async def call(latency):
+        async with limiter.acquire():
+            await asyncio.sleep(0)
+            clock.now += latency
+            if fail is not None:
+                raise fail
+
+    async def run():
+        for latency in latencies:
+            width = concurrency or limiter.current
+            await asyncio.gather(*(call(latency) for _ in range(width)), return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def test_grows_while_latency_flat_and_limit_in_use():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("test:grow", initial=4, max_limit=8, clock=clock)
+    _calls(limiter, clock, [0.1] * 40)
+    assert limiter.current == 8
+
+    idle = AdaptiveLimiter("test:idle", initial=4, max_limit=8, clock=clock)
+    _calls(idle, clock, [0.1] * 40, concurrency=1)
+    assert idle.current == 4  # Never more than one call in flight: no reason to grow
+
+
+def test_shrinks_on_latency_rise_once_per_interval():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter("test:slow", initial=10, clock=clock)
+    _calls(limiter, clock, [0.1] * 3, concurrency=1)
+    _calls(limiter, clock, [0.5], concurrency=1)
+    assert limiter.current == 9
+    _calls(limiter, clock, [0.5] * 10, concurrency=1)
+    assert limiter.current < 9
+
+
+@pytest.mark.parametrize("congestion, expected", [(True, 9), (False, 10)])
+def test_only_congestion_errors_shrink(congestion, expected):
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(
+        f"test:error-{congestion}", initial=10, clock=clock, is_congestion=lambda e: congestion
+    )
+    _calls(limiter, clock, [1.0], concurrency=1)  # Baseline: 1 s
+    _calls(limiter, clock, [0.1], concurrency=3, fail=ConnectionError("reset"))
+    assert limiter.current == expected and limiter.in_flight == 0
+
+
+def test_calls_beyond_limit_wait_in_order():
+    limiter = AdaptiveLimiter("test:wait", initial=2, min_limit=2, max_limit=2)
+    order, peak = [], 0
+
+    async def call(i):
+        nonlocal peak
+        async with limiter.acquire():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+            order.append(i)
+
+    async def run():
+        await asyncio.gather(*(call(i) for i in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2 and order == list(range(6))
+    assert "adaptive_concurrency_limit{limiter=\"test:wait\"} 2.0" in metrics.render()
@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import email
+import hashlib
+
+import pytest
+
+from app.config import SMTPProviderConfig
+from app.routers import email as email_router
+from app.schemas.email_schema import AttachmentRef, EmailRequest
+from app.services.blob_store import AttachmentCache, BlobStore, BlobTooLarge
+from app.services.email_service import EmailService
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path), max_bytes=1024 * 1024)
+
+
+def test_put_stream_is_content_addressed(store):
+    data = b"%PDF-1.4 " * 1000
+    info = asyncio.run(store.put_stream(_chunks(data[:100], data[100:])))
+    assert info.sha256 == hashlib.sha256(data).hexdigest()
+    assert info.size == len(data)
+    assert store.info(info.sha256) == info
+    assert base64.b64decode(store.encode_base64(info.sha256)) == data
+
+
+def test_put_stream_rejects_oversized_upload(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=10)
+    with pytest.raises(BlobTooLarge):
+        asyncio.run(store.put_stream(_chunks(b"x" * 6, b"x" * 6)))
+    assert not list((tmp_path / "tmp").iterdir())
+
+
+def test_attachment_encoded_once_across_sends(fake_smtp, store):
+    data = bytes(range(256)) * 500
+    info = asyncio.run(store.put_stream(_chunks(data)))
+    cache = AttachmentCache(store, max_bytes=1024 * 1024)
+    config = SMTPProviderConfig(name="fake", host=fake_smtp.host, port=fake_smtp.port, user="u", password="p")
+    service = EmailService(providers=[config], attachments=cache)
+    request = EmailRequest(
+        to=["a@example.com"],
+        subject="Factura",
+        body="Adjunto",
+        attachments=[AttachmentRef(sha256=info.sha256, filename="factura.pdf", content_type="application/pdf")],
+    )
+
+    async def run():
+        responses = [await service.send_email(request), await service.send_email(request)]
+        await service.close()
+        return responses
+
+    assert all(r.success for r in asyncio.run(run()))
+    assert cache.encodes == 1
+    for received in fake_smtp.messages:
+        part = email.message_from_bytes(received.data).get_payload()[1]
+        assert part.get_filename() == "factura.pdf"
+        assert part.get_content_type() == "application/pdf"
+        assert part.get_payload(decode=True) == data
+
+
+def test_cache_entry_stored_once_across_loops(store):
+    info = asyncio.run(store.put_stream(_chunks(b"x" * 1000)))
+    cache = AttachmentCache(store, max_bytes=1024 * 1024)
+    loop = asyncio.new_event_loop()
+
+    async def first():
+        # Start encoding on one loop, then encode the same blob from another loop
+        task = asyncio.create_task(cache.encoded(info.sha256))
+        await asyncio.sleep(0)
+        other = await asyncio.to_thread(asyncio.run, cache.encoded(info.sha256))
+        return await task, other
+
+    try:
+        encoded, other = loop.run_until_complete(first())
+    finally:
+        loop.close()
+    assert encoded == other
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == len(encoded)
+
+
+def test_send_with_unknown_attachment_rejected(client, auth_headers, api_v1, fake_smtp):
+    missing = "0" * 64
+    request = {
+        "to": ["a@example.com"], "subject": "Factura", "body": "Adjunto",
+        "attachments": [{"sha256": missing, "filename": "factura.pdf"}],
+    }
+    response = client.post(f"{api_v1}/email/send", json=request, headers=auth_headers)
+    assert response.status_code == 422
+    assert missing in response.json()["detail"]
+    assert not fake_smtp.messages
+
+
+def test_upload_and_lookup_endpoints(client, auth_headers, api_v1, store, monkeypatch):
+    monkeypatch.setattr(email_router, "blob_store", store)
+    response = client.post(f"{api_v1}/email/attachments", content=b"hola", headers=auth_headers)
+    assert response.status_code == 201
+    sha256 = response.json()["sha256"]
+    assert sha256 == hashlib.sha256(b"hola").hexdigest()
+
+    assert client.get(f"{api_v1}/email/attachments/{sha256}", headers=auth_headers).json()["size"] == 4
+    assert client.get(f"{api_v1}/email/attachments/{'0' * 64}", headers=auth_headers).status_code == 404
+    assert client.post(f"{api_v1}/email/attachments", content=b"x").status_code == 401
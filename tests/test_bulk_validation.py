@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from app.schemas.email_schema import EmailRequest, EmailResponse
+from app.services import bulk_validation
+from app.services.bulk_validation import validate_bulk
+
+
+def test_valid_items_match_full_validation():
+    """The lightweight path builds the same EmailRequest as full validation."""
+    item = {"to": ["User@Ofertas.COM"], "cc": ["copia@ofertas.com"], "subject": "S", "body": "B", "priority": "high"}
+    [result] = validate_bulk([item])
+    assert result == EmailRequest.model_validate(item)
+    assert result.model_fields_set == EmailRequest.model_validate(item).model_fields_set
+
+
+def test_invalid_items_reported_individually():
+    results = validate_bulk([
+        {"to": ["ok@ofertas.com"], "subject": "S", "body": "B"},
+        {"to": ["not-an-email"], "subject": "S", "body": "B"},
+        {"to": ["ok@ofertas.com"], "body": "B"},
+    ])
+    assert isinstance(results[0], EmailRequest)
+    assert results[1].startswith("to.0:")
+    assert "subject" in results[2]
+
+
+def test_repeated_addresses_validated_once():
+    bulk_validation.normalize_address.cache_clear()
+    items = [{"to": ["dup@ofertas.com"], "bcc": ["dup@ofertas.com"], "subject": "S", "body": "B"}] * 50
+    with patch.object(bulk_validation, "validate_email", wraps=bulk_validation.validate_email) as spy:
+        validate_bulk(items)
+    assert spy.call_count == 1
+
+
+def test_send_bulk_keeps_order_with_invalid_items(client, api_v1, auth_headers):
+    sent = EmailResponse(success=True, message="Email sent successfully", email_id="1")
+
+    async def fake_send_bulk(requests):
+        return [sent for _ in requests]
+
+    with patch("app.routers.email.email_service.send_bulk_emails", side_effect=fake_send_bulk):
+        response = client.post(
+            f"{api_v1}/email/send-bulk",
+            json=[
+                {"to": ["bad"], "subject": "S", "body": "B"},
+                {"to": ["ok@ofertas.com"], "subject": "S", "body": "B"},
+            ],
+            headers=auth_headers,
+        )
+    assert response.status_code == 200
+    assert [r["success"] for r in response.json()] == [False, True]
+    assert response.json()[0]["message"] == "Invalid email request"
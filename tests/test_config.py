@@ -104,3 +104,22 @@ def test_celery_settings_from_env():
         settings = Settings()
         assert settings.celery_broker_url == "redis://localhost:6379/0"
         assert settings.celery_result_backend == "redis://localhost:6379/0"
+
+
+def test_smtp_providers_from_json_env():
+    """SMTP_PROVIDERS accepts a JSON list of relays."""
+    env_vars = {
+        "SMTP_HOST": "s",
+        "SMTP_USER": "u",
+        "SMTP_PASS": "p",
+        "EMAIL_FROM": "e@t.com",
+        "SMTP_PROVIDERS": '[{"name": "brevo", "host": "smtp-relay.brevo.com", "user": "u", '
+        '"password": "p", "weight": 3}, {"name": "ses", "host": "email-smtp.aws.com", '
+        '"port": 465, "user": "u", "password": "p", "tls": "tls"}]',
+    }
+    with patch.dict('os.environ', env_vars, clear=True):
+        settings = Settings()
+        assert [p.name for p in settings.smtp_providers] == ["brevo", "ses"]
+        assert settings.smtp_providers[0].port == 587
+        assert settings.smtp_providers[0].weight == 3
+        assert settings.smtp_providers[1].tls == "tls"
@@ -0,0 +1,145 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from app.config import SMTPProviderConfig
+from app.schemas.dead_letter_schema import (
+    DeadLetterReplayRequest, DeadLetterStatus, FailureClass
+)
+from app.schemas.email_schema import EmailRequest
+from app.services import email_service as email_module
+from app.services.dead_letters import DeadLetterQueue, DeadLetterStore, dead_letters
+from app.services.email_service import EmailService
+
+
+def _config(name, port):
+    return SMTPProviderConfig(name=name, host="127.0.0.1", port=port, user="u", password="p")
+
+
+def _unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    queue = DeadLetterQueue(DeadLetterStore(str(tmp_path / "dead.sqlite3")), batch_size=10, rate=1000)
+    monkeypatch.setattr(email_module, "dead_letters", queue)
+    yield queue
+    queue.store.close()
+
+
+async def _wait_replay(queue, status):
+    while not status.done:
+        await asyncio.sleep(0.01)
+    return status
+
+
+def test_failed_send_recorded_and_replayed_under_same_entry(queue, fake_smtp):
+    down = EmailService(providers=[_config("dl-down", _unused_port())])
+    up = EmailService(providers=[_config("dl-up", fake_smtp.port)])
+    target = {"service": down}
+
+    async def replay(letter):
+        request = EmailRequest.model_validate_json(letter.payload)
+        return (await target["service"].send_email(request, email_id=letter.id)).success
+
+    queue.register("email", replay)
+
+    async def run():
+        response = await down.send_email(EmailRequest(to=["a@example.com"], subject="S", body="Hola"))
+        [letter] = await queue.entries()
+        assert letter.id == response.email_id
+        assert letter.error_class == FailureClass.PROVIDER_UNAVAILABLE
+        assert letter.to_dict()["request"]["body"] == "Hola"
+
+        first = await _wait_replay(queue, await queue.start_replay(DeadLetterReplayRequest()))
+        assert (first.delivered, first.failed) == (0, 1)
+        [letter] = await queue.entries()
+        assert letter.attempts == 2  # Same entry, one more attempt
+
+        target["service"] = up
+        second = await _wait_replay(queue, await queue.start_replay(DeadLetterReplayRequest(ids=[letter.id])))
+        assert (second.delivered, second.failed) == (1, 0)
+        assert await queue.entries() == []
+        [replayed] = await queue.entries(status=DeadLetterStatus.REPLAYED)
+        await up.close()
+        return replayed, response.email_id
+
+    replayed, email_id = asyncio.run(run())
+    assert replayed.replayed_at is not None
+    assert len(fake_smtp.messages) == 1
+    assert email_id.encode() in fake_smtp.messages[0].data  # Message-ID keeps the original id
+
+
+def test_replay_filters_and_throttles(queue):
+    sent = []
+
+    async def handler(letter):
+        sent.append(letter.id)
+        return True
+
+    queue.register("email", handler)
+    queue.batch_size, queue.rate = 2, 20
+
+    async def run():
+        for i in range(5):
+            await queue.record("email", "{}", FailureClass.PROVIDER_UNAVAILABLE, "down", letter_id=f"e{i}")
+        await queue.record("email", "{}", FailureClass.REJECTED, "550 no such user", letter_id="bad")
+        started = time.monotonic()
+        status = await _wait_replay(queue, await queue.start_replay(
+            DeadLetterReplayRequest(error_class=FailureClass.PROVIDER_UNAVAILABLE)
+        ))
+        return status, time.monotonic() - started
+
+    status, elapsed = asyncio.run(run())
+    assert status.selected == 5 and status.delivered == 5
+    assert sorted(sent) == [f"e{i}" for i in range(5)]
+    assert elapsed >= 0.18  # Three batches of <=2 at 20/s: two pauses of 0.1s
+
+
+def test_replay_statuses_bounded(tmp_path):
+    queue = DeadLetterQueue(
+        DeadLetterStore(str(tmp_path / "dead.sqlite3")), status_ttl=0.2, max_statuses=2
+    )
+
+    async def run():
+        first, second, third = [
+            await _wait_replay(queue, await queue.start_replay(DeadLetterReplayRequest()))
+            for _ in range(3)
+        ]
+        assert queue.replay_status(first.replay_id) is None  # Least recently used
+        assert queue.replay_status(third.replay_id) is third
+        await asyncio.sleep(0.25)
+        assert queue.replay_status(third.replay_id) is None  # Expired after it finished
+
+    asyncio.run(run())
+    queue.store.close()
+
+
+def test_dead_letter_endpoints(client, auth_headers, api_v1):
+    asyncio.run(dead_letters.record(
+        "whatsapp", '{"telefono": "573001234567", "mensaje": "Oferta"}',
+        FailureClass.TEMPORARY, "HTTP 429: throttled", letter_id="wa-endpoint-test",
+    ))
+
+    response = client.get(
+        f"{api_v1}/admin/dead-letters", params={"channel": "whatsapp", "error_class": "temporary"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    entry = next(e for e in response.json() if e["id"] == "wa-endpoint-test")
+    assert entry["request"]["mensaje"] == "Oferta"
+    assert entry["status"] == "failed"
+
+    response = client.post(
+        f"{api_v1}/admin/dead-letters/replay", json={"ids": ["does-not-exist"]}, headers=auth_headers
+    )
+    assert response.status_code == 202
+    assert response.json()["selected"] == 0
+
+    assert client.get(f"{api_v1}/admin/dead-letters/replays/nope", headers=auth_headers).status_code == 404
+    assert client.get(f"{api_v1}/admin/dead-letters").status_code == 401
@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+
+from app.schemas.email_schema import EmailRequest
+from app.services.dedup import BloomFilter, DuplicateFilter
+from app.services.email_service import EmailService
+from app.config import SMTPProviderConfig
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _digest(i):
+    return hashlib.blake2b(str(i).encode(), digest_size=16).digest()
+
+
+def test_bloom_filter_false_positive_rate_within_budget():
+    bloom = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(_digest(i))
+    assert all(_digest(i) in bloom for i in range(10000))
+    false_positives = sum(_digest(i) in bloom for i in range(10000, 30000))
+    assert false_positives / 20000 < 0.02
+    assert len(bloom.bits) < 10000 * 10 / 8 + 1  # ~9.6 bits per key at 1%
+
+
+def test_keys_forgotten_after_window():
+    clock = FakeClock()
+    dedup = DuplicateFilter(window=10, capacity=100, clock=clock)
+    keys = dedup.keys("email", ["A@example.com"], "Oferta", "Hola")
+    assert dedup.keys("email", ["a@example.com "], "Oferta", "Hola") == keys
+
+    assert dedup.claim(keys)
+    dedup.release(keys, delivered=True)
+    clock.now = 15  # Rotated once: still in the previous generation
+    assert not dedup.claim(keys)
+    clock.now = 25  # Rotated twice: gone
+    assert dedup.claim(keys)
+
+
+def test_failed_sends_not_remembered_and_in_flight_caught():
+    dedup = DuplicateFilter(window=60)
+    keys = dedup.keys("whatsapp", ["573001234567"], "Oferta")
+    assert dedup.claim(keys)
+    assert not dedup.claim(keys)  # Same message still being sent
+    dedup.release(keys, delivered=False)
+    assert dedup.claim(keys)  # Retry after a failure goes through
+    other = dedup.keys("whatsapp", ["573001234567"], "Otra oferta")
+    assert dedup.claim(other)
+
+
+def test_email_duplicates_suppressed(fake_smtp):
+    service = EmailService(
+        providers=[SMTPProviderConfig(name="fake", host=fake_smtp.host, port=fake_smtp.port, user="u", password="p")],
+        duplicates=DuplicateFilter(window=60),
+    )
+    request = EmailRequest(to=["a@example.com"], subject="Oferta", body="Hola")
+
+    async def run():
+        first, second = await asyncio.gather(service.send_email(request), service.send_email(request))
+        third = await service.send_email(request.model_copy(update={"to": ["a@example.com", "b@example.com"]}))
+        await service.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first.success and not first.duplicate
+    assert second.success and second.duplicate
+    assert not third.duplicate  # b@example.com has not received it yet
+    assert len(fake_smtp.messages) == 2
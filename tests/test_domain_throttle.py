@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import aiosmtplib
+import pytest
+
+from app.config import DomainLimitConfig, SMTPProviderConfig
+from app.schemas.dead_letter_schema import FailureClass
+from app.schemas.email_schema import EmailRequest
+from app.services.domain_throttle import DomainDeferred, DomainThrottle
+from app.services.email_service import EmailService
+from app.services.smtp_providers import classify_failure
+
+
+def test_concurrency_capped_per_domain_group():
+    throttle = DomainThrottle(
+        [DomainLimitConfig(domains=["outlook.com", "hotmail.com"], concurrency=2)], concurrency=10
+    )
+    active = {"outlook": 0, "other": 0}
+    peak = {"outlook": 0, "other": 0}
+
+    async def send(address, group):
+        async with throttle.acquire([address]):
+            active[group] += 1
+            peak[group] = max(peak[group], active[group])
+            await asyncio.sleep(0.02)
+            active[group] -= 1
+
+    async def run():
+        await asyncio.gather(
+            *(send(f"u{i}@{'outlook.com' if i % 2 else 'Hotmail.com'}", "outlook") for i in range(6)),
+            *(send(f"u{i}@example.com", "other") for i in range(6)),
+        )
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert peak == {"outlook": 2, "other": 6}
+    assert time.monotonic() - started >= 0.06  # Six outlook/hotmail sends, two at a time
+
+
+def test_same_domain_bulk_queues_instead_of_failing():
+    throttle = DomainThrottle(concurrency=10, max_wait=0.5)
+    active = peak = 0
+
+    async def send(i):
+        nonlocal active, peak
+        async with throttle.acquire([f"u{i}@gmail.com"]):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.2)
+            active -= 1
+
+    async def run():
+        return await asyncio.gather(*(send(i) for i in range(60)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results == [None] * 60  # Six rounds of 0.2 s: well past max_wait, none deferred
+    assert peak == 10
+
+
+def test_deferral_pauses_only_that_domain():
+    throttle = DomainThrottle(backoff=5, max_wait=0.1)
+
+    async def run():
+        throttle._ensure_loop()
+        throttle.observe(["a@gmail.com", "b@example.com"], error=aiosmtplib.SMTPRecipientsRefused([
+            aiosmtplib.SMTPRecipientRefused(421, "4.7.0 Try again later", "a@gmail.com")
+        ]))
+        with pytest.raises(DomainDeferred):
+            async with throttle.acquire(["c@gmail.com"]):
+                pass
+        async with throttle.acquire(["d@example.com"]) as keys:
+            assert keys == ["example.com"]
+
+    asyncio.run(run())
+    [gmail] = [s for s in throttle.stats() if s["domain"] == "gmail.com"]
+    assert gmail["backoff"] == 5 and gmail["paused_for"] > 4
+    assert classify_failure(DomainDeferred("gmail.com", "paused")) == FailureClass.TEMPORARY
+
+
+def test_rcpt_deferral_learned_from_relay(fake_smtp):
+    fake_smtp.rcpt_replies["slow@gmail.com"] = "450 4.2.1 Rate limited, try again later"
+    service = EmailService(
+        providers=[SMTPProviderConfig(name="fake", host=fake_smtp.host, port=fake_smtp.port, user="u", password="p")],
+        domain_throttle=DomainThrottle(backoff=60, max_wait=0.1),
+    )
+
+    async def run():
+        partial = await service.send_email(
+            EmailRequest(to=["slow@gmail.com", "ok@example.com"], subject="S", body="B")
+        )
+        paused = await service.send_email(EmailRequest(to=["other@gmail.com"], subject="S", body="B"))
+        flowing = await service.send_email(EmailRequest(to=["next@example.com"], subject="S", body="B"))
+        await service.close()
+        return partial, paused, flowing
+
+    partial, paused, flowing = asyncio.run(run())
+    assert partial.success and flowing.success
+    assert not paused.success and "deferring" in paused.error_details
+    assert [m.recipients for m in fake_smtp.messages] == [["ok@example.com"], ["next@example.com"]]
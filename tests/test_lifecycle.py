@@ -0,0 +1,78 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app import server
+from app.lifecycle import DeliveryTracker, delivery_tracker
+
+
+def test_tracker_counts_inflight():
+    """track() registers a delivery only while the block runs."""
+    tracker = DeliveryTracker()
+    with tracker.track():
+        assert tracker.inflight == 1
+    assert tracker.inflight == 0
+
+
+def test_wait_idle_returns_when_drained():
+    """wait_idle() returns True once in-flight deliveries finish."""
+    tracker = DeliveryTracker()
+
+    async def run():
+        async def delivery():
+            with tracker.track():
+                await asyncio.sleep(0.1)
+
+        task = asyncio.create_task(delivery())
+        await asyncio.sleep(0)
+        tracker.begin_drain()
+        drained = await tracker.wait_idle(timeout=2)
+        await task
+        return drained
+
+    assert asyncio.run(run()) is True
+    assert tracker.draining
+
+
+def test_wait_idle_honours_deadline():
+    """wait_idle() gives up when the deadline passes."""
+    tracker = DeliveryTracker()
+
+    async def run():
+        with tracker.track():
+            tracker.begin_drain()
+            return await tracker.wait_idle(timeout=0.1)
+
+    assert asyncio.run(run()) is False
+
+
+def test_send_rejected_while_draining(client, api_v1, auth_headers):
+    """Once draining, send endpoints answer 503."""
+    with patch.object(delivery_tracker, "_drain_started", 1.0):
+        response = client.post(
+            f"{api_v1}/email/send",
+            json={"to": ["test@example.com"], "subject": "Test", "body": "Body"},
+            headers=auth_headers,
+        )
+    assert response.status_code == 503
+
+
+def test_resolve_workers_explicit():
+    assert server.resolve_workers(3) == 3
+
+
+def test_resolve_workers_capped_by_cgroup_quota():
+    """Auto sizing never exceeds the container CPU quota."""
+    with patch.object(server, "_cgroup_cpu_quota", return_value=1.5), patch(
+        "os.sched_getaffinity", return_value=set(range(8)), create=True
+    ):
+        assert server.resolve_workers(0) == 2
+
+
+@pytest.mark.parametrize("content,expected", [("max 100000", None), ("200000 100000", 2.0)])
+def test_cgroup_v2_quota(tmp_path, content, expected):
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text(content)
+    with patch.object(server, "CGROUP_V2_CPU_MAX", str(cpu_max)):
+        assert server._cgroup_cpu_quota() == expected
@@ -0,0 +1,67 @@
+import json
+import logging
+import queue
+
+from app.logging_config import ContextQueueHandler, JSONFormatter, LogPipeline, log_context, records_dropped
+
+
+def _queued(handler_queue, logger_name, *log_args, **log_kwargs):
+    logger = logging.getLogger(logger_name)
+    logger.propagate = False
+    logger.handlers = [ContextQueueHandler(handler_queue)]
+    logger.error(*log_args, **log_kwargs)
+    return handler_queue.get_nowait()
+
+
+def test_json_record_carries_context_and_extra():
+    with log_context(request_id="req-1"), log_context(email_id="e-1"):
+        record = _queued(queue.Queue(), "tests.log.json", "Sent %s", "mail", extra={"provider": "primary"})
+
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["message"] == "Sent mail" and entry["level"] == "ERROR"
+    assert entry["request_id"] == "req-1" and entry["email_id"] == "e-1" and entry["provider"] == "primary"
+
+
+def test_traceback_rendered_before_queueing():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _queued(queue.Queue(), "tests.log.exc", "Failed", exc_info=True)
+
+    assert record.exc_info is None
+    assert "ValueError: boom" in json.loads(JSONFormatter().format(record))["exc_info"]
+
+
+def test_full_queue_drops_and_counts():
+    logger = logging.getLogger("tests.log.full")
+    logger.propagate = False
+    logger.handlers = [ContextQueueHandler(queue.Queue(maxsize=1))]
+    before = records_dropped.value(level="WARNING")
+
+    for _ in range(3):
+        logger.warning("burst")
+    assert records_dropped.value(level="WARNING") - before == 2
+
+
+def test_pipeline_writes_from_background_thread():
+    written = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            written.append((record.getMessage(), record.request_id))
+
+    pipeline = LogPipeline(Collect(), queue_size=10)
+    logger = logging.getLogger("tests.log.pipeline")
+    logger.propagate = False
+    logger.handlers = [pipeline.handler]
+    pipeline.start()
+    with log_context(request_id="req-2"):
+        logger.warning("queued")
+    pipeline.stop()
+    assert written == [("queued", "req-2")]
+
+
+def test_request_id_header(client):
+    response = client.get("/health", headers={"X-Request-ID": "abc123"})
+    assert response.headers["X-Request-ID"] == "abc123"
+    assert client.get("/health").headers["X-Request-ID"]
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import time
+
+from app.diagnostics import LoopMonitor
+
+
+def _blocking_mime_work():
+    time.sleep(0.3)
+
+
+def test_lag_measured_and_blocking_stack_logged(caplog):
+    monitor = LoopMonitor(interval=0.05, threshold=0.05, capture_stacks=True)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        _blocking_mime_work()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="app.diagnostics.loop_monitor"):
+        asyncio.run(run())
+
+    assert monitor.max_lag >= 0.2
+    assert any("_blocking_mime_work" in r.getMessage() for r in caplog.records)
+    samples = {name: value for name, _, value in monitor.collect()}
+    assert samples["event_loop_lag_max_seconds"] >= 0.2
+    assert monitor.max_lag == monitor.lag  # Worst value resets after a scrape
+
+
+def test_block_shorter_than_interval_caught(caplog):
+    monitor = LoopMonitor(interval=1.0, threshold=0.1, capture_stacks=True)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        _blocking_mime_work()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="app.diagnostics.loop_monitor"):
+        asyncio.run(run())
+    assert any("_blocking_mime_work" in r.getMessage() for r in caplog.records)
+
+
+def test_idle_loop_reports_no_stall(caplog):
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="app.diagnostics.loop_monitor"):
+        asyncio.run(run())
+    assert monitor.max_lag < 0.1
+    assert not caplog.records
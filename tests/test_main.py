@@ -117,3 +117,11 @@ def test_bearer_auth_works(client, api_v1, auth_headers):
         headers={"Authorization": f"Bearer {api_key}"},
     )
     assert response.status_code != 401
+
+
+def test_metrics_endpoint(client, auth_headers):
+    """GET /metrics requires the API Key and returns Prometheus text."""
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers=auth_headers)
+    assert response.status_code == 200
+    assert "smtp_provider_circuit_state" in response.text
@@ -0,0 +1,48 @@
+import pytest
+
+from app.negotiation import is_msgpack, prefers_msgpack
+from app.routers import notify as notify_router
+from app.services.notification_service import NotificationService
+from tests.test_notify import FakeEmail, FakeWhatsApp, _request
+
+
+def test_accept_negotiation():
+    assert prefers_msgpack("application/msgpack")
+    assert prefers_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not prefers_msgpack("application/json, application/msgpack;q=0.9")
+    assert not prefers_msgpack("*/*")
+    assert not prefers_msgpack("")
+    assert not prefers_msgpack("application/msgpack;charset=x;q=0.1, application/json")
+    assert prefers_msgpack("application/json;q=0.2, application/msgpack; charset=utf-8 ;Q=0.8")
+    assert is_msgpack("application/vnd.msgpack; charset=binary")
+
+
+def test_msgpack_bulk_round_trip(client, auth_headers, api_v1, monkeypatch):
+    msgpack = pytest.importorskip("msgpack")
+    monkeypatch.setattr(notify_router, "notification_service", NotificationService(FakeEmail(), FakeWhatsApp()))
+    body = msgpack.packb([_request().model_dump(mode="json"), {"channels": []}])
+    headers = {**auth_headers, "Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+
+    response = client.post(f"{api_v1}/notify/bulk", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    first, second = msgpack.unpackb(response.content)
+    assert first["success"] and first["results"][1]["id"] == "wamid.1"
+    assert not second["success"] and "recipient" in second["error_details"]
+
+    # JSON answer to a MessagePack request when the caller does not ask for MessagePack
+    response = client.post(
+        f"{api_v1}/notify", content=msgpack.packb(_request().model_dump(mode="json")),
+        headers={**auth_headers, "Content-Type": "application/msgpack"},
+    )
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["success"]
+
+
+def test_msgpack_body_validated_like_json(client, auth_headers, api_v1):
+    msgpack = pytest.importorskip("msgpack")
+    headers = {**auth_headers, "Content-Type": "application/msgpack"}
+    response = client.post(f"{api_v1}/email/send", content=msgpack.packb({"to": ["a@example.com"]}), headers=headers)
+    assert response.status_code == 422
+    response = client.post(f"{api_v1}/email/send", content=b"\xc1", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from app.routers import notify as notify_router
+from app.schemas.email_schema import EmailResponse
+from app.schemas.notification_schema import NotificationChannel, NotificationRequest
+from app.schemas.whatsapp_schema import WhatsAppResponse
+from app.services.notification_service import NotificationService
+
+
+class FakeWhatsApp:
+    def __init__(self, success=True):
+        self.success = success
+        self.sent = []
+
+    async def send_whatsapp(self, request):
+        self.sent.append(request)
+        if self.success is None:
+            raise ConnectionError("graph.facebook.com unreachable")
+        return WhatsAppResponse(
+            success=self.success, message="sent" if self.success else "HTTP 500",
+            message_id="wamid.1" if self.success else None,
+        )
+
+
+class FakeEmail:
+    async def send_email(self, request):
+        return EmailResponse(success=True, message="sent", email_id="e-1")
+
+
+def _request(**overrides):
+    values = {
+        "recipient": {"email": "cliente@example.com", "telefono": "573001234567"},
+        "channels": ["email", "whatsapp"],
+        "email": {"subject": "Oferta", "body": "Nueva oferta"},
+        "whatsapp": {"mensaje": "Nueva oferta"},
+    }
+    values.update(overrides)
+    return NotificationRequest.model_validate(values)
+
+
+def test_channels_sent_concurrently(smtp_service, fake_smtp):
+    whatsapp = FakeWhatsApp()
+    service = NotificationService(smtp_service, whatsapp)
+
+    async def run():
+        response = await service.notify(_request())
+        await smtp_service.close()
+        return response
+
+    response = asyncio.run(run())
+    assert response.success
+    assert [(r.channel, r.success) for r in response.results] == [
+        (NotificationChannel.EMAIL, True), (NotificationChannel.WHATSAPP, True)
+    ]
+    assert response.results[1].id == "wamid.1"
+    assert len(fake_smtp.messages) == 1 and whatsapp.sent[0].telefono == "573001234567"
+
+
+@pytest.mark.parametrize("whatsapp_success", [False, None])
+def test_email_fallback_when_whatsapp_fails(smtp_service, fake_smtp, whatsapp_success):
+    service = NotificationService(smtp_service, FakeWhatsApp(success=whatsapp_success))
+
+    async def run():
+        response = await service.notify(_request(channels=["whatsapp"], fallback={"whatsapp": "email"}))
+        await smtp_service.close()
+        return response
+
+    response = asyncio.run(run())
+    assert response.success
+    failed, fallback = response.results
+    assert failed.channel == NotificationChannel.WHATSAPP and not failed.success
+    assert fallback.channel == NotificationChannel.EMAIL and fallback.success
+    assert fallback.fallback_for == NotificationChannel.WHATSAPP
+    assert len(fake_smtp.messages) == 1
+
+
+def test_fallback_not_sent_when_primary_succeeds(smtp_service, fake_smtp):
+    service = NotificationService(smtp_service, FakeWhatsApp())
+    response = asyncio.run(service.notify(_request(channels=["whatsapp"], fallback={"whatsapp": "email"})))
+    assert [r.channel for r in response.results] == [NotificationChannel.WHATSAPP]
+    assert fake_smtp.messages == []
+
+
+@pytest.mark.parametrize("overrides", [
+    {"channels": ["email"], "fallback": {"whatsapp": "email"}},
+    {"channels": ["email", "whatsapp"], "fallback": {"whatsapp": "email"}},
+    {"channels": ["whatsapp"], "recipient": {"telefono": "573001234567"}, "fallback": {"whatsapp": "email"}},
+    {"channels": ["email"], "email": None},
+])
+def test_invalid_channel_combinations_rejected(overrides):
+    with pytest.raises(ValidationError):
+        _request(**overrides)
+
+
+def test_notify_bulk_endpoint(client, auth_headers, api_v1, monkeypatch):
+    monkeypatch.setattr(notify_router, "notification_service", NotificationService(FakeEmail(), FakeWhatsApp()))
+    valid = _request().model_dump(mode="json")
+    response = client.post(
+        f"{api_v1}/notify/bulk", json=[valid, {"recipient": {}, "channels": ["email"]}], headers=auth_headers
+    )
+    assert response.status_code == 200
+    first, second = response.json()
+    assert first["success"] and len(first["results"]) == 2
+    assert not second["success"] and "email channel needs" in second["error_details"]
+
+    assert client.post(f"{api_v1}/notify", json=valid).status_code == 401
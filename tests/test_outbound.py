@@ -0,0 +1,118 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from app.config import SMTPProviderConfig
+from app.schemas.whatsapp_schema import WhatsAppRequest
+from app.services import outbound
+from app.services.outbound import DNSCache, open_tcp, shared_ssl_context
+from app.services.smtp_providers import CircuitBreaker, SMTPProvider
+from app.services.whatsapp_service import GRAPH_API_BASE_URL, WhatsAppService
+
+
+class StaticDNSCache(DNSCache):
+    def __init__(self, records, ttl=60.0):
+        super().__init__()
+        self.records = records
+        self.ttl = ttl
+
+    async def _lookup(self, host):
+        if host not in self.records:
+            raise socket.gaierror(f"unknown host {host}")
+        return list(self.records[host]), self.ttl
+
+
+@pytest.fixture
+def dns(monkeypatch):
+    cache = StaticDNSCache({"relay.test": ["127.0.0.1"]})
+    monkeypatch.setattr(outbound, "dns_cache", cache)
+    return cache
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_dns_answers_cached_for_their_ttl():
+    cache = StaticDNSCache({"relay.test": ["10.0.0.1"]}, ttl=0.05)
+
+    async def run():
+        first = await cache.resolve("relay.test")
+        await cache.resolve("RELAY.test")
+        assert cache.lookups == 1
+        await asyncio.sleep(0.06)
+        await cache.resolve("relay.test")
+        assert cache.lookups == 2
+        assert await cache.resolve("10.1.2.3") == ["10.1.2.3"]  # Literals skip the cache
+        return first
+
+    assert asyncio.run(run()) == ["10.0.0.1"]
+
+
+def test_open_tcp_tries_next_address_and_forgets_dead_hosts(dns):
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        dns.records["relay.test"] = ["127.0.0.2", "127.0.0.1"]
+
+        async def run():
+            sock = await open_tcp("relay.test", port, timeout=1)
+            sock.close()
+            with pytest.raises(OSError):
+                await open_tcp("relay.test", _closed_port(), timeout=1)
+
+        asyncio.run(run())
+    assert dns.lookups == 1
+    assert "relay.test" not in dns._cache
+
+
+def test_ssl_context_built_once():
+    assert shared_ssl_context(True) is shared_ssl_context(True)
+    assert shared_ssl_context(False) is not shared_ssl_context(True)
+
+
+def test_smtp_sessions_prewarmed_through_dns_cache(fake_smtp, dns):
+    config = SMTPProviderConfig(name="fake", host="relay.test", port=fake_smtp.port, user="u", password="p")
+    provider = SMTPProvider(config, CircuitBreaker(3, 30))
+
+    async def run():
+        opened = await provider.pool.prewarm(2)
+        stats = provider.pool.stats()
+        await provider.pool.close()
+        return opened, stats
+
+    opened, stats = asyncio.run(run())
+    assert opened == 2 and stats["idle"] == 2
+    assert fake_smtp.connections == 2
+    assert dns.lookups == 1
+
+
+def test_whatsapp_over_keepalive_client(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if request.url.path.endswith("/messages"):
+            return httpx.Response(200, json={"messages": [{"id": "wamid.1"}]})
+        return httpx.Response(401, json={"error": {"message": "bad token"}})
+
+    service = WhatsAppService()
+    client = httpx.AsyncClient(base_url=GRAPH_API_BASE_URL, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(service, "_client", lambda: client)
+
+    async def run():
+        sent = await service._deliver(WhatsAppRequest(telefono="573001234567", mensaje="Hola"))
+        with pytest.raises(httpx.HTTPStatusError):
+            await service.check_connection()
+        await client.aclose()
+        return sent
+
+    response = asyncio.run(run())
+    assert response.success and response.message_id == "wamid.1"
+    assert calls[0].url.path.startswith("/v22.0/")
+    assert calls[1].url.params["fields"] == "id"
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from app.diagnostics import ProfilerBusy, SamplingProfiler
+
+
+def _busy_render(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+async def _waiting_for_smtp_reply(event):
+    await event.wait()
+
+
+def test_profile_has_thread_and_task_stacks():
+    profiler = SamplingProfiler(interval=0.002)
+
+    async def run():
+        event = asyncio.Event()
+        waiter = asyncio.create_task(_waiting_for_smtp_reply(event))
+        profiling = asyncio.create_task(profiler.profile(0.3))
+        await asyncio.sleep(0.05)
+        _busy_render(0.15)
+        await asyncio.sleep(0.05)
+        result = await profiling
+        event.set()
+        await waiter
+        return result
+
+    result = asyncio.run(run())
+    collapsed = result.collapsed()
+
+    assert result.samples > 10
+    busy = [line for line in collapsed.splitlines() if "_busy_render" in line]
+    assert busy and all(line.startswith("thread:event-loop;") for line in busy)
+    assert any(
+        line.startswith("asyncio-tasks;") and "_waiting_for_smtp_reply" in line
+        for line in collapsed.splitlines()
+    )
+
+    document = result.speedscope()
+    names = [frame["name"] for frame in document["shared"]["frames"]]
+    assert {p["name"] for p in document["profiles"]} >= {"thread:event-loop", "asyncio-tasks"}
+    for p in document["profiles"]:
+        assert len(p["samples"]) == len(p["weights"])
+        assert all(0 <= i < len(names) for sample in p["samples"] for i in sample)
+
+
+def test_one_profile_at_a_time():
+    profiler = SamplingProfiler(interval=0.01, max_seconds=1)
+
+    async def run():
+        first = asyncio.create_task(profiler.profile(0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        with pytest.raises(ValueError):
+            await SamplingProfiler(max_seconds=1).profile(2)
+        await first
+
+    asyncio.run(run())
+    assert not profiler.running
+
+
+def test_profile_endpoint(client, auth_headers, api_v1):
+    response = client.get(f"{api_v1}/admin/profile", params={"seconds": 0.1}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "thread:event-loop;" in response.text
+
+    response = client.get(
+        f"{api_v1}/admin/profile", params={"seconds": 0.1, "format": "speedscope"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["profiles"]
+
+    assert client.get(f"{api_v1}/admin/profile", params={"seconds": 0.1}).status_code == 401
+    assert client.get(
+        f"{api_v1}/admin/profile", params={"seconds": 3600}, headers=auth_headers
+    ).status_code == 422
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.schemas.email_schema import EmailRequest
+from app.services.readiness import ProviderCheck, Readiness
+
+
+def _request(to="user@example.com"):
+    return EmailRequest(to=[to], subject="Oferta", body="Hola")
+
+
+def test_pool_reuses_smtp_session(smtp_service, fake_smtp):
+    """Consecutive sends share one authenticated SMTP session."""
+
+    async def run():
+        first = await smtp_service.send_email(_request())
+        second = await smtp_service.send_email(_request("other@example.com"))
+        await smtp_service.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.success and second.success
+    assert len(fake_smtp.messages) == 2
+    assert fake_smtp.connections == 1
+    first_mail = fake_smtp.commands.index("MAIL")
+    assert "AUTH" not in fake_smtp.commands[first_mail:]
+
+
+def test_smtp_check_uses_noop(smtp_service, fake_smtp):
+    async def run():
+        await smtp_service.check_connection()
+        await smtp_service.close()
+
+    asyncio.run(run())
+    assert "NOOP" in fake_smtp.commands
+
+
+def test_readiness_caches_results():
+    """Probes read cached results; failing or pending checks answer 503."""
+    calls = []
+
+    async def ok():
+        calls.append("ok")
+
+    async def broken():
+        raise ConnectionError("auth failed")
+
+    probe = Readiness(ttl=10, timeout=1)
+    probe.register(ProviderCheck("smtp", ok))
+    probe.register(ProviderCheck("whatsapp", broken))
+    probe.register(ProviderCheck("off", broken, enabled=lambda: False))
+
+    assert probe.response("smtp").status_code == 503  # pending
+    asyncio.run(probe.refresh())
+    for _ in range(5):
+        assert probe.response("smtp").status_code == 200
+    assert calls == ["ok"]
+    assert probe.response("off").status_code == 200
+    assert probe.response().status_code == 503
+    assert probe.result("whatsapp")["error"] == "auth failed"
+
+
+def test_ready_endpoints_exist(client, api_v1):
+    for path in ("/ready", f"{api_v1}/email/ready", f"{api_v1}/whatsapp/ready"):
+        response = client.get(path)
+        assert response.status_code in (200, 503)
+        assert "checks" in response.json()
@@ -0,0 +1,89 @@
+import asyncio
+
+from app.config import SMTPProviderConfig
+from app.schemas.email_schema import EmailRequest, RecipientStatus
+from app.services.email_service import EmailService
+from app.services.recipient_filter import RecipientFilter, StaticResolver, SuppressionList
+from app.utils.ttl_cache import TTLCache
+
+
+def _service(fake_smtp, recipient_filter):
+    config = SMTPProviderConfig(name="fake", host=fake_smtp.host, port=fake_smtp.port, user="u", password="p")
+    return EmailService(providers=[config], recipient_filter=recipient_filter)
+
+
+def _send(service, request):
+    async def run():
+        response = await service.send_email(request)
+        await service.close()
+        return response
+
+    return asyncio.run(run())
+
+
+def test_mx_results_cached_per_domain():
+    resolver = StaticResolver({"nomail-ofertas.com": False})
+    recipient_filter = RecipientFilter(resolver)
+
+    async def run():
+        await recipient_filter.check(["a@ofertas.com", "b@ofertas.com", "c@nomail-ofertas.com"])
+        return await recipient_filter.check(["d@ofertas.com", "e@nomail-ofertas.com"])
+
+    verdicts = asyncio.run(run())
+    assert sorted(resolver.lookups) == ["nomail-ofertas.com", "ofertas.com"]
+    assert [v.status for v in verdicts] == [RecipientStatus.ACCEPTED, RecipientStatus.NO_MX]
+
+
+def test_dns_failure_lets_recipient_through():
+    recipient_filter = RecipientFilter(StaticResolver({}, default=None))
+    verdicts = asyncio.run(recipient_filter.check(["a@flaky-ofertas.com"]))
+    assert verdicts[0].status == RecipientStatus.UNVERIFIED
+    assert verdicts[0].deliverable
+
+
+def test_filtered_recipients_reported_and_skipped(fake_smtp, tmp_path):
+    suppression = SuppressionList(str(tmp_path / "suppressed.txt"))
+    suppression.add("Bounced@ofertas.com")
+    recipient_filter = RecipientFilter(StaticResolver({"nomail-ofertas.com": False}), suppression)
+    service = _service(fake_smtp, recipient_filter)
+
+    response = _send(service, EmailRequest(
+        to=["good@ofertas.com", "bounced@ofertas.com"], cc=["x@nomail-ofertas.com"], subject="S", body="B"
+    ))
+
+    assert response.success
+    assert [v.status for v in response.recipients] == [
+        RecipientStatus.ACCEPTED, RecipientStatus.SUPPRESSED, RecipientStatus.NO_MX
+    ]
+    assert fake_smtp.messages[0].recipients == ["good@ofertas.com"]
+
+
+def test_no_session_opened_when_all_recipients_rejected(fake_smtp):
+    recipient_filter = RecipientFilter(StaticResolver({"nomail-ofertas.com": False}))
+    response = _send(_service(fake_smtp, recipient_filter), EmailRequest(to=["a@nomail-ofertas.com"], subject="S", body="B"))
+    assert not response.success
+    assert fake_smtp.connections == 0
+
+
+def test_hard_bounce_is_suppressed(fake_smtp, tmp_path):
+    path = tmp_path / "suppressed.txt"
+    recipient_filter = RecipientFilter(StaticResolver({}), SuppressionList(str(path)))
+    fake_smtp.rcpt_reply = "550 5.1.1 No such user"
+    response = _send(_service(fake_smtp, recipient_filter), EmailRequest(to=["gone@ofertas.com"], subject="S", body="B"))
+
+    assert not response.success
+    assert response.recipients[0].status == RecipientStatus.REFUSED
+    assert "gone@ofertas.com" in recipient_filter.suppression
+    assert "gone@ofertas.com" in SuppressionList(str(path))
+
+
+def test_ttl_cache_expiry_and_lru():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts b (least recently used)
+    assert cache.get("b") is None and cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
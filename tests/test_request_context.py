@@ -0,0 +1,27 @@
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.main import app
+from app.middleware.request_context import request_seconds_total, requests_total
+
+
+def test_no_base_http_middleware():
+    assert all(m.cls is not BaseHTTPMiddleware for m in app.user_middleware)
+
+
+def test_requests_counted_by_route_template(client, auth_headers, api_v1):
+    route = f"{api_v1}/admin/dead-letters/replays/{{replay_id}}"
+    before = requests_total.value(method="GET", route=route, status="404", auth="valid")
+    seconds_before = request_seconds_total.value(method="GET", route=route)
+
+    # A parameter value equal to another path segment must not be substituted there
+    response = client.get(f"{api_v1}/admin/dead-letters/replays/v1", headers=auth_headers)
+    assert response.status_code == 404
+    assert requests_total.value(method="GET", route=route, status="404", auth="valid") == before + 1
+    assert request_seconds_total.value(method="GET", route=route) > seconds_before
+
+
+def test_auth_status_and_unmatched_routes(client):
+    before = requests_total.value(method="GET", route="unmatched", status="404", auth="invalid")
+    response = client.get("/no-such-path", headers={"X-API-Key": "wrong"})
+    assert response.status_code == 404 and response.headers["X-Request-ID"]
+    assert requests_total.value(method="GET", route="unmatched", status="404", auth="invalid") == before + 1
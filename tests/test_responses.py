@@ -0,0 +1,60 @@
+import asyncio
+import gzip
+import json
+
+from app.middleware import CompressionMiddleware
+from app.middleware.compression import choose_encoding, parse_accept_encoding
+from app.responses import ModelResponse
+from app.schemas.email_schema import EmailResponse
+
+
+def test_accept_encoding_negotiation():
+    assert parse_accept_encoding("gzip;q=0.5, identity") == {"gzip": 0.5, "identity": 1.0}
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+
+
+def test_model_response_matches_response_model_output():
+    response = EmailResponse(success=False, message="Invalid email request", error_details="to.0: bad")
+    assert json.loads(ModelResponse([response]).body) == [response.model_dump(mode="json")]
+
+
+def test_large_bulk_response_is_gzipped(client, auth_headers, api_v1):
+    items = [{"to": ["not-an-address"], "subject": "S", "body": "B"}] * 50
+    response = client.post(
+        f"{api_v1}/email/send-bulk",
+        json=items,
+        headers={**auth_headers, "Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()) == 50
+
+
+def test_small_response_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json()["status"] == "healthy"
+
+
+def test_streamed_body_compressed_incrementally():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"a" * 10, "more_body": True})
+        await send({"type": "http.response.body", "body": b"b" * 10})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1000)(scope, None, send))
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    assert gzip.decompress(b"".join(m["body"] for m in sent[1:])) == b"a" * 10 + b"b" * 10
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import ScheduledStore, Scheduler, TokenBucket
+
+
+def _scheduler(path, **kwargs):
+    kwargs.setdefault("rate", 0)
+    return Scheduler(ScheduledStore(str(path)), **kwargs)
+
+
+async def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_token_bucket_spaces_releases():
+    now = [0.0]
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0])
+    assert [bucket.delay() for _ in range(4)] == [0.0, 0.0, 0.1, 0.2]
+    now[0] = 1.0
+    assert bucket.delay() == 0.0
+
+
+def test_due_jobs_released_at_smoothed_rate(tmp_path):
+    scheduler = _scheduler(tmp_path / "jobs.sqlite3", rate=50)
+    released = []
+
+    async def handler(job):
+        released.append((time.monotonic(), job.payload))
+
+    scheduler.register("email", handler)
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    async def run():
+        await scheduler.start()
+        for i in range(5):
+            await scheduler.schedule("email", str(i), past)
+        await _wait_for(lambda: len(released) == 5)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    times = [t for t, _ in released]
+    assert times[-1] - times[0] >= 4 / 50 * 0.9
+    assert scheduler.store.pending() == []
+
+
+def test_jitter_delays_release(tmp_path):
+    scheduler = _scheduler(tmp_path / "jobs.sqlite3", jitter=30)
+    scheduler.register("email", lambda job: asyncio.sleep(0))
+    send_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    scheduled_at = asyncio.run(scheduler.schedule("email", "{}", send_at))
+    assert send_at <= scheduled_at <= send_at + timedelta(seconds=30)
+
+
+def test_pending_jobs_survive_restart_and_run_once(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    first = _scheduler(path)
+    first.register("whatsapp", lambda job: asyncio.sleep(0))
+    soon = datetime.now(timezone.utc) + timedelta(milliseconds=200)
+    for i in range(3):
+        asyncio.run(first.schedule("whatsapp", str(i), soon))
+
+    # Two processes sharing the database after a restart
+    released = []
+    workers = [_scheduler(path), _scheduler(path)]
+    for worker in workers:
+        async def handler(job):
+            released.append(job.payload)
+        worker.register("whatsapp", handler)
+
+    async def run():
+        for worker in workers:
+            await worker.start()
+        await _wait_for(lambda: len(released) == 3 and not workers[0].store.pending())
+        for worker in workers:
+            await worker.stop()
+
+    asyncio.run(run())
+    assert sorted(released) == ["0", "1", "2"]
+
+
+def test_release_cancelled_mid_handler_keeps_job(tmp_path):
+    scheduler = _scheduler(tmp_path / "jobs.sqlite3")
+    started = []
+
+    async def handler(job):
+        started.append(job.payload)
+        await asyncio.sleep(3600)
+
+    scheduler.register("email", handler)
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    async def run():
+        await scheduler.start()
+        await scheduler.schedule("email", "{}", past)
+        await _wait_for(lambda: started)
+        await scheduler.stop()
+        for task in list(scheduler._running):
+            task.cancel()
+        await asyncio.gather(*scheduler._running, return_exceptions=True)
+
+    asyncio.run(run())
+    assert [job.payload for job in scheduler.store.pending()] == ["{}"]
+
+
+def test_job_abandoned_by_dead_worker_runs_after_lease(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "CLAIM_LEASE", 0.2)
+    monkeypatch.setattr(scheduler_module, "STALE_POLL", 0.05)
+    path = tmp_path / "jobs.sqlite3"
+    dead = _scheduler(path)
+    dead.register("email", lambda job: asyncio.sleep(0))
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    asyncio.run(dead.schedule("email", "{}", past, job_id="job-1"))
+    assert dead.store.claim("job-1", time.time())  # Claimed, then the worker died
+
+    released = []
+    worker = _scheduler(path)
+
+    async def handler(job):
+        released.append(job.id)
+
+    worker.register("email", handler)
+
+    async def run():
+        await worker.start()
+        await _wait_for(lambda: released)
+        await worker.stop()
+
+    asyncio.run(run())
+    assert released == ["job-1"]
+
+
+def test_send_with_future_send_at_is_scheduled(client, auth_headers, api_v1, monkeypatch):
+    from app.services.email_service import _send_scheduled_email, email_service
+    from app.services.scheduler import scheduler
+
+    async def fail(*args):
+        raise AssertionError("scheduled sends must not reach SMTP")
+
+    monkeypatch.setattr(email_service.router, "send", fail)
+    send_at = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    response = client.post(
+        f"{api_v1}/email/send",
+        json={"to": ["a@example.com"], "subject": "Oferta", "body": "Mañana", "send_at": send_at},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["message"] == "Email scheduled"
+    assert response.json()["scheduled_at"] >= send_at[:19]
+
+    # Released under the email_id the caller was given
+    email_id = response.json()["email_id"]
+    job = next(job for job in scheduler.store.pending() if job.id == email_id)
+    sent = []
+
+    async def send_email(request, email_id=None):
+        sent.append(email_id)
+
+    monkeypatch.setattr(email_service, "send_email", send_email)
+    asyncio.run(_send_scheduled_email(job))
+    assert sent == [email_id]
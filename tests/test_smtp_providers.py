@@ -0,0 +1,81 @@
+import asyncio
+import random
+from collections import Counter
+
+from app.config import SMTPProviderConfig
+from app.schemas.email_schema import EmailRequest
+from app.services.email_service import EmailService
+from app.services.smtp_providers import CircuitBreaker, ProviderRouter
+
+
+def _config(name, port, host="127.0.0.1", weight=1.0):
+    return SMTPProviderConfig(name=name, host=host, port=port, user="u", password="p", weight=weight)
+
+
+def _unused_port():
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_failover_to_next_provider(fake_smtp):
+    """A relay that refuses connections is skipped and the next one delivers."""
+    service = EmailService(providers=[_config("down", _unused_port(), weight=100), _config("up", fake_smtp.port)])
+    service.router._rng = random.Random(0)
+
+    async def run():
+        response = await service.send_email(EmailRequest(to=["a@example.com"], subject="S", body="B"))
+        await service.close()
+        return response
+
+    assert asyncio.run(run()).success
+    assert len(fake_smtp.messages) == 1
+    down, up = service.router.providers
+    assert down.breaker.failures == 1
+    assert up.stats()["sent"] == 1
+
+
+def test_all_providers_down_reports_each_error():
+    service = EmailService(providers=[_config("a", _unused_port()), _config("b", _unused_port())])
+    response = asyncio.run(service.send_email(EmailRequest(to=["a@example.com"], subject="S", body="B")))
+    assert not response.success
+    assert "a:" in response.error_details and "b:" in response.error_details
+
+
+def test_circuit_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "half_open"  # reset_timeout=0: trial allowed immediately
+    breaker.reset_timeout = 60
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_excluded_from_candidates():
+    router = ProviderRouter.from_configs([_config("a", 1), _config("b", 2)])
+    a = router.providers[0]
+    a.breaker.reset_timeout = 60
+    for _ in range(a.breaker.failure_threshold):
+        a.breaker.record_failure()
+    assert [p.name for p in router.candidates()] == ["b"]
+
+
+def test_routing_prefers_fast_providers():
+    """Equal weights: a provider 4x slower gets roughly a fifth of first picks."""
+    router = ProviderRouter.from_configs([_config("fast", 1), _config("slow", 2)], )
+    router._rng = random.Random(42)
+    fast, slow = router.providers
+    fast.latency, slow.latency = 0.1, 0.4
+    picks = Counter(router.candidates()[0].name for _ in range(2000))
+    assert 0.75 < picks["fast"] / 2000 < 0.85
+
+
+def test_zero_weight_provider_is_backup_only():
+    router = ProviderRouter.from_configs([_config("main", 1), _config("backup", 2, weight=0)])
+    assert all(router.candidates()[0].name == "main" for _ in range(50))
+    assert [p.name for p in router.candidates()] == ["main", "backup"]
@@ -0,0 +1,120 @@
+import asyncio
+import email
+from email import policy
+
+import aiosmtplib
+import pytest
+
+from app.config import SMTPProviderConfig
+from app.schemas.email_schema import EmailRequest
+from app.services.email_service import EmailService
+from app.services.message_builder import MessageBuilder, MessageSpec
+from app.services.smtp_transaction import BDAT_CHUNK_SIZE, send_transaction
+from tests.fake_smtp import FakeSMTPServer
+
+FULL = ["AUTH PLAIN LOGIN", "8BITMIME", "PIPELINING", "CHUNKING", "SIZE 52428800", "SMTPUTF8"]
+
+
+@pytest.fixture
+def server(request):
+    extensions = getattr(request, "param", FULL)
+    server = FakeSMTPServer(extensions=list(extensions)).start()
+    yield server
+    server.stop()
+
+
+def _transaction(server, recipients, message):
+    async def run():
+        smtp = aiosmtplib.SMTP(hostname=server.host, port=server.port, start_tls=False)
+        await smtp.connect()
+        try:
+            refused = await send_transaction(smtp, "from@example.com", recipients, message)
+            await smtp.noop()  # The session is still usable afterwards
+            return refused
+        finally:
+            smtp.close()
+
+    return asyncio.run(run())
+
+
+def test_envelope_is_pipelined_and_body_chunked(server):
+    message = b"Subject: big\r\n\r\n" + b"x" * (BDAT_CHUNK_SIZE + 10) + b"\r\n.\r\n"
+    assert _transaction(server, ["a@example.com", "b@example.com"], message) == {}
+
+    received = server.messages[0]
+    assert received.data == message  # No dot-stuffing with BDAT
+    assert received.recipients == ["a@example.com", "b@example.com"]
+    assert received.mail_options == [f"SIZE={len(message)}"]
+    assert server.commands.count("BDAT") == 2
+    assert "DATA" not in server.commands
+    assert server.pipelined[:3] == ["MAIL", "RCPT", "RCPT"]
+
+
+def test_partially_refused_recipients_are_reported(server):
+    server.rcpt_replies["gone@example.com"] = "550 5.1.1 No such user"
+    refused = _transaction(server, ["gone@example.com", "ok@example.com"], b"Subject: s\r\n\r\nhi\r\n")
+
+    assert list(refused) == ["gone@example.com"]
+    assert refused["gone@example.com"].code == 550
+    assert server.messages[0].recipients == ["ok@example.com"]
+
+
+def test_all_recipients_refused_raises_and_resets(server):
+    server.rcpt_reply = "550 5.1.1 No such user"
+    with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+        _transaction(server, ["a@example.com"], b"Subject: s\r\n\r\nhi\r\n")
+    assert not server.messages
+    assert "RSET" in server.commands
+
+
+@pytest.mark.parametrize("server", [["PIPELINING", "8BITMIME"]], indirect=True)
+def test_pipelining_without_chunking_uses_data(server):
+    message = b"Subject: s\r\n\r\n.leading dot\r\n"
+    _transaction(server, ["a@example.com"], message)
+
+    assert server.messages[0].data == message
+    assert "DATA" in server.commands
+    assert server.pipelined[:2] == ["MAIL", "RCPT"]
+
+
+def _send(server, body):
+    config = SMTPProviderConfig(name="fake", host=server.host, port=server.port, user="u", password="p")
+    service = EmailService(providers=[config], builder=MessageBuilder(eight_bit=True))
+
+    async def run():
+        response = await service.send_email(EmailRequest(to=["a@example.com"], subject="S", body=body))
+        await service.close()
+        return response
+
+    assert asyncio.run(run()).success
+    received = server.messages[0]
+    parsed = email.message_from_bytes(received.data, policy=policy.default)
+    return received, parsed.get_body(("plain",))
+
+
+def test_utf8_body_sent_as_8bit(server):
+    received, part = _send(server, "Año nuevo, canción nueva")
+
+    assert "BODY=8BITMIME" in received.mail_options
+    assert part["Content-Transfer-Encoding"] == "8bit"
+    assert "Año nuevo".encode() in received.data
+    assert part.get_content().strip() == "Año nuevo, canción nueva"
+
+
+@pytest.mark.parametrize("server", [["AUTH PLAIN LOGIN", "PIPELINING"]], indirect=True)
+def test_7bit_fallback_without_8bitmime(server):
+    received, part = _send(server, "Año nuevo, canción nueva")
+
+    assert received.data.isascii()
+    assert received.mail_options == []
+    assert part["Content-Transfer-Encoding"] == "quoted-printable"
+    assert part.get_content().strip() == "Año nuevo, canción nueva"
+
+
+def test_ascii_message_needs_no_8bitmime():
+    message = asyncio.run(MessageBuilder(eight_bit=True).render(MessageSpec(
+        from_header="from@example.com", to=("a@example.com",), subject="S",
+        message_id="<1@example.com>", body="plain ascii",
+    )))
+    assert not message.eight_bit
+    assert message.render_7bit is None
@@ -0,0 +1,190 @@
+"""
+Memory soak tests: sustained traffic against the fake SMTP and Graph API servers.
+
+Skipped unless SOAK_SECONDS is set:
+
+    SOAK_SECONDS=300 python -m pytest -m soak -s tests/test_soak.py
+
+Each endpoint gets SOAK_SECONDS of traffic from SOAK_CONCURRENCY clients
+after SOAK_WARMUP warm-up requests (pools, caches and lazily built state fill
+up during warm-up and are not counted). Between the end of the warm-up and the
+end of the run the test compares tracemalloc snapshots and RSS, prints the
+allocation sites that retained the most memory in app/ code, and fails when
+retained memory grows by more than SOAK_MAX_GROWTH_KB (tracemalloc, traces
+through app/) or SOAK_MAX_RSS_GROWTH_MB. Allocation tracing keeps
+SOAK_TRACE_DEPTH frames per allocation and slows the service down several
+times; the point is memory behaviour over many sends, not throughput.
+"""
+import asyncio
+import gc
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+import pytest
+
+from app.config import SMTPProviderConfig, settings
+from app.main import app
+from app.routers import email as email_router
+from app.routers import notify as notify_router
+from app.routers import whatsapp as whatsapp_router
+from app.services import whatsapp_service as whatsapp_module
+from app.services.email_service import EmailService
+from app.services.notification_service import NotificationService
+from app.services.whatsapp_service import WhatsAppService
+from tests.fake_graph import FakeGraphServer
+from tests.fake_smtp import FakeSMTPServer
+
+SOAK_SECONDS = float(os.environ.get("SOAK_SECONDS", "0"))
+SOAK_CONCURRENCY = int(os.environ.get("SOAK_CONCURRENCY", "16"))
+SOAK_WARMUP = int(os.environ.get("SOAK_WARMUP", "500"))
+SOAK_MAX_GROWTH_KB = float(os.environ.get("SOAK_MAX_GROWTH_KB", "1024"))
+SOAK_MAX_RSS_GROWTH_MB = float(os.environ.get("SOAK_MAX_RSS_GROWTH_MB", "32"))
+SOAK_TOP_SITES = int(os.environ.get("SOAK_TOP_SITES", "10"))
+SOAK_TRACE_DEPTH = int(os.environ.get("SOAK_TRACE_DEPTH", "10"))  # Deeper traces cost more throughput
+
+APP_DIR = os.path.dirname(os.path.abspath(email_router.__file__)).rsplit(os.sep, 1)[0]
+
+pytestmark = [
+    pytest.mark.soak,
+    pytest.mark.skipif(not SOAK_SECONDS, reason="set SOAK_SECONDS to run the memory soak tests"),
+]
+
+ENDPOINTS = {
+    "email": ("/api/v1/email/send", {
+        "to": ["cliente@example.com"], "subject": "Oferta", "body": "<p>Nueva oferta</p>", "is_html": True,
+    }),
+    "whatsapp": ("/api/v1/whatsapp/send-whatsapp", {"telefono": "573001234567", "mensaje": "Nueva oferta"}),
+    "notify": ("/api/v1/notify", {
+        "recipient": {"email": "cliente@example.com", "telefono": "573001234567"},
+        "channels": ["email", "whatsapp"],
+        "email": {"subject": "Oferta", "body": "Nueva oferta"},
+        "whatsapp": {"mensaje": "Nueva oferta"},
+    }),
+}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux /proc); peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class SoakResult:
+    requests: int
+    seconds: float
+    growth: int  # Bytes retained by traces through app/ code
+    rss_growth: int
+    peak: int  # Peak traced memory during the run
+    sites: list  # tracemalloc.StatisticDiff, largest growth first
+
+    @property
+    def per_request(self) -> float:
+        return self.growth / max(self.requests, 1)
+
+    def report(self, endpoint: str) -> str:
+        lines = [
+            f"{endpoint}: {self.requests} requests in {self.seconds:.0f} s "
+            f"({self.requests / max(self.seconds, 1e-9):.0f}/s)",
+            f"  retained (app/ traces): {self.growth / 1024:+.1f} KiB ({self.per_request:+.1f} B/request)",
+            f"  RSS: {self.rss_growth / 2**20:+.1f} MiB, peak traced: {self.peak / 2**20:.1f} MiB",
+            "  top allocation sites:",
+        ]
+        for stat in self.sites:
+            app_frames = [frame for frame in stat.traceback if frame.filename.startswith(APP_DIR)]
+            where = f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}"
+            via = f" via {app_frames[-1].filename}:{app_frames[-1].lineno}" if app_frames else ""
+            lines.append(f"    {stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7d} blocks  {where}{via}")
+        return "\n".join(lines)
+
+
+async def _drive(client: httpx.AsyncClient, path: str, body: dict, deadline: Optional[float], count: int) -> int:
+    done = 0
+
+    async def worker() -> None:
+        nonlocal done
+        while (time.monotonic() < deadline) if deadline is not None else (done < count):
+            done += 1
+            response = await client.post(path, json=body, headers={"X-API-Key": settings.api_msj_secret})
+            assert response.status_code == 200 and response.json()["success"], response.text
+
+    await asyncio.gather(*(worker() for _ in range(SOAK_CONCURRENCY)))
+    return done
+
+
+async def soak(path: str, body: dict, services) -> SoakResult:
+    only_app = [tracemalloc.Filter(True, os.path.join(APP_DIR, "*"), all_frames=True)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://soak") as client:
+        await _drive(client, path, body, None, SOAK_WARMUP)
+        gc.collect()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.take_snapshot().filter_traces(only_app)
+        rss = rss_bytes()
+
+        started = time.monotonic()
+        requests = await _drive(client, path, body, started + SOAK_SECONDS, 0)
+        seconds = time.monotonic() - started
+
+        gc.collect()
+        final = tracemalloc.take_snapshot().filter_traces(only_app)
+        rss_growth = rss_bytes() - rss
+    for service in services:
+        await service.close()
+
+    diff = final.compare_to(baseline, "traceback")
+    return SoakResult(
+        requests=requests,
+        seconds=seconds,
+        growth=sum(stat.size_diff for stat in diff),
+        rss_growth=rss_growth,
+        peak=tracemalloc.get_traced_memory()[1],
+        sites=[stat for stat in diff if stat.size_diff > 0][:SOAK_TOP_SITES],
+    )
+
+
+@pytest.fixture(scope="module")
+def stand_ins():
+    smtp = FakeSMTPServer(record=False).start()
+    graph = FakeGraphServer().start()
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)  # Per-send INFO lines would dominate the allocations
+    tracemalloc.start(SOAK_TRACE_DEPTH)
+    yield smtp, graph
+    tracemalloc.stop()
+    root.setLevel(level)
+    graph.stop()
+    smtp.stop()
+
+
+@pytest.mark.parametrize("endpoint", list(ENDPOINTS))
+def test_memory_growth_bounded(endpoint, stand_ins, monkeypatch):
+    smtp, graph = stand_ins
+    monkeypatch.setattr(whatsapp_module, "GRAPH_API_BASE_URL", f"{graph.url}/{whatsapp_module.GRAPH_API_VERSION}")
+    monkeypatch.setattr(whatsapp_module, "HEADER_IMAGE_URL", f"{graph.url}/logo.png")
+    email = EmailService(providers=[
+        SMTPProviderConfig(name=f"soak-{endpoint}", host=smtp.host, port=smtp.port, user="u", password="p")
+    ])
+    whatsapp = WhatsAppService()
+    monkeypatch.setattr(email_router, "email_service", email)
+    monkeypatch.setattr(whatsapp_router, "whatsapp_service", whatsapp)
+    monkeypatch.setattr(notify_router, "notification_service", NotificationService(email, whatsapp))
+
+    path, body = ENDPOINTS[endpoint]
+    result = asyncio.run(soak(path, body, (email, whatsapp)))
+    report = result.report(endpoint)
+    print("\n" + report)
+
+    assert result.requests > 0
+    assert result.growth <= SOAK_MAX_GROWTH_KB * 1024, report
+    assert result.rss_growth <= SOAK_MAX_RSS_GROWTH_MB * 2**20, report
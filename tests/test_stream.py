@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import settings
+from app.routers import stream as stream_router
+from app.schemas.email_schema import EmailResponse
+from app.services import submission_stream
+
+
+class SlowEmail:
+    async def send_email(self, request):
+        await asyncio.sleep(0.2)
+        return EmailResponse(success=True, message="sent", email_id=f"id-{request.subject}")
+
+
+def _send(correlation_id, subject="S"):
+    return {
+        "type": "send", "id": correlation_id, "channel": "email",
+        "request": {"to": ["a@example.com"], "subject": subject, "body": "Hola"},
+    }
+
+
+def test_stream_acks_results_and_credits(client, auth_headers, api_v1, monkeypatch):
+    monkeypatch.setattr(submission_stream, "email_service", SlowEmail())
+    monkeypatch.setattr(settings, "stream_credits", 2)
+
+    with client.websocket_connect(f"{api_v1}/stream", headers=auth_headers) as ws:
+        assert ws.receive_json() == {"type": "ready", "credits": 2}
+        ws.send_json(_send("a", "A"))
+        ws.send_json(_send("b", "B"))
+        ws.send_json(_send("c"))  # Both credits in flight
+        ws.send_json({"type": "send", "id": "d", "channel": "email", "request": {"to": ["x"]}})
+        frames = [ws.receive_json() for _ in range(4)]
+        assert [(f["type"], f["id"]) for f in frames] == [("ack", "a"), ("ack", "b"), ("nack", "c"), ("nack", "d")]
+        assert "No credit" in frames[2]["error"]
+
+        results = {f["id"]: f for f in (ws.receive_json(), ws.receive_json())}
+        assert results["a"]["response"]["email_id"] == "id-A" and results["b"]["credits"] == 1
+        ws.send_json(_send("e"))
+        assert ws.receive_json() == {"type": "ack", "id": "e"}
+        assert ws.receive_json()["id"] == "e"
+
+
+def test_stream_requires_api_key(client, api_v1):
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect(f"{api_v1}/stream") as ws:
+            ws.receive_json()
+    assert excinfo.value.code == 1008
+
+
+def test_stream_closed_after_refusals_in_a_row(client, auth_headers, api_v1, monkeypatch):
+    monkeypatch.setattr(settings, "stream_max_refusals", 3)
+
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect(f"{api_v1}/stream", headers=auth_headers) as ws:
+            ws.receive_json()
+            for i in range(3):
+                ws.send_json({"type": "ping", "id": i})
+            while True:
+                assert ws.receive_json()["type"] == "nack"
+    assert excinfo.value.code == 1008
+
+
+def test_stream_stops_reading_when_writer_fails(client, auth_headers, api_v1, monkeypatch):
+    def broken(frame):
+        raise ValueError("cannot serialize")
+
+    monkeypatch.setattr(stream_router, "to_json", broken)
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect(f"{api_v1}/stream", headers=auth_headers) as ws:
+            ws.receive_json()
+    assert excinfo.value.code == 1011
@@ -0,0 +1,110 @@
+import asyncio
+
+from app.schemas.whatsapp_schema import WhatsAppRequest, WhatsAppResponse
+from app.services.whatsapp_coalescer import WhatsAppCoalescer
+
+
+class RecordingSender:
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, request):
+        self.sent.append(request)
+        return WhatsAppResponse(success=True, message="sent", message_id=f"wamid.{len(self.sent)}")
+
+
+def _request(telefono, mensaje):
+    return WhatsAppRequest(telefono=telefono, mensaje=mensaje)
+
+
+def test_messages_to_same_phone_share_one_send():
+    sender = RecordingSender()
+    coalescer = WhatsAppCoalescer(sender, window=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.submit(_request("573001", "Oferta 1")),
+            coalescer.submit(_request("573001", "Oferta 2")),
+            coalescer.submit(_request("573002", "Oferta 3")),
+        )
+
+    responses = asyncio.run(run())
+    assert len(sender.sent) == 2
+    merged = next(r for r in sender.sent if r.telefono == "573001")
+    assert merged.mensaje == "Oferta 1 | Oferta 2"
+    assert responses[0].message_id == responses[1].message_id != responses[2].message_id
+    assert coalescer.pending == 0
+
+
+def test_batch_flushes_when_full():
+    sender = RecordingSender()
+    coalescer = WhatsAppCoalescer(sender, window=60, max_messages=2)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(
+            coalescer.submit(_request("573001", "a")), coalescer.submit(_request("573001", "b"))
+        ), timeout=1)
+
+    asyncio.run(run())
+    assert [r.mensaje for r in sender.sent] == ["a | b"]
+
+
+def test_merged_text_stays_on_one_line():
+    sender = RecordingSender()
+    coalescer = WhatsAppCoalescer(sender, window=60, max_messages=2)
+
+    async def run():
+        await asyncio.gather(
+            coalescer.submit(_request("573001", "Oferta:\n\n\tcamioneta")),
+            coalescer.submit(_request("573001", "Oferta:      moto ")),
+        )
+
+    asyncio.run(run())
+    assert [r.mensaje for r in sender.sent] == ["Oferta: camioneta | Oferta: moto"]
+
+
+def test_length_cap_starts_new_batch():
+    sender = RecordingSender()
+    coalescer = WhatsAppCoalescer(sender, window=0.05, max_chars=10)
+
+    async def run():
+        await asyncio.gather(
+            coalescer.submit(_request("573001", "12345")), coalescer.submit(_request("573001", "67890"))
+        )
+
+    asyncio.run(run())
+    assert [r.mensaje for r in sender.sent] == ["12345", "67890"]
+
+
+def test_pending_cap_flushes_oldest_batches_early():
+    sender = RecordingSender()
+    coalescer = WhatsAppCoalescer(sender, window=60, max_pending=2)
+
+    async def run():
+        first = asyncio.ensure_future(coalescer.submit(_request("573001", "a")))
+        second = asyncio.ensure_future(coalescer.submit(_request("573002", "b")))
+        third = asyncio.ensure_future(coalescer.submit(_request("573003", "c")))
+        await asyncio.wait_for(first, timeout=1)
+        assert coalescer.pending == 2
+        await coalescer.flush_all()
+        await asyncio.gather(second, third)
+
+    asyncio.run(run())
+    assert [r.telefono for r in sender.sent] == ["573001", "573002", "573003"]
+
+
+def test_send_error_reaches_every_submitter():
+    async def failing(request):
+        raise RuntimeError("Graph API down")
+
+    coalescer = WhatsAppCoalescer(failing, window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.submit(_request("573001", "a")),
+            coalescer.submit(_request("573001", "b")),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
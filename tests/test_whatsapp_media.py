@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import httpx
+
+from app.schemas.whatsapp_schema import WhatsAppRequest
+from app.services.whatsapp_media import MEDIA_ID_LIFETIME, WhatsAppMediaCache
+from app.services.whatsapp_service import GRAPH_API_BASE_URL, HEADER_IMAGE_URL, WhatsAppService
+
+
+def _header(payload):
+    return payload["template"]["components"][0]["parameters"][0]["image"]
+
+
+def test_header_uploaded_once_and_sent_by_id(monkeypatch):
+    calls, sent = [], []
+
+    def handler(request):
+        calls.append(f"{request.method} {request.url.path}")
+        if request.url.host != "graph.facebook.com":
+            return httpx.Response(200, content=b"\x89PNG...", headers={"content-type": "image/png"})
+        if request.url.path.endswith("/media"):
+            assert b'name="messaging_product"' in request.content and b"\x89PNG" in request.content
+            return httpx.Response(200, json={"id": "media-1"})
+        sent.append(_header(json.loads(request.content)))
+        return httpx.Response(200, json={"messages": [{"id": "wamid.1"}]})
+
+    service = WhatsAppService()
+    client = httpx.AsyncClient(base_url=GRAPH_API_BASE_URL, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(service, "_client", lambda: client)
+    request = WhatsAppRequest(telefono="573001234567", mensaje="Hola")
+
+    async def run():
+        await service._deliver(request)  # No id yet: link, upload starts in the background
+        await service.media._uploads[HEADER_IMAGE_URL]
+        await service._deliver(request)
+        await service._deliver(request)
+        await client.aclose()
+
+    asyncio.run(run())
+    assert sent == [{"link": HEADER_IMAGE_URL}, {"id": "media-1"}, {"id": "media-1"}]
+    assert sum(call.endswith("/media") for call in calls) == 1
+
+
+def test_media_refreshed_before_it_lapses():
+    clock = [0.0]
+    uploads = []
+
+    async def upload(url):
+        uploads.append(url)
+        return f"media-{len(uploads)}"
+
+    cache = WhatsAppMediaCache(upload, ttl=100, clock=lambda: clock[0])
+
+    async def run():
+        assert await cache.refresh("u") == "media-1"
+        clock[0] = 150  # Past ttl: old id still served while a new one uploads
+        assert cache.media_id("u") == "media-1"
+        await cache._uploads["u"]
+        assert cache.media_id("u") == "media-2"
+        clock[0] = 150 + MEDIA_ID_LIFETIME  # Lapsed and the upload fails: back to the link
+
+        async def failing(url):
+            raise httpx.ConnectError("down")
+
+        cache._upload = failing
+        assert cache.media_id("u") is None
+        await cache._uploads["u"]
+        assert cache.media_id("u") is None
+
+    asyncio.run(run())